@@ -0,0 +1,106 @@
+"""Benchmarks of the FRET0 pipeline, end to end and per stage: parsing the PDB,
+selecting alpha carbons into a coordinate table, pairwise distances, and E_fret
+between conformations, with default and compact output dtypes."""
+
+from smoltools import fret0
+from smoltools.calculate import distance
+from smoltools.pdbtools import coordinate_table, path_to_chain, select
+
+from benchmarks.synthetic import write_pdb
+
+# tidy pairwise distances grow with the square of the number of residues, so the
+# largest structures only benchmark parsing and selection
+DISTANCE_SIZES = [100, 1_000, 10_000]
+
+
+def _alpha_carbon_table(chain):
+    atoms = select.get_alpha_carbons(select.get_residues(chain))
+    return (
+        coordinate_table(atoms)
+        .assign(id=lambda x: x.residue_name + x.residue_number.astype(str))
+        .set_index('id')
+        .loc[:, ['x', 'y', 'z']]
+    )
+
+
+class Parse:
+    params = [100, 1_000, 10_000, 50_000]
+    param_names = ['n_atoms']
+    timeout = 300
+
+    def setup(self, n_atoms):
+        self.path = write_pdb(n_atoms)
+        self.chain = path_to_chain(self.path)
+
+    def time_path_to_chain(self, n_atoms):
+        path_to_chain(self.path)
+
+    def peakmem_path_to_chain(self, n_atoms):
+        path_to_chain(self.path)
+
+    def time_coordinate_table(self, n_atoms):
+        _alpha_carbon_table(self.chain)
+
+
+class PathToDistances:
+    params = DISTANCE_SIZES
+    param_names = ['n_atoms']
+    timeout = 300
+
+    def setup(self, n_atoms):
+        self.path = write_pdb(n_atoms)
+        self.coords = _alpha_carbon_table(path_to_chain(self.path))
+
+    def time_pairwise_distances(self, n_atoms):
+        distance.pairwise_distances(self.coords)
+
+    def time_path_to_distances(self, n_atoms):
+        fret0.path_to_distances(self.path)
+
+    def peakmem_path_to_distances(self, n_atoms):
+        fret0.path_to_distances(self.path)
+
+
+class EFretBetweenConformations:
+    params = DISTANCE_SIZES
+    param_names = ['n_atoms']
+    timeout = 300
+
+    def setup(self, n_atoms):
+        path = write_pdb(n_atoms, n_models=2)
+        self.distances = [
+            fret0.path_to_distances(path, model=model) for model in (0, 1)
+        ]
+        self.merged = fret0.pairwise_distances_between_conformations(*self.distances)
+
+    def time_pairwise_distances_between_conformations(self, n_atoms):
+        fret0.pairwise_distances_between_conformations(*self.distances)
+
+    def time_e_fret_between_conformations(self, n_atoms):
+        fret0.e_fret_between_conformations(self.merged, r0=51)
+
+    def peakmem_e_fret_between_conformations(self, n_atoms):
+        fret0.e_fret_between_conformations(self.merged, r0=51)
+
+
+class CompactPipeline:
+    params = (DISTANCE_SIZES, [False, True])
+    param_names = ['n_atoms', 'compact']
+    timeout = 300
+
+    def setup(self, n_atoms, compact):
+        path = write_pdb(n_atoms, n_models=2)
+        self.chains = [path_to_chain(path, model=model) for model in (0, 1)]
+
+    def _pipeline(self, compact):
+        distances = [
+            fret0.chain_to_distances(chain, compact=compact) for chain in self.chains
+        ]
+        merged = fret0.pairwise_distances_between_conformations(*distances)
+        fret0.e_fret_between_conformations(merged, r0=51, compact=compact)
+
+    def time_chain_to_e_fret(self, n_atoms, compact):
+        self._pipeline(compact)
+
+    def peakmem_chain_to_e_fret(self, n_atoms, compact):
+        self._pipeline(compact)
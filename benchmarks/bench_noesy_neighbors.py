@@ -0,0 +1,80 @@
+"""Benchmarks of the NOESY neighbors pipeline: labeled methyl coordinates from a PDB,
+pairwise distances (with default and compact output dtypes), splicing two
+conformations, and NOE occupancy over ensembles."""
+
+from smoltools import noesy_neighbors
+
+from benchmarks.synthetic import write_pdb
+
+# tidy pairwise distances grow with the square of the number of labeled carbons, so
+# the largest structures only benchmark parsing and selection
+DISTANCE_SIZES = [100, 1_000, 10_000]
+
+
+class CoordinatesFromPathPresets:
+    params = ([100, 1_000, 10_000, 50_000], ['ILV', 'ILVMAT'])
+    param_names = ['n_atoms', 'mode']
+    timeout = 300
+
+    def setup(self, n_atoms, mode):
+        self.path = write_pdb(n_atoms)
+
+    def time_coordinates_from_path_presets(self, n_atoms, mode):
+        noesy_neighbors.coordinates_from_path_presets(self.path, mode=mode)
+
+    def peakmem_coordinates_from_path_presets(self, n_atoms, mode):
+        noesy_neighbors.coordinates_from_path_presets(self.path, mode=mode)
+
+
+class SpliceConformationTables:
+    params = DISTANCE_SIZES
+    param_names = ['n_atoms']
+    timeout = 300
+
+    def setup(self, n_atoms):
+        path = write_pdb(n_atoms, n_models=2)
+        coords = [
+            noesy_neighbors.coordinates_from_path_presets(path, model=model)
+            for model in (0, 1)
+        ]
+        self.coords = coords
+        self.distances = [noesy_neighbors.pairwise_distances(c) for c in coords]
+
+    def time_pairwise_distances(self, n_atoms):
+        noesy_neighbors.pairwise_distances(self.coords[0])
+
+    def time_splice_conformation_tables(self, n_atoms):
+        noesy_neighbors.splice_conformation_tables(*self.distances)
+
+    def peakmem_splice_conformation_tables(self, n_atoms):
+        noesy_neighbors.splice_conformation_tables(*self.distances)
+
+
+class CompactPairwiseDistances:
+    params = (DISTANCE_SIZES, [False, True])
+    param_names = ['n_atoms', 'compact']
+    timeout = 300
+
+    def setup(self, n_atoms, compact):
+        self.coords = noesy_neighbors.coordinates_from_path_presets(write_pdb(n_atoms))
+
+    def time_pairwise_distances(self, n_atoms, compact):
+        noesy_neighbors.pairwise_distances(self.coords, compact=compact)
+
+    def peakmem_pairwise_distances(self, n_atoms, compact):
+        noesy_neighbors.pairwise_distances(self.coords, compact=compact)
+
+
+class EnsembleOccupancy:
+    params = ([1_000, 10_000], [10, 100])
+    param_names = ['n_atoms', 'n_models']
+    timeout = 300
+
+    def setup(self, n_atoms, n_models):
+        self.path = write_pdb(n_atoms, n_models=n_models)
+
+    def time_occupancy_from_path_presets(self, n_atoms, n_models):
+        noesy_neighbors.occupancy_from_path_presets(self.path)
+
+    def peakmem_occupancy_from_path_presets(self, n_atoms, n_models):
+        noesy_neighbors.occupancy_from_path_presets(self.path)
@@ -0,0 +1,58 @@
+"""Benchmarks of plate rating, end to end and per stage: reading the export (parsed
+and from the cache), threshold windows, and the regression of every well, and peak
+memory of reading and rating with default and compact dtypes."""
+
+import shutil
+import tempfile
+
+from smoltools import rate_my_plate
+from smoltools.rate_my_plate import ingest, main
+
+from benchmarks.synthetic import write_plate
+
+
+class RatePlate:
+    params = [96, 384, 1536]
+    param_names = ['n_wells']
+    timeout = 300
+
+    def setup(self, n_wells):
+        self.path = write_plate(n_wells)
+        self.cache_dir = tempfile.mkdtemp()
+        ingest.read_plate(self.path, cache_dir=self.cache_dir)
+        self.df = rate_my_plate.read_data(self.path, cache=False)
+        self.windows = rate_my_plate.threshold_windows(self.df, 0.1, 0.5)
+
+    def teardown(self, n_wells):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def time_read_data(self, n_wells):
+        rate_my_plate.read_data(self.path, cache=False)
+
+    def time_read_cached_plate(self, n_wells):
+        ingest.read_plate(self.path, cache_dir=self.cache_dir).pipe(main.clean_import)
+
+    def time_threshold_windows(self, n_wells):
+        rate_my_plate.threshold_windows(self.df, 0.1, 0.5)
+
+    def time_calculate_slopes(self, n_wells):
+        main.calculate_slopes(self.df, windows=self.windows)
+
+    def time_rate_plate(self, n_wells):
+        rate_my_plate.rate_plate(self.df, 0.1, 0.5)
+
+    def peakmem_rate_plate(self, n_wells):
+        rate_my_plate.rate_plate(self.df, 0.1, 0.5)
+
+
+class CompactRatePlate:
+    params = ([96, 384, 1536], [False, True])
+    param_names = ['n_wells', 'compact']
+    timeout = 300
+
+    def setup(self, n_wells, compact):
+        self.path = write_plate(n_wells)
+
+    def peakmem_read_and_rate_plate(self, n_wells, compact):
+        df = rate_my_plate.read_data(self.path, cache=False, compact=compact)
+        rate_my_plate.rate_plate(df, 0.1, 0.5)
@@ -0,0 +1,151 @@
+"""Generators for the synthetic inputs of the benchmarks: PDB files of a given number
+of atoms (optionally multi-model ensembles) and kinetic plate-reader exports of 96,
+384 or 1536 wells. Inputs are seeded, so every run benchmarks the same files, and are
+written once per session into a temporary directory."""
+
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from smoltools.rate_my_plate.layout import PlateLayout
+
+# residue types and their heavy atoms, covering the residues the ILV, ILVA and ILVMAT
+# labeling schemes select
+RESIDUE_ATOMS = {
+    'ILE': ['N', 'CA', 'C', 'O', 'CB', 'CG1', 'CG2', 'CD1'],
+    'LEU': ['N', 'CA', 'C', 'O', 'CB', 'CG', 'CD1', 'CD2'],
+    'VAL': ['N', 'CA', 'C', 'O', 'CB', 'CG1', 'CG2'],
+    'ALA': ['N', 'CA', 'C', 'O', 'CB'],
+    'GLY': ['N', 'CA', 'C', 'O'],
+    'MET': ['N', 'CA', 'C', 'O', 'CB', 'CG', 'SD', 'CE'],
+    'THR': ['N', 'CA', 'C', 'O', 'CB', 'OG1', 'CG2'],
+    'SER': ['N', 'CA', 'C', 'O', 'CB', 'OG'],
+}
+
+_DATA_DIR = Path(tempfile.gettempdir()) / 'smoltools-benchmarks'
+
+
+def data_dir() -> Path:
+    _DATA_DIR.mkdir(parents=True, exist_ok=True)
+    return _DATA_DIR
+
+
+def _residues(n_atoms: int, rng: np.random.Generator) -> list[str]:
+    names = list(RESIDUE_ATOMS)
+    residues, total = [], 0
+    while total < n_atoms:
+        name = names[rng.integers(len(names))]
+        residues.append(name)
+        total += len(RESIDUE_ATOMS[name])
+    return residues
+
+
+def _atom_lines(
+    residues: list[str], centers: np.ndarray, chain: str, rng: np.random.Generator
+) -> list[str]:
+    lines = []
+    serial = 1
+    for number, (name, center) in enumerate(zip(residues, centers), start=1):
+        atoms = RESIDUE_ATOMS[name]
+        coords = center + rng.normal(0, 1.2, (len(atoms), 3))
+        for atom, (x, y, z) in zip(atoms, coords):
+            lines.append(
+                f'ATOM  {serial:5d} {atom:<4s} {name} {chain}{number:4d}    '
+                f'{x:8.3f}{y:8.3f}{z:8.3f}  1.00{rng.uniform(0, 60):6.2f}'
+                f'           {atom[0]}'
+            )
+            serial += 1
+    lines.append('TER   ')
+    return lines
+
+
+def write_pdb(
+    n_atoms: int, n_models: int = 1, chains: str = 'A', seed: int = 0
+) -> Path:
+    """Write a synthetic PDB file of about n_atoms atoms per chain: a compact random
+    walk of residues, with each model of an ensemble a perturbed copy of the first.
+
+    Parameters:
+    -----------
+    n_atoms (int): Number of atoms per chain.
+    n_models (int): Number of models (default = 1).
+    chains (str): Chain IDs (default = 'A').
+    seed (int): Seed of the random number generator (default = 0).
+
+    Returns:
+    --------
+    Path: Path to the PDB file.
+    """
+    path = data_dir() / f'synthetic_{n_atoms}_{n_models}_{chains}_{seed}.pdb'
+    if path.exists():
+        return path
+
+    rng = np.random.default_rng(seed)
+    residues = _residues(n_atoms, rng)
+    # a random walk folded back into a globule of roughly protein density
+    steps = rng.normal(0, 2.2, (len(residues), 3))
+    walk = np.cumsum(steps, axis=0)
+    radius = 3 * len(residues) ** (1 / 3)
+    walk = np.where(np.abs(walk) > radius, np.sign(walk) * radius, walk)
+
+    lines = []
+    for model in range(n_models):
+        if n_models > 1:
+            lines.append(f'MODEL     {model + 1:4d}')
+        centers = walk + (rng.normal(0, 0.5, walk.shape) if model else 0)
+        for offset, chain in enumerate(chains):
+            lines.extend(
+                _atom_lines(
+                    residues, centers + [2.5 * radius * offset, 0, 0], chain, rng
+                )
+            )
+        if n_models > 1:
+            lines.append('ENDMDL')
+    lines.append('END   ')
+    path.write_text('\n'.join(lines) + '\n')
+    return path
+
+
+def write_plate(n_wells: int, n_reads: int = 60, seed: int = 0) -> Path:
+    """Write a synthetic kinetic plate-reader export (xlsx) of NADH absorbance decaying
+    at a random rate in every well, with a two-line preamble above the header.
+
+    Parameters:
+    -----------
+    n_wells (int): Plate size, 96, 384 or 1536.
+    n_reads (int): Number of reads, every 30 seconds (default = 60).
+    seed (int): Seed of the random number generator (default = 0).
+
+    Returns:
+    --------
+    Path: Path to the export.
+    """
+    path = data_dir() / f'plate_{n_wells}_{n_reads}_{seed}.xlsx'
+    if path.exists():
+        return path
+
+    rng = np.random.default_rng(seed)
+    wells = PlateLayout.from_size(n_wells).wells
+    seconds = np.arange(n_reads) * 30
+    k = rng.uniform(0.0002, 0.002, n_wells)
+    absorbance = (
+        1
+        - 0.6 * (1 - np.exp(-k * seconds[:, None]))
+        + rng.normal(0, 0.003, (n_reads, n_wells))
+    )
+    times = [f'{s // 3600}:{s // 60 % 60:02d}:{s % 60:02d}' for s in seconds]
+    table = pd.concat(
+        [
+            pd.DataFrame({'Kinetic read': times}),
+            pd.DataFrame(absorbance, columns=wells),
+        ],
+        axis=1,
+    )
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame([['Plate reader export']]).to_excel(
+            writer, header=False, index=False
+        )
+        table.to_excel(writer, startrow=2, index=False)
+    return path
@@ -1,4 +1,15 @@
-import smoltools.pdbtools as pdbtools
-import smoltools.fret0 as fret0
-import smoltools.noesy_neighbors as noesy_neighbors
-import smoltools.rate_my_plate as rate_my_plate
+from smoltools._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=[
+        'pdbtools',
+        'fret0',
+        'noesy_neighbors',
+        'rate_my_plate',
+        'profiling',
+        'cache',
+        'tables',
+        'aio',
+    ],
+)
@@ -0,0 +1,48 @@
+"""Lazy loading of subpackages, submodules and their functions (PEP 562), so that
+importing smoltools does not import Biopython, SciPy or Altair until a function that
+needs them is first used."""
+
+import importlib
+import sys
+from collections.abc import Callable, Iterable
+
+
+def attach(
+    package_name: str,
+    submodules: Iterable[str] = (),
+    attributes: dict[str, str] = None,
+) -> tuple[Callable, Callable, list[str]]:
+    """Create the module-level __getattr__, __dir__ and __all__ of a package whose
+    submodules and re-exported functions are imported on first access.
+
+    Parameters:
+    -----------
+    package_name (str): Name of the package (__name__).
+    submodules (Iterable[str]): Names of submodules to expose as attributes.
+    attributes (dict[str, str]): Dictionary mapping the names of re-exported
+        attributes to the full name of the module that defines them.
+
+    Returns:
+    --------
+    tuple[Callable, Callable, list[str]]: The package's __getattr__, __dir__ and
+        __all__.
+    """
+    submodules = set(submodules)
+    attributes = dict(attributes or {})
+    names = sorted(submodules | set(attributes))
+
+    def __getattr__(name: str):
+        if name in submodules:
+            value = importlib.import_module(f'{package_name}.{name}')
+        elif name in attributes:
+            value = getattr(importlib.import_module(attributes[name]), name)
+        else:
+            raise AttributeError(f'module {package_name!r} has no attribute {name!r}')
+        # cache on the package so later lookups skip __getattr__
+        setattr(sys.modules[package_name], name, value)
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted(set(vars(sys.modules[package_name])) | set(names))
+
+    return __getattr__, __dir__, names
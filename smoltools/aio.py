@@ -0,0 +1,238 @@
+"""Awaitable versions of the main entry points, for use from async web services. Parsing
+and computation run on a managed thread (or process) pool so they do not block the
+event loop, with a limit on the number of jobs running at once. Cancelling an await
+cancels its job if it has not started yet; a job already running finishes in the
+background and its result is discarded.
+
+A session groups the analyses of one request, and parses each uploaded structure
+once however many analyses of it run concurrently.
+
+Usage:
+------
+async with AsyncRunner(max_concurrency=4) as runner:
+    async with runner.session() as session:
+        distances, coords = await asyncio.gather(
+            session.chain_to_distances(pdb_bytes, chain='A'),
+            session.coordinates_from_structure(pdb_bytes, mode='ILV', chain='A'),
+        )
+"""
+
+import asyncio
+import functools
+import hashlib
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+from Bio.PDB.Structure import Structure
+
+from smoltools.calculate import distance
+from smoltools.fret0.efficiency import e_fret_between_conformations
+from smoltools.fret0.main import chain_to_distances, path_to_distances
+from smoltools.noesy_neighbors.main import LABELED_CARBONS, coordinates_from_chain
+from smoltools.pdbtools import load, select
+from smoltools.rate_my_plate.main import rate_plate, read_data_from_bytes
+
+
+def _structure_to_distances(
+    structure: Structure, model: int, chain: str, sasa_cutoff: float
+) -> pd.DataFrame:
+    chain = select.get_chain(structure, model=model, chain=chain)
+    return chain_to_distances(chain, sasa_cutoff=sasa_cutoff)
+
+
+def _structure_to_coordinates(
+    structure: Structure, mode: str, model: int, chain: str
+) -> pd.DataFrame:
+    chain = select.get_chain(structure, model=model, chain=chain)
+    return coordinates_from_chain(chain, LABELED_CARBONS[mode])
+
+
+def _rate_plate_from_bytes(
+    bytes_data: bytes,
+    suffix: str,
+    lower_percent: float,
+    upper_percent: float,
+    concentration: float,
+) -> pd.DataFrame:
+    return rate_plate(
+        read_data_from_bytes(bytes_data, suffix=suffix),
+        lower_percent,
+        upper_percent,
+        concentration=concentration,
+    )
+
+
+class AsyncRunner:
+    """Runs pipeline functions on an executor from async code.
+
+    Parameters:
+    -----------
+    max_workers (int): Optional, number of worker threads or processes. Default is
+        the executor's default.
+    processes (bool): Whether to use a process pool, so that CPU-bound jobs run in
+        parallel. Arguments and results are then pickled between processes
+        (default = False, a thread pool).
+    max_concurrency (int): Optional, maximum number of jobs submitted at once; further
+        jobs wait without occupying the executor. Default is max_workers.
+    executor (Executor): Optional, existing executor to use instead of creating one.
+        It is not shut down when the runner is closed.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = None,
+        processes: bool = False,
+        max_concurrency: int = None,
+        executor: Executor = None,
+    ):
+        self._owns_executor = executor is None
+        if executor is None:
+            pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+            executor = pool(max_workers=max_workers)
+        self.executor = executor
+        self.max_concurrency = max_concurrency or max_workers
+        self._semaphore = None
+
+    async def __aenter__(self) -> 'AsyncRunner':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Shut down the executor, cancelling jobs that have not started."""
+        if self._owns_executor:
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(self.executor.shutdown, cancel_futures=True),
+            )
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run func(*args, **kwargs) on the executor and return its result."""
+        if self.max_concurrency is None:
+            return await self._submit(func, *args, **kwargs)
+        if self._semaphore is None:
+            # created lazily so that it belongs to the running event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await self._submit(func, *args, **kwargs)
+
+    async def _submit(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def session(self) -> 'Session':
+        """New session sharing parsed structures between the analyses of a request."""
+        return Session(self)
+
+    async def read_pdb_from_bytes(self, id: str, pdb_bytes: bytes) -> Structure:
+        return await self.run(load.read_pdb_from_bytes, id, pdb_bytes)
+
+    async def path_to_distances(
+        self, path: str, model: int = 0, chain: str = 'A', sasa_cutoff: float = None
+    ) -> pd.DataFrame:
+        return await self.run(
+            path_to_distances, path, model=model, chain=chain, sasa_cutoff=sasa_cutoff
+        )
+
+    async def pairwise_distances(
+        self, df_a: pd.DataFrame, df_b: pd.DataFrame = None
+    ) -> pd.DataFrame:
+        return await self.run(distance.pairwise_distances, df_a, df_b)
+
+    async def e_fret_between_conformations(
+        self, df: pd.DataFrame, r0: float
+    ) -> pd.DataFrame:
+        return await self.run(e_fret_between_conformations, df, r0)
+
+    async def read_data_from_bytes(
+        self, bytes_data: bytes, suffix: str = '.xlsx'
+    ) -> pd.DataFrame:
+        return await self.run(read_data_from_bytes, bytes_data, suffix=suffix)
+
+    async def rate_plate_from_bytes(
+        self,
+        bytes_data: bytes,
+        lower_percent: float,
+        upper_percent: float,
+        concentration: float = 1,
+        suffix: str = '.xlsx',
+    ) -> pd.DataFrame:
+        """Read and rate an uploaded plate-reader export in one job."""
+        return await self.run(
+            _rate_plate_from_bytes,
+            bytes_data,
+            suffix,
+            lower_percent,
+            upper_percent,
+            concentration,
+        )
+
+
+class Session:
+    """Analyses of one request, sharing each parsed structure. Structures are keyed
+    by the hash of their contents, and are released when the session closes.
+
+    Parameters:
+    -----------
+    runner (AsyncRunner): Runner executing the jobs.
+    """
+
+    def __init__(self, runner: AsyncRunner):
+        self.runner = runner
+        self._structures: dict[str, asyncio.Future] = {}
+
+    async def __aenter__(self) -> 'Session':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Cancel parses nobody awaits any more and release the parsed structures."""
+        for future in self._structures.values():
+            future.cancel()
+        self._structures.clear()
+
+    async def structure(self, pdb_bytes: bytes, id: str = 'structure') -> Structure:
+        """Parse an uploaded PDB file, or wait for the parse already started by
+        another analysis of the session."""
+        key = hashlib.sha256(pdb_bytes).hexdigest()
+        future = self._structures.get(key)
+        if future is None:
+            future = asyncio.ensure_future(
+                self.runner.read_pdb_from_bytes(id, pdb_bytes)
+            )
+            self._structures[key] = future
+        # one analysis being cancelled must not cancel the parse for the others
+        return await asyncio.shield(future)
+
+    async def chain_to_distances(
+        self,
+        pdb_bytes: bytes,
+        model: int = 0,
+        chain: str = 'A',
+        sasa_cutoff: float = None,
+    ) -> pd.DataFrame:
+        """Pairwise alpha carbon distances of a chain (see fret0.chain_to_distances)."""
+        structure = await self.structure(pdb_bytes)
+        return await self.runner.run(
+            _structure_to_distances, structure, model, chain, sasa_cutoff
+        )
+
+    async def coordinates_from_structure(
+        self,
+        pdb_bytes: bytes,
+        mode: str = 'ILV',
+        model: int = 0,
+        chain: str = 'A',
+    ) -> pd.DataFrame:
+        """Labeled carbon coordinates of a chain for a predefined labeling scheme (see
+        noesy_neighbors.coordinates_from_path_presets)."""
+        structure = await self.structure(pdb_bytes)
+        return await self.runner.run(
+            _structure_to_coordinates, structure, mode, model, chain
+        )
@@ -0,0 +1,267 @@
+"""Memoization of the pipeline functions that parse structure files. Results are keyed
+on the contents of the input files plus the other arguments, and kept in an
+in-memory LRU tier bounded by size, with an optional on-disk tier shared across
+sessions. Re-running an analysis with only downstream parameters changed (e.g. R0)
+then reuses the distance tables instead of re-parsing the structure. Both tiers are
+disabled until enabled with configure.
+
+Usage:
+------
+cache.configure(max_bytes=2**30)  # enable the memory tier
+cache.configure(directory=True)  # enable the disk tier
+cache.clear()
+"""
+
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# bump when the format of memoized results changes so that old disk entries are not
+# reused
+CACHE_VERSION = 1
+
+PLAIN_TYPES = (str, bytes, int, float, bool, type(None), Path)
+
+
+def cache_root() -> Path:
+    """Root directory of smoltools caches, $SMOLTOOLS_CACHE_DIR or ~/.cache/smoltools."""
+    return Path(
+        os.environ.get('SMOLTOOLS_CACHE_DIR', Path.home() / '.cache' / 'smoltools')
+    )
+
+
+def file_hash(path: str | Path) -> str:
+    """SHA-256 hex digest of the contents of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _Cache:
+    """In-memory LRU of results bounded by their total size, and optional directory
+    of pickled results."""
+
+    def __init__(self, max_bytes: int = 0, directory: Path = None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries: OrderedDict[str, tuple[object, int]] = OrderedDict()
+        self.n_bytes = 0
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+        # (path, size, mtime) -> contents hash, so unchanged files are hashed once
+        self.file_hashes: dict[tuple, str] = {}
+        self.lock = threading.RLock()
+
+    def hash_file(self, path: str | Path) -> str:
+        stat = os.stat(path)
+        signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            digest = self.file_hashes.get(signature)
+        if digest is None:
+            digest = file_hash(path)
+            with self.lock:
+                self.file_hashes[signature] = digest
+        return digest
+
+    def get(self, key: str, name: str) -> tuple[bool, object]:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return True, self.entries[key][0]
+        if self.directory is not None:
+            path = self.directory / name / f'{key}.pkl'
+            try:
+                with open(path, 'rb') as file:
+                    value = pickle.load(file)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                with self.lock:
+                    self.stats['disk_hits'] += 1
+                self._remember(key, value)
+                return True, value
+        with self.lock:
+            self.stats['misses'] += 1
+        return False, None
+
+    def put(self, key: str, name: str, value) -> bool:
+        """Store a result, returning whether it was kept in memory."""
+        kept = self._remember(key, value)
+        if self.directory is not None:
+            path = self.directory / name / f'{key}.pkl'
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            with open(temporary, 'wb') as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, path)
+        return kept
+
+    def _remember(self, key: str, value) -> bool:
+        size = _size(value)
+        if not self.max_bytes or size > self.max_bytes:
+            return False
+        with self.lock:
+            if key in self.entries:
+                self.n_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.n_bytes += size
+            self.evict()
+        return True
+
+    def evict(self) -> None:
+        """Drop the least recently used results until the memory tier fits."""
+        with self.lock:
+            while self.entries and self.n_bytes > self.max_bytes:
+                _, (_, size) = self.entries.popitem(last=False)
+                self.n_bytes -= size
+
+    def clear(self, disk: bool = False) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.n_bytes = 0
+            self.file_hashes.clear()
+        if disk and self.directory is not None and self.directory.exists():
+            for path in self.directory.glob('*/*.pkl'):
+                path.unlink(missing_ok=True)
+
+
+_cache = _Cache()
+
+
+def _size(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return 0
+
+
+def _copy(value):
+    """Copy of a cached result, so that callers modifying it do not modify the cache."""
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return value.copy()
+    return value
+
+
+def _is_plain(value) -> bool:
+    if isinstance(value, PLAIN_TYPES):
+        return True
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return all(_is_plain(item) for item in value)
+    if isinstance(value, dict):
+        return all(_is_plain(k) and _is_plain(v) for k, v in value.items())
+    return False
+
+
+def _canonical(value):
+    """Order-independent representation of sets and dictionaries for the key."""
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(item) for item in value), key=repr)
+    if isinstance(value, dict):
+        return sorted(((k, _canonical(v)) for k, v in value.items()), key=repr)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, Path):
+        return str(value)
+    return value
+
+
+def configure(max_bytes: int = None, directory: str | Path | bool = None) -> None:
+    """Configure the memoization tiers.
+
+    Parameters:
+    -----------
+    max_bytes (int): Optional, size limit of the in-memory tier (in bytes). Results
+        larger than the limit are not kept in memory. Use 0 to disable the tier
+        (disabled by default).
+    directory (str | Path | bool): Optional, directory of the on-disk tier. Use True
+        for the default location (under $SMOLTOOLS_CACHE_DIR or ~/.cache/smoltools),
+        or False to disable the tier (disabled by default).
+    """
+    with _cache.lock:
+        if max_bytes is not None:
+            _cache.max_bytes = max_bytes
+            _cache.evict()
+        if directory is True:
+            _cache.directory = cache_root() / 'results'
+        elif directory is False:
+            _cache.directory = None
+        elif directory is not None:
+            _cache.directory = Path(directory)
+
+
+def clear(disk: bool = False) -> None:
+    """Empty the in-memory tier, and the on-disk tier if disk is True."""
+    _cache.clear(disk=disk)
+
+
+def info() -> dict:
+    """Number of memory hits, disk hits and misses, and the number and total size (in
+    bytes) of results in memory."""
+    with _cache.lock:
+        return {
+            **_cache.stats,
+            'entries': len(_cache.entries),
+            'bytes': _cache.n_bytes,
+            'max_bytes': _cache.max_bytes,
+            'directory': _cache.directory,
+        }
+
+
+def memoize(paths: Iterable[str] = ('path',)) -> Callable:
+    """Decorator memoizing a function on the contents of its file arguments and the
+    values of its other arguments. Calls with arguments other than strings, numbers,
+    paths and containers of them (e.g. dataframes) are not memoized.
+
+    Parameters:
+    -----------
+    paths (Iterable[str]): Names of the arguments that are paths to input files
+        (default = ('path',)).
+    """
+    paths = set(paths)
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _cache.max_bytes and _cache.directory is None:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {}
+            for argument, value in bound.arguments.items():
+                if argument in paths and isinstance(value, (str, Path)):
+                    arguments[argument] = ('file', _cache.hash_file(value))
+                elif _is_plain(value):
+                    arguments[argument] = _canonical(value)
+                else:
+                    return func(*args, **kwargs)
+
+            key = hashlib.sha256(
+                repr((name, CACHE_VERSION, sorted(arguments.items()))).encode()
+            ).hexdigest()
+            found, value = _cache.get(key, name)
+            if found:
+                return _copy(value)
+            value = func(*args, **kwargs)
+            # results too large to keep in memory are returned without a copy
+            return _copy(value) if _cache.put(key, name, value) else value
+
+        return wrapper
+
+    return decorator
@@ -1,4 +1,14 @@
-from smoltools.calculate.distance import (
-    pairwise_distances,
-    pairwise_distances_between_conformations,
+from smoltools._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    attributes={
+        'pairwise_distances': 'smoltools.calculate.distance',
+        'assembly_distances': 'smoltools.calculate.distance',
+        'pairwise_distances_between_conformations': 'smoltools.calculate.distance',
+        'residue_distances': 'smoltools.calculate.residues',
+        'coarse_grain_matrix': 'smoltools.calculate.residues',
+        'neighbor_pairs': 'smoltools.calculate.contacts',
+        'interface_contacts': 'smoltools.calculate.contacts',
+    },
 )
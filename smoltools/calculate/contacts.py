@@ -0,0 +1,150 @@
+"""Functions for finding atom pairs within a distance cutoff, within and between
+chains, without calculating the full cross product of pairwise distances."""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from smoltools.profiling import instrument
+
+
+def _coordinates(df: pd.DataFrame) -> np.ndarray:
+    return df.loc[:, ['x', 'y', 'z']].to_numpy(dtype=float)
+
+
+@instrument
+def neighbor_pairs(
+    df_a: pd.DataFrame, df_b: pd.DataFrame = None, cutoff: float = 10
+) -> pd.DataFrame:
+    """Given two dataframes with 3D coordinates of each atom, find every pair of atoms
+    within the cutoff of each other using a spatial index and return their distances
+    in tidy form.
+
+    Parameters:
+    -----------
+    df_a (DataFrame): Dataframe with the atom IDs as the index and the x, y, z
+        coordinate of each atom as the columns.
+    df_b (DataFrame): Optional, second coordinate dataframe. Default is to find
+        pairs within df_a.
+    cutoff (float): Maximum distance (in angstroms) between atom pairs (default = 10).
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the atom IDs of each atom pair within the cutoff and
+        the distance (in angstroms) between each pair.
+    """
+    if df_b is None:
+        df_b = df_a
+
+    pairs = cKDTree(_coordinates(df_a)).sparse_distance_matrix(
+        cKDTree(_coordinates(df_b)), cutoff, output_type='ndarray'
+    )
+    return pd.DataFrame(
+        {
+            'id_1': df_a.index[pairs['i']],
+            'id_2': df_b.index[pairs['j']],
+            'distance': pairs['v'],
+        }
+    )
+
+
+def _superposition_rmsd(p: np.ndarray, q: np.ndarray) -> float:
+    """Root mean square deviation between two sets of points after optimal rigid
+    superposition (Kabsch algorithm).
+    """
+    p = p - p.mean(axis=0)
+    q = q - q.mean(axis=0)
+    u, s, vt = np.linalg.svd(p.T @ q)
+    if np.linalg.det(u @ vt) < 0:
+        s[-1] = -s[-1]
+    squared = ((p**2).sum() + (q**2).sum() - 2 * s.sum()) / len(p)
+    return float(np.sqrt(max(squared, 0)))
+
+
+def _is_equivalent(
+    chains: dict[str, pd.DataFrame],
+    interface: tuple[str, str],
+    other: tuple[str, str],
+    tolerance: float,
+) -> bool:
+    """Whether two chain pairs are related by a rigid transformation, i.e. are copies
+    of the same interface in a symmetric assembly.
+    """
+    if not all(
+        chains[a].index.equals(chains[b].index) for a, b in zip(interface, other)
+    ):
+        return False
+    return (
+        _superposition_rmsd(
+            np.concatenate([_coordinates(chains[chain]) for chain in interface]),
+            np.concatenate([_coordinates(chains[chain]) for chain in other]),
+        )
+        <= tolerance
+    )
+
+
+@instrument
+def interface_contacts(
+    chains: dict[str, pd.DataFrame],
+    cutoff: float = 10,
+    symmetry_tolerance: float = 0.25,
+) -> pd.DataFrame:
+    """Find every pair of atoms within the cutoff of each other between each pair of
+    chains. Interfaces of symmetric homo-oligomers that superimpose onto an interface
+    that has already been calculated are reused instead of recalculated.
+
+    Parameters:
+    -----------
+    chains (dict[str, DataFrame]): Dictionary mapping chain IDs to dataframes with
+        the atom IDs as the index and the x, y, z coordinate of each atom as the
+        columns.
+    cutoff (float): Maximum distance (in angstroms) between atom pairs (default = 10).
+    symmetry_tolerance (float): Maximum RMSD (in angstroms) between two chain pairs
+        for one interface to be reused for the other (default = 0.25). Reused
+        distances can differ from the true distances by up to about twice this
+        value. Set to None to calculate every interface.
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the chain IDs and atom IDs of each interchain atom pair
+        within the cutoff and the distance (in angstroms) between each pair. Empty if
+        there are fewer than two chains.
+    """
+    calculated = {}
+    tables = []
+    for interface in itertools.combinations(chains, 2):
+        contacts = None
+        if symmetry_tolerance is not None:
+            for known, known_contacts in calculated.items():
+                if _is_equivalent(chains, known, interface, symmetry_tolerance):
+                    contacts = known_contacts
+                    break
+                if _is_equivalent(chains, known[::-1], interface, symmetry_tolerance):
+                    contacts = known_contacts.rename(
+                        columns={'id_1': 'id_2', 'id_2': 'id_1'}
+                    )
+                    break
+
+        if contacts is None:
+            chain_1, chain_2 = interface
+            contacts = neighbor_pairs(chains[chain_1], chains[chain_2], cutoff=cutoff)
+            calculated[interface] = contacts
+
+        tables.append(contacts.assign(chain_1=interface[0], chain_2=interface[1]))
+
+    if not tables:
+        # fewer than two chains have no interfaces
+        return pd.DataFrame(
+            {
+                'chain_1': pd.Series(dtype=str),
+                'id_1': pd.Series(dtype=str),
+                'chain_2': pd.Series(dtype=str),
+                'id_2': pd.Series(dtype=str),
+                'distance': pd.Series(dtype=float),
+            }
+        )
+    return pd.concat(tables, ignore_index=True).loc[
+        :, ['chain_1', 'id_1', 'chain_2', 'id_2', 'distance']
+    ]
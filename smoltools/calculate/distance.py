@@ -1,43 +1,263 @@
 """Functions for calculating atomic distances."""
 
+import itertools
+
 import numpy as np
 import pandas as pd
 
 import scipy.spatial.distance as ssd
 
+from smoltools.calculate.contacts import _superposition_rmsd
+from smoltools.pdbtools.shared import AtomArrays
+from smoltools.profiling import instrument
+
+
+def _coordinates(coords: pd.DataFrame | AtomArrays) -> pd.DataFrame | np.ndarray:
+    return coords.coords if isinstance(coords, AtomArrays) else coords
+
+
+def _ids(coords: pd.DataFrame | AtomArrays) -> pd.Index:
+    return pd.Index(coords.ids()) if isinstance(coords, AtomArrays) else coords.index
+
 
-def _pairwise_distance(df_a: pd.DataFrame, df_b: pd.DataFrame) -> np.ndarray:
+@instrument
+def _pairwise_distance(
+    df_a: pd.DataFrame | AtomArrays, df_b: pd.DataFrame | AtomArrays
+) -> np.ndarray:
     """Return the euclidean distance between all 3D coordinates."""
-    return ssd.cdist(df_a, df_b, 'euclidean')
+    return ssd.cdist(_coordinates(df_a), _coordinates(df_b), 'euclidean')
 
 
-def _tidy_pairwise_distances(df: pd.DataFrame) -> pd.DataFrame:
+# number of distances calculated at once in compact mode, bounding the float64
+# scratch space next to the float32 result
+BLOCK_SIZE = 1 << 22
+
+
+@instrument
+def _tidy_pairwise_distances(df: pd.DataFrame, compact: bool = False) -> pd.DataFrame:
     """Take a square dataframe of pairwise distances and convert it to tidy format."""
+    if compact:
+        return _compact_tidy(df.to_numpy(dtype=np.float32).T, df.index, df.columns)
     return df.melt(value_name='distance', ignore_index=False).reset_index()
 
 
-def pairwise_distances(df_a: pd.DataFrame, df_b: pd.DataFrame = None) -> pd.DataFrame:
+def _compact_tidy(
+    distances: np.ndarray, ids_1: pd.Index, ids_2: pd.Index
+) -> pd.DataFrame:
+    """Tidy table of an id_2 x id_1 array of distances, in the same order as
+    _tidy_pairwise_distances, with both ID columns categoricals of one dtype.
+    """
+    id_dtype = pd.CategoricalDtype(pd.Index(pd.unique(ids_1.append(ids_2))))
+    codes_1 = id_dtype.categories.get_indexer(ids_1).astype(np.int32)
+    codes_2 = id_dtype.categories.get_indexer(ids_2).astype(np.int32)
+    return pd.DataFrame(
+        {
+            'id_1': pd.Categorical.from_codes(
+                np.tile(codes_1, len(codes_2)), dtype=id_dtype
+            ),
+            'id_2': pd.Categorical.from_codes(
+                np.repeat(codes_2, len(codes_1)), dtype=id_dtype
+            ),
+            'distance': distances.ravel(),
+        }
+    )
+
+
+@instrument
+def _blocked_pairwise_distance(
+    df_a: pd.DataFrame | AtomArrays, df_b: pd.DataFrame | AtomArrays
+) -> np.ndarray:
+    """Return the float32 euclidean distance between all 3D coordinates, as a
+    df_b x df_a array calculated a block of rows at a time."""
+    coords_a = np.asarray(_coordinates(df_a), dtype=float)
+    coords_b = np.asarray(_coordinates(df_b), dtype=float)
+    distances = np.empty((len(coords_b), len(coords_a)), dtype=np.float32)
+    step = max(BLOCK_SIZE // max(len(coords_a), 1), 1)
+    for start in range(0, len(coords_b), step):
+        distances[start : start + step] = ssd.cdist(
+            coords_b[start : start + step], coords_a, 'euclidean'
+        )
+    return distances
+
+
+@instrument
+def pairwise_distances(
+    df_a: pd.DataFrame | AtomArrays,
+    df_b: pd.DataFrame | AtomArrays = None,
+    compact: bool = False,
+) -> pd.DataFrame:
     """Given two dataframes with 3D coordinates of each residue, calculate the pairwise
-    distance between each residue and return in tidy form.
+    distance between each residue and return in tidy form. Atom arrays can be given
+    instead of dataframes, and are labeled by atom ID (e.g. 'ILE12-CD1').
+
+    With compact, the atom IDs are categoricals sharing one set of categories and the
+    distances are float32, which takes a fraction of the memory.
     """
     if df_b is None:
         df_b = df_a
 
+    if compact:
+        return _compact_tidy(
+            _blocked_pairwise_distance(df_a, df_b), _ids(df_a), _ids(df_b)
+        )
+
     return (
         pd.DataFrame(
             _pairwise_distance(df_a, df_b),
-            index=df_a.index,
-            columns=df_b.index,
+            index=_ids(df_a),
+            columns=_ids(df_b),
         )
         .rename_axis(index='id_1', columns='id_2')
         .pipe(_tidy_pairwise_distances)
     )
 
 
+def _is_equivalent_block(
+    coords: list[np.ndarray],
+    signatures: list[bytes],
+    block: tuple[int, int],
+    other: tuple[int, int],
+    tolerance: float,
+) -> bool:
+    """Whether two blocks of chains have the same atoms and are related by a rigid
+    transformation, i.e. are copies of each other in a symmetric assembly.
+    """
+    if any(signatures[a] != signatures[b] for a, b in zip(block, other)):
+        return False
+    return (
+        _superposition_rmsd(
+            np.concatenate([coords[chain] for chain in block]),
+            np.concatenate([coords[chain] for chain in other]),
+        )
+        <= tolerance
+    )
+
+
+@instrument
+def assembly_distances(
+    atoms: AtomArrays, ids: np.ndarray = None, symmetry_tolerance: float = 0.25
+) -> pd.DataFrame:
+    """Calculate the pairwise distances between the atoms of every chain of an
+    assembly, within and between chains, and return them in tidy form. The distance
+    matrix is calculated in blocks of chain pairs, and only one triangle of it is
+    calculated. Blocks between identical subunits that superimpose onto a block that
+    has already been calculated (e.g. the chains of a symmetric homo-oligomer, or
+    their interfaces) are reused instead of recalculated.
+
+    Parameters:
+    -----------
+    atoms (AtomArrays): Atoms of the chains (see pdbtools.select.get_chains).
+    ids (ndarray): Optional, ID of each atom. Default is the atom IDs (residue name,
+        residue number, atom name, e.g. 'ILE12-CD1').
+    symmetry_tolerance (float): Maximum RMSD (in angstroms) between two blocks for
+        one to be reused for the other (default = 0.25). Reused distances can differ
+        from the true distances by up to about twice this value. Set to None to
+        calculate every block.
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the chain IDs and atom IDs of each atom pair, as
+        categoricals, and the distance (in angstroms) between each pair.
+    """
+    if ids is None:
+        ids = atoms.ids()
+    id_codes, id_names = pd.factorize(np.asarray(ids, dtype=object))
+    chain_codes, first = np.unique(atoms.chain_codes, return_index=True)
+    chain_codes = chain_codes[np.argsort(first)]
+    chains = [np.flatnonzero(atoms.chain_codes == code) for code in chain_codes]
+    coords = [atoms.coords[index].astype(float) for index in chains]
+    # chains with the same atom IDs in the same order are identical subunits
+    signatures = [id_codes[index].tobytes() for index in chains]
+    bounds = np.cumsum([0] + [len(index) for index in chains])
+    blocks = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    matrix = np.empty((bounds[-1], bounds[-1]))
+    calculated = []
+    for i, j in itertools.combinations_with_replacement(range(len(chains)), 2):
+        block = None
+        if symmetry_tolerance is not None:
+            for k, l in calculated:
+                if _is_equivalent_block(
+                    coords, signatures, (k, l), (i, j), symmetry_tolerance
+                ):
+                    block = matrix[blocks[k], blocks[l]]
+                    break
+                if _is_equivalent_block(
+                    coords, signatures, (l, k), (i, j), symmetry_tolerance
+                ):
+                    block = matrix[blocks[l], blocks[k]]
+                    break
+        if block is None:
+            block = ssd.cdist(coords[i], coords[j], 'euclidean')
+            calculated.append((i, j))
+        matrix[blocks[i], blocks[j]] = block
+        matrix[blocks[j], blocks[i]] = block.T
+
+    # the matrix is symmetric, so row-major order lists each column of it in turn,
+    # the same order as pairwise_distances
+    order = np.concatenate(chains)
+    n_atoms = len(order)
+    atom_ids = id_codes[order].astype(np.int32)
+    atom_chains = np.repeat(np.arange(len(chains), dtype=np.int16), np.diff(bounds))
+    chain_dtype = pd.CategoricalDtype([atoms.chain_ids[code] for code in chain_codes])
+    id_dtype = pd.CategoricalDtype(id_names)
+    return pd.DataFrame(
+        {
+            'chain_1': pd.Categorical.from_codes(
+                np.tile(atom_chains, n_atoms), dtype=chain_dtype
+            ),
+            'id_1': pd.Categorical.from_codes(
+                np.tile(atom_ids, n_atoms), dtype=id_dtype
+            ),
+            'chain_2': pd.Categorical.from_codes(
+                np.repeat(atom_chains, n_atoms), dtype=chain_dtype
+            ),
+            'id_2': pd.Categorical.from_codes(
+                np.repeat(atom_ids, n_atoms), dtype=id_dtype
+            ),
+            'distance': matrix.ravel(),
+        }
+    )
+
+
+def _shares_id_categories(df_a: pd.DataFrame, df_b: pd.DataFrame) -> bool:
+    """Whether both tables are compact distance tables with the same ID categories."""
+    dtypes = {df[column].dtype for df in (df_a, df_b) for column in ('id_1', 'id_2')}
+    return (
+        len(dtypes) == 1
+        and isinstance(next(iter(dtypes)), pd.CategoricalDtype)
+        and list(df_a.columns) == list(df_b.columns) == ['id_1', 'id_2', 'distance']
+    )
+
+
+def _pair_codes(df: pd.DataFrame) -> pd.Index:
+    """Integer key of each (id_1, id_2) pair of a compact distance table."""
+    n_ids = len(df.id_1.cat.categories)
+    return pd.Index(
+        df.id_1.cat.codes.to_numpy(dtype=np.int64) * n_ids
+        + df.id_2.cat.codes.to_numpy(dtype=np.int64)
+    )
+
+
+@instrument
 def _merge_pairwise_distances(df_a: pd.DataFrame, df_b: pd.DataFrame) -> pd.DataFrame:
     """Merge two DataFrames of pairwise distances (intersection of residues pairs in
     each dataset)
     """
+    if _shares_id_categories(df_a, df_b):
+        # compact tables are joined on the integer codes of each pair instead
+        pairs_a, pairs_b = _pair_codes(df_a), _pair_codes(df_b)
+        if pairs_a.is_unique and pairs_b.is_unique:
+            position = pairs_b.get_indexer(pairs_a)
+            found = position >= 0
+            return pd.DataFrame(
+                {
+                    'id_1': df_a.id_1.array[found],
+                    'id_2': df_a.id_2.array[found],
+                    'distance_a': df_a.distance.to_numpy()[found],
+                    'distance_b': df_b.distance.to_numpy()[position[found]],
+                }
+            )
     return pd.merge(
         df_a,
         df_b,
@@ -47,6 +267,7 @@ def _merge_pairwise_distances(df_a: pd.DataFrame, df_b: pd.DataFrame) -> pd.Data
     )
 
 
+@instrument
 def pairwise_distances_between_conformations(
     distances_a: pd.DataFrame, distances_b: pd.DataFrame
 ) -> pd.DataFrame:
@@ -0,0 +1,105 @@
+"""Functions for coarse-graining atom-level distances into residue-level distances."""
+
+import numpy as np
+import pandas as pd
+
+from smoltools.calculate.distance import _pairwise_distance
+from smoltools.profiling import instrument
+
+COARSE_GRAIN_METHODS = ['min', 'r6']
+
+
+def residue_labels(ids: pd.Index) -> pd.Index:
+    """Residue part of atom IDs (e.g. 'ILE12' for 'ILE12-CD1')."""
+    return pd.Index(ids.str.split('-').str[0], name=ids.name)
+
+
+def _group_atoms(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, pd.Index]:
+    """Order atoms so that each residue is contiguous (residues kept in order of first
+    appearance), and return the coordinates in that order, the offset at which each
+    residue starts and the residue labels.
+    """
+    codes, residues = pd.factorize(residue_labels(df.index))
+    order = np.argsort(codes, kind='stable')
+    starts = np.searchsorted(codes[order], np.arange(len(residues)))
+    coords = df.loc[:, ['x', 'y', 'z']].to_numpy(dtype=float)[order]
+    return coords, starts, pd.Index(residues)
+
+
+@instrument
+def coarse_grain_matrix(
+    matrix: np.ndarray,
+    row_starts: np.ndarray,
+    col_starts: np.ndarray,
+    method: str = 'min',
+) -> np.ndarray:
+    """Reduce an atom by atom distance matrix to a residue by residue distance matrix
+    using segment-wise reductions over sorted atom index boundaries.
+
+    Parameters:
+    -----------
+    matrix (ndarray): Atom by atom distance matrix, with the atoms of each residue in
+        contiguous rows and columns.
+    row_starts (ndarray): Index of the first row of each residue.
+    col_starts (ndarray): Index of the first column of each residue.
+    method (str): 'min' for the minimum distance between residues, or 'r6' for the
+        <r^-6>^(-1/6) averaged distance between residues (default = 'min').
+
+    Returns:
+    --------
+    ndarray: Residue by residue distance matrix.
+    """
+    if method == 'min':
+        reduced = np.minimum.reduceat(matrix, row_starts, axis=0)
+        return np.minimum.reduceat(reduced, col_starts, axis=1)
+    elif method == 'r6':
+        with np.errstate(divide='ignore'):
+            summed = np.add.reduceat(matrix**-6, row_starts, axis=0)
+            summed = np.add.reduceat(summed, col_starts, axis=1)
+            row_sizes = np.diff(row_starts, append=matrix.shape[0])
+            col_sizes = np.diff(col_starts, append=matrix.shape[1])
+            return (summed / np.outer(row_sizes, col_sizes)) ** (-1 / 6)
+    else:
+        raise ValueError(
+            f'Unknown method {method!r}, choices are {COARSE_GRAIN_METHODS}'
+        )
+
+
+@instrument
+def residue_distances(
+    df_a: pd.DataFrame, df_b: pd.DataFrame = None, method: str = 'min'
+) -> pd.DataFrame:
+    """Given two dataframes with 3D coordinates of each atom, calculate the distance
+    between each pair of residues from the distances between their atoms and return
+    in tidy form.
+
+    Parameters:
+    -----------
+    df_a (DataFrame): Dataframe with the atom IDs (residue number, carbon ID) as the
+        index and the x, y, z coordinate of each atom as the columns.
+    df_b (DataFrame): Optional, second coordinate dataframe. Default is to calculate
+        distances within df_a.
+    method (str): 'min' for the minimum distance between the atoms of two residues,
+        or 'r6' for the <r^-6>^(-1/6) averaged distance (default = 'min').
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the residue IDs of each residue pair and the distance
+        (in angstroms) between each pair.
+    """
+    if df_b is None:
+        df_b = df_a
+
+    coords_a, starts_a, residues_a = _group_atoms(df_a)
+    coords_b, starts_b, residues_b = _group_atoms(df_b)
+    distances = coarse_grain_matrix(
+        _pairwise_distance(coords_a, coords_b), starts_a, starts_b, method=method
+    )
+
+    return pd.DataFrame(
+        {
+            'id_1': np.tile(residues_a, len(residues_b)),
+            'id_2': np.repeat(residues_b, len(residues_a)),
+            'distance': distances.ravel(order='F'),
+        }
+    )
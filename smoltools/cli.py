@@ -0,0 +1,304 @@
+"""Command-line runner for screening many structures with the FRET0 and NOESY neighbors
+pipelines. Jobs from a CSV manifest run on a process pool whose workers are recycled
+and optionally memory-capped. Each job's pairwise distances are written to its own
+Parquet partition as soon as the job finishes, together with the key of the structure
+file contents and parameters it was computed from, so that an interrupted run resumes
+where it stopped.
+
+Usage:
+------
+smoltools MANIFEST STORE [--workers N] [--max-memory MB] [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from smoltools import fret0, noesy_neighbors
+from smoltools.cache import file_hash
+from smoltools.calculate.distance import pairwise_distances
+from smoltools.fret0.efficiency import calculate_e_fret
+from smoltools.noesy_neighbors.main import LABELING_SCHEMES
+from smoltools.tables import load_dataset, partition_ids, stored_key, write_partition
+
+PIPELINES = ['fret0', 'noesy']
+
+MANIFEST_DEFAULTS = {'chain': 'A', 'model': 0, 'mode': 'ILV', 'r0': None}
+
+
+def _default_job_id(job: pd.Series) -> str:
+    parts = [Path(job.path).stem, job.pipeline, f'{job.chain}{job.model}']
+    if job.pipeline == 'noesy':
+        parts.append(job['mode'])
+    elif pd.notna(job.r0):
+        parts.append(f'r0={job.r0:g}')
+    return '_'.join(parts)
+
+
+def read_manifest(path: str | Path) -> pd.DataFrame:
+    """Reads structure jobs from a CSV manifest with a 'path' column (relative to the
+    manifest), a 'pipeline' column ('fret0' or 'noesy') and optional 'job', 'chain',
+    'model', 'mode' (NOESY labeling scheme) and 'r0' (FRET0, to add E_fret) columns.
+
+    Parameters:
+    -----------
+    path (str | Path): Path to a CSV manifest.
+
+    Returns:
+    --------
+    DataFrame: Dataframe with one row per job, with defaults filled in and a unique
+        'job' ID.
+    """
+    path = Path(path)
+    manifest = pd.read_csv(path, dtype={'chain': str})
+    for column in ['path', 'pipeline']:
+        if column not in manifest:
+            raise ValueError(f'Manifest is missing the {column!r} column')
+    manifest['path'] = [str(path.parent / file) for file in manifest.path]
+    for column, default in MANIFEST_DEFAULTS.items():
+        if column not in manifest:
+            manifest[column] = default
+        elif default is not None:
+            manifest[column] = manifest[column].fillna(default)
+    manifest = manifest.astype({'model': int, 'r0': float})
+
+    unknown = set(manifest.pipeline) - set(PIPELINES)
+    if unknown:
+        raise ValueError(
+            f'Unknown pipelines {sorted(unknown)}, choices are {PIPELINES}'
+        )
+    noesy = manifest.pipeline == 'noesy'
+    unknown = set(manifest['mode'][noesy]) - set(LABELING_SCHEMES)
+    if unknown:
+        raise ValueError(
+            f'Unknown modes {sorted(unknown)}, choices are {LABELING_SCHEMES}'
+        )
+
+    if 'job' not in manifest:
+        manifest['job'] = [_default_job_id(job) for _, job in manifest.iterrows()]
+    manifest['job'] = partition_ids(manifest.job, 'job')
+    return manifest
+
+
+def job_key(job: dict) -> str:
+    """Short, stable key identifying a job's structure file contents and parameters."""
+    params = json.dumps(
+        {
+            'file_hash': job['file_hash'],
+            'pipeline': job['pipeline'],
+            'chain': job['chain'],
+            'model': int(job['model']),
+            'mode': job['mode'] if job['pipeline'] == 'noesy' else None,
+            'r0': job['r0'],
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(params.encode()).hexdigest()[:12]
+
+
+def _distances(job: dict) -> pd.DataFrame:
+    if job['pipeline'] == 'fret0':
+        distances = fret0.path_to_distances(
+            job['path'], model=job['model'], chain=job['chain']
+        )
+        if job['r0'] is not None:
+            distances['E_fret'] = calculate_e_fret(distances.distance, job['r0'])
+        return distances
+    coords = noesy_neighbors.coordinates_from_path_presets(
+        job['path'], mode=job['mode'], model=job['model'], chain=job['chain']
+    )
+    return pairwise_distances(coords)
+
+
+def _init_worker(max_memory: int) -> None:
+    """Cap the address space of a worker process (in megabytes), so a job that
+    outgrows it fails with a MemoryError instead of exhausting the machine."""
+    if max_memory is None:
+        return
+    try:
+        import resource
+    except ImportError:
+        # not available on Windows
+        return
+    limit = max_memory * 1024**2
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _run_job(job: dict) -> dict:
+    """Run one job and write its result to its partition of the store."""
+    start = time.perf_counter()
+    try:
+        distances = _distances(job)
+        write_partition(distances, job['store'], {'job': job['job']}, job['key'])
+    except Exception as error:
+        return {
+            'job': job['job'],
+            'status': 'failed',
+            'error': f'{type(error).__name__}: {error}',
+        }
+    return {
+        'job': job['job'],
+        'status': 'completed',
+        'error': None,
+        'key': job['key'],
+        'rows': len(distances),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def run_jobs(
+    manifest: str | Path | pd.DataFrame,
+    store: str | Path,
+    n_workers: int = 1,
+    max_tasks_per_child: int = 1,
+    max_memory: int = None,
+    force: bool = False,
+    verbose: bool = False,
+) -> pd.DataFrame:
+    """Runs a manifest of structure jobs and writes each job's pairwise distances to
+    a Parquet store partitioned by job ID (store/job=<id>/part.parquet). Jobs already
+    completed with the same structure file contents and parameters are skipped.
+
+    Parameters:
+    -----------
+    manifest (str | Path | DataFrame): CSV manifest or manifest dataframe (see
+        read_manifest).
+    store (str | Path): Root directory of the Parquet store.
+    n_workers (int): Number of worker processes (default = 1).
+    max_tasks_per_child (int): Number of jobs after which a worker process is
+        replaced, returning its memory to the system (default = 1).
+    max_memory (int): Optional, address space limit of each worker (in megabytes).
+        Only enforced on Unix.
+    force (bool): Whether to rerun jobs that are already completed (default = False).
+    verbose (bool): Whether to print each job's outcome as it finishes
+        (default = False).
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the job ID, path, status ('completed', 'skipped' or
+        'failed', with the error), rows and seconds of each job.
+    """
+    if not isinstance(manifest, pd.DataFrame):
+        manifest = read_manifest(manifest)
+    store = Path(store)
+    store.mkdir(parents=True, exist_ok=True)
+
+    jobs = []
+    for job in manifest.to_dict('records'):
+        job['r0'] = None if pd.isna(job['r0']) else float(job['r0'])
+        job['model'] = int(job['model'])
+        job['file_hash'] = file_hash(job['path'])
+        job['key'] = job_key(job)
+        job['store'] = str(store)
+        jobs.append(job)
+
+    pending = [
+        job
+        for job in jobs
+        if force or stored_key(store, {'job': job['job']}) != job['key']
+    ]
+
+    outcomes = {}
+    if pending:
+        with multiprocessing.Pool(
+            processes=max(1, min(n_workers, len(pending))),
+            initializer=_init_worker,
+            initargs=(max_memory,),
+            maxtasksperchild=max_tasks_per_child,
+        ) as pool:
+            for outcome in pool.imap_unordered(_run_job, pending):
+                outcomes[outcome['job']] = outcome
+                if verbose:
+                    print(
+                        f"{outcome['job']}\t{outcome['status']}"
+                        + (f"\t{outcome['error']}" if outcome['error'] else ''),
+                        flush=True,
+                    )
+
+    skipped = {'status': 'skipped', 'error': None}
+    return pd.DataFrame(
+        [
+            {
+                'job': job['job'],
+                'path': job['path'],
+                **{
+                    key: value
+                    for key, value in outcomes.get(job['job'], skipped).items()
+                    if key != 'job'
+                },
+            }
+            for job in jobs
+        ],
+        columns=['job', 'path', 'status', 'error', 'key', 'rows', 'seconds'],
+    )
+
+
+def load_results(
+    store: str | Path, jobs: list[str] = None, columns: list[str] = None
+) -> pd.DataFrame:
+    """Reads job results from a Parquet store written by run_jobs.
+
+    Parameters:
+    -----------
+    store (str | Path): Root directory of the Parquet store.
+    jobs (list[str]): Optional, job IDs to read. Default is all jobs.
+    columns (list[str]): Optional, columns to read. Default is all columns.
+
+    Returns:
+    --------
+    DataFrame: Dataframe of pairwise distances, with the 'job' partition key as a
+        column. Columns only some jobs have (e.g. 'E_fret') are null for the others.
+    """
+    filters = None
+    if jobs is not None:
+        filters = [('job', 'in', [str(job) for job in jobs])]
+    return load_dataset(store, ['job'], columns=columns, filters=filters)
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='smoltools',
+        description='Run a CSV manifest of FRET0 and NOESY neighbors structure jobs '
+        'into a Parquet store, resuming from completed jobs.',
+    )
+    parser.add_argument('manifest', help='CSV manifest of structure jobs')
+    parser.add_argument('store', help='root directory of the Parquet store')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), dest='n_workers')
+    parser.add_argument(
+        '--max-tasks-per-child',
+        type=int,
+        default=1,
+        help='jobs run by a worker before it is replaced (default = 1)',
+    )
+    parser.add_argument(
+        '--max-memory',
+        type=int,
+        default=None,
+        help='address space limit of each worker, in megabytes',
+    )
+    parser.add_argument(
+        '--force', action='store_true', help='rerun jobs that are already completed'
+    )
+    args = parser.parse_args(argv)
+
+    summary = run_jobs(**vars(args), verbose=True)
+    counts = summary.status.value_counts()
+    print(
+        ', '.join(
+            f'{counts.get(status, 0)} {status}'
+            for status in ['completed', 'skipped', 'failed']
+        ),
+        file=sys.stderr,
+    )
+    return int((summary.status == 'failed').any())
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
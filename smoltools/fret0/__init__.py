@@ -1,6 +1,17 @@
-from smoltools.fret0.main import path_to_distances, chain_to_distances
-from smoltools.fret0.efficiency import e_fret_between_conformations
-from smoltools.calculate.distance import pairwise_distances_between_conformations
-from smoltools.fret0.utils import lower_triangle
+from smoltools._lazy import attach
 
-import smoltools.fret0.plots as plots
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['plots'],
+    attributes={
+        'path_to_distances': 'smoltools.fret0.main',
+        'chain_to_distances': 'smoltools.fret0.main',
+        'assembly_to_distances': 'smoltools.fret0.main',
+        'path_to_assembly_distances': 'smoltools.fret0.main',
+        'e_fret_between_conformations': 'smoltools.fret0.efficiency',
+        'calculate_e_fret': 'smoltools.fret0.efficiency',
+        'pairwise_distances_between_conformations': 'smoltools.calculate.distance',
+        'residue_distances': 'smoltools.calculate.residues',
+        'lower_triangle': 'smoltools.fret0.utils',
+    },
+)
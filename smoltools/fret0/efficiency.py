@@ -3,9 +3,22 @@
 import numpy as np
 import pandas as pd
 
+from smoltools.tables import compact_dtypes
+from smoltools.profiling import instrument
 
-def _calculate_e_fret(distance: pd.Series, r0: float) -> pd.Series:
-    """Calculate FRET efficiency based on inter-residue distances for a given r0."""
+
+def calculate_e_fret(distance: pd.Series, r0: float) -> pd.Series:
+    """Calculate FRET efficiency based on inter-residue distances for a given r0.
+
+    Parameters:
+    -----------
+    distance (Series): Distances (in angstroms).
+    r0 (float): Forster distance (in angstroms).
+
+    Returns:
+    --------
+    Series: FRET efficiency at each distance.
+    """
     return 1 / (1 + (distance / r0) ** 6)
 
 
@@ -14,7 +27,10 @@ def _calculate_delta_e_fret(e_fret_a: pd.Series, e_fret_b: pd.Series) -> pd.Seri
     return e_fret_a - e_fret_b
 
 
-def e_fret_between_conformations(df: pd.DataFrame, r0: float) -> pd.DataFrame:
+@instrument
+def e_fret_between_conformations(
+    df: pd.DataFrame, r0: float, compact: bool = False
+) -> pd.DataFrame:
     """Calculate FRET efficiencies from a pairwise distance DataFrame.
 
     Parameters:
@@ -22,15 +38,31 @@ def e_fret_between_conformations(df: pd.DataFrame, r0: float) -> pd.DataFrame:
     df (DataFrame): DataFrame with pairwise distances for conformation A and
         conformation B.
     r0 (float): R0 values used for calculating FRET efficiency.
+    compact (bool): Whether to return the atom IDs as categoricals sharing one set of
+        categories and the efficiencies as float32 (default = False).
 
     Returns:
     --------
     DataFrame: DataFrame with FRET efficiency calculate for each residue
         pair, as well as the change in FRET efficiency between conformations.
     """
+    if compact:
+        e_fret_a = calculate_e_fret(df.distance_a.astype(np.float32), r0)
+        e_fret_b = calculate_e_fret(df.distance_b.astype(np.float32), r0)
+        return compact_dtypes(
+            pd.DataFrame(
+                {
+                    'id_1': df.id_1,
+                    'id_2': df.id_2,
+                    'E_fret_a': e_fret_a,
+                    'E_fret_b': e_fret_b,
+                    'delta_E_fret': _calculate_delta_e_fret(e_fret_a, e_fret_b),
+                }
+            )
+        )
     return df[['id_1', 'id_2']].assign(
-        E_fret_a=_calculate_e_fret(df.distance_a, r0),
-        E_fret_b=_calculate_e_fret(df.distance_b, r0),
+        E_fret_a=calculate_e_fret(df.distance_a, r0),
+        E_fret_b=calculate_e_fret(df.distance_b, r0),
         delta_E_fret=lambda x: _calculate_delta_e_fret(x.E_fret_a, x.E_fret_b),
     )
 
@@ -38,8 +70,8 @@ def e_fret_between_conformations(df: pd.DataFrame, r0: float) -> pd.DataFrame:
 def generate_r0_curve(distance_a: float, distance_b: float) -> pd.DataFrame:
     """Generate data for FRET efficiency as a function of R0 for two distances."""
     r0_range = list(range(20, 81))
-    e_fret_a = [_calculate_e_fret(distance_a, r0) for r0 in r0_range]
-    e_fret_b = [_calculate_e_fret(distance_b, r0) for r0 in r0_range]
+    e_fret_a = [calculate_e_fret(distance_a, r0) for r0 in r0_range]
+    e_fret_b = [calculate_e_fret(distance_b, r0) for r0 in r0_range]
     e_fret = pd.DataFrame(
         {
             'r0': r0_range,
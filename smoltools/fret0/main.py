@@ -1,18 +1,28 @@
 from Bio.PDB.Chain import Chain
+from Bio.PDB.Structure import Structure
 import pandas as pd
 
 import smoltools.calculate.distance as distance
 from smoltools.pdbtools import path_to_chain, coordinate_table
+import smoltools.pdbtools.load as load
 import smoltools.pdbtools.select as select
+from smoltools.pdbtools.shared import AtomArrays
+from smoltools.cache import memoize
+from smoltools.profiling import instrument
 
 
-def chain_to_distances(chain: Chain, sasa_cutoff: float = None) -> pd.DataFrame:
+@instrument
+def chain_to_distances(
+    chain: Chain, sasa_cutoff: float = None, compact: bool = False
+) -> pd.DataFrame:
     """Calculate pairwise distances of alpha carbons in the given Chain object.
     Use if a chain object is already loaded.
 
     Parameters:
     -----------
     chain (Chain): PDB Chain object.
+    compact (bool): Whether to return the atom IDs as categoricals and the distances
+        as float32 (see calculate.distance.pairwise_distances) (default = False).
 
     Returns:
     --------
@@ -29,11 +39,17 @@ def chain_to_distances(chain: Chain, sasa_cutoff: float = None) -> pd.DataFrame:
         .set_index('id')
         .loc[:, ['x', 'y', 'z']]
     )
-    return distance.pairwise_distances(coords)
+    return distance.pairwise_distances(coords, compact=compact)
 
 
+@instrument
+@memoize()
 def path_to_distances(
-    path: str, model: int = 0, chain: str = 'A', sasa_cutoff: float = None
+    path: str,
+    model: int = 0,
+    chain: str = 'A',
+    sasa_cutoff: float = None,
+    compact: bool = False,
 ) -> pd.DataFrame:
     """Calculate pairwise distances of alpha carbons in the given Chain object.
     Use if starting directly from PDB file.
@@ -43,6 +59,8 @@ def path_to_distances(
     path (str): Path to PDB file.
     model (int): Model number of desired chain (default = 0)
     chain (str): Chain ID of desired chain (default = 'A')
+    compact (bool): Whether to return the atom IDs as categoricals and the distances
+        as float32 (see calculate.distance.pairwise_distances) (default = False).
 
     Returns:
     --------
@@ -50,4 +68,85 @@ def path_to_distances(
         and the distance (in angstroms) between each pair.
     """
     chain = path_to_chain(path, model=model, chain=chain)
-    return chain_to_distances(chain, sasa_cutoff=sasa_cutoff)
+    return chain_to_distances(chain, sasa_cutoff=sasa_cutoff, compact=compact)
+
+
+@instrument
+def assembly_to_distances(
+    structure: Structure | AtomArrays,
+    model: int = 0,
+    chains: list[str] = None,
+    sasa_cutoff: float = None,
+    symmetry_tolerance: float = 0.25,
+) -> pd.DataFrame:
+    """Calculate pairwise distances of alpha carbons within and between the chains of
+    an assembly (see calculate.distance.assembly_distances). Use if a structure is
+    already loaded.
+
+    Parameters:
+    -----------
+    structure (Structure | AtomArrays): PDB structure object, or atom arrays of one
+        model.
+    model (int): Model number of desired chains (default = 0)
+    chains (list[str]): Optional, chain IDs of desired chains. Default is every chain
+        in the model.
+    sasa_cutoff (float): Optional, minimum B factor (e.g. solvent accessibility
+        stored in the B factor column) of the alpha carbons to keep.
+    symmetry_tolerance (float): Maximum RMSD (in angstroms) between identical
+        subunits for their distances to be reused (default = 0.25). Set to None to
+        calculate every distance.
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the chain IDs and atom IDs (residue number) of each atom
+        pair and the distance (in angstroms) between each pair.
+    """
+    atoms = select.get_chains(structure, model=model, chains=chains)
+    residues = select.get_residues(atoms)
+    alpha_carbons = select.get_alpha_carbons(residues)
+    if sasa_cutoff is not None:
+        alpha_carbons = select.filter_by_b_factor(alpha_carbons, cutoff=sasa_cutoff)
+    return distance.assembly_distances(
+        alpha_carbons,
+        ids=alpha_carbons.ids(with_atom=False),
+        symmetry_tolerance=symmetry_tolerance,
+    )
+
+
+@instrument
+@memoize()
+def path_to_assembly_distances(
+    path: str,
+    model: int = 0,
+    chains: list[str] = None,
+    sasa_cutoff: float = None,
+    symmetry_tolerance: float = 0.25,
+) -> pd.DataFrame:
+    """Calculate pairwise distances of alpha carbons within and between the chains of
+    an assembly. Use if starting directly from PDB file.
+
+    Parameters:
+    -----------
+    path (str): Path to PDB file.
+    model (int): Model number of desired chains (default = 0)
+    chains (list[str]): Optional, chain IDs of desired chains. Default is every chain
+        in the model.
+    sasa_cutoff (float): Optional, minimum B factor (e.g. solvent accessibility
+        stored in the B factor column) of the alpha carbons to keep.
+    symmetry_tolerance (float): Maximum RMSD (in angstroms) between identical
+        subunits for their distances to be reused (default = 0.25). Set to None to
+        calculate every distance.
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the chain IDs and atom IDs (residue number) of each atom
+        pair and the distance (in angstroms) between each pair.
+    """
+    structure = load.read_pdb_from_path(path)
+    return assembly_to_distances(
+        structure,
+        model=model,
+        chains=chains,
+        sasa_cutoff=sasa_cutoff,
+        symmetry_tolerance=symmetry_tolerance,
+    )
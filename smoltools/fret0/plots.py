@@ -6,7 +6,10 @@ import pandas as pd
 
 from smoltools.fret0.efficiency import generate_r0_curve
 import smoltools.resources.colors as colors
-from smoltools.fret0.utils import lower_triangle, sort_table
+from smoltools.fret0.utils import extract_residue_number, lower_triangle, sort_table
+from smoltools.plotting.raster import raster_heatmap
+from smoltools.plotting.transport import chart_data, encode_pairs, lookup_ids
+from smoltools.profiling import instrument
 
 
 def _get_size(n_residues: int) -> int:
@@ -14,7 +17,9 @@ def _get_size(n_residues: int) -> int:
     return min(MAX_SIZE, n_residues * 10)
 
 
-def _distance_map_base(df: pd.DataFrame) -> alt.Chart:
+def _distance_map_base(
+    df: pd.DataFrame, compact: bool = False, data_path: str = None
+) -> alt.Chart:
     """Common distance map components."""
     df = sort_table(df)
 
@@ -23,9 +28,15 @@ def _distance_map_base(df: pd.DataFrame) -> alt.Chart:
 
     axis_config = {'sort': None, 'axis': alt.Axis(labels=False, ticks=False)}
 
+    if compact:
+        values = [column for column in df.columns if column not in ('id_1', 'id_2')]
+        data, lookup = encode_pairs(df, values, decimals=3)
+        chart = lookup_ids(alt.Chart(chart_data(data, data_path)), lookup)
+    else:
+        chart = alt.Chart(chart_data(df, data_path))
+
     return (
-        alt.Chart(df)
-        .mark_rect()
+        chart.mark_rect()
         .encode(
             x=alt.X('id_1:N', title='Residue #', **axis_config),
             y=alt.Y('id_2:N', title='Residue #', **axis_config),
@@ -34,21 +45,77 @@ def _distance_map_base(df: pd.DataFrame) -> alt.Chart:
     )
 
 
-def delta_distance_map(df: pd.DataFrame, cutoff: float = 5) -> alt.Chart:
+def _raster_map_base(
+    df: pd.DataFrame,
+    value: str,
+    tooltip: list[alt.Tooltip],
+    color_title: str,
+    range_max: float,
+    n_residues: int,
+    residues: pd.Index,
+    block_size: int,
+) -> alt.Chart:
+    """Common rasterized distance map components."""
+    residues = residues.sort_values(key=extract_residue_number)
+    return raster_heatmap(
+        df,
+        value,
+        significant=df[value].notna(),
+        tooltip=tooltip,
+        color_title=color_title,
+        scheme='redblue',
+        domain=(-range_max, range_max),
+        x_order=residues,
+        y_order=residues,
+        x_title='Residue #',
+        y_title='Residue #',
+        size=_get_size(n_residues),
+        block_size=block_size,
+        block_method='absmax',
+    )
+
+
+@instrument
+def delta_distance_map(
+    df: pd.DataFrame, cutoff: float = 5, raster: bool = False, block_size: int = 1
+) -> alt.Chart:
     """Heatmap of pairwise distance between each alpha carbon between two conformations.
 
     Parameters:
     -----------
     DataFrame: Dataframe with the atom IDs (residue number) of each alpha carbon pair
         and the distance (in angstroms) between each pair.
+    raster (bool): Render the heatmap server-side into an image. Use for large maps
+        (default = False).
+    block_size (int): Number of residues reduced into each pixel in raster mode,
+        keeping the largest change in each block (default = 1).
 
     Returns:
     --------
     Chart: Altair chart object.
     """
+    residues = pd.Index(df.id_1.unique())
     df = df.loc[lambda x: lower_triangle(x) & (x.delta_distance.abs() > cutoff)]
 
     range_max = df.delta_distance.abs().max()
+    tooltip = [
+        alt.Tooltip('id_1', title='Residue #1'),
+        alt.Tooltip('id_2', title='Residue #2'),
+        alt.Tooltip('distance_a', title='Conformation A (\u212B)', format='.1f'),
+        alt.Tooltip('distance_b', title='Conformation B (\u212B)', format='.1f'),
+        alt.Tooltip('delta_distance', title='\u0394Distance (\u212B)', format='.1f'),
+    ]
+    if raster:
+        return _raster_map_base(
+            df,
+            'delta_distance',
+            tooltip=tooltip,
+            color_title='\u0394Distance (\u212B)',
+            range_max=range_max,
+            n_residues=df.id_1.nunique(),
+            residues=residues,
+            block_size=block_size,
+        )
 
     return _distance_map_base(df).encode(
         color=alt.Color(
@@ -56,19 +123,19 @@ def delta_distance_map(df: pd.DataFrame, cutoff: float = 5) -> alt.Chart:
             title='\u0394Distance (\u212B)',
             scale=alt.Scale(domain=[-range_max, range_max], scheme='redblue'),
         ),
-        tooltip=[
-            alt.Tooltip('id_1', title='Residue #1'),
-            alt.Tooltip('id_2', title='Residue #2'),
-            alt.Tooltip('distance_a', title='Conformation A (\u212B)', format='.1f'),
-            alt.Tooltip('distance_b', title='Conformation B (\u212B)', format='.1f'),
-            alt.Tooltip(
-                'delta_distance', title='\u0394Distance (\u212B)', format='.1f'
-            ),
-        ],
+        tooltip=tooltip,
     )
 
 
-def delta_e_fret_map(df: pd.DataFrame, cutoff: float = 0.1) -> alt.Chart:
+@instrument
+def delta_e_fret_map(
+    df: pd.DataFrame,
+    cutoff: float = 0.1,
+    raster: bool = False,
+    block_size: int = 1,
+    compact: bool = False,
+    data_path: str = None,
+) -> alt.Chart:
     """Heatmap of the difference in E_fret between each alpha carbon between two
     conformations.
 
@@ -77,31 +144,62 @@ def delta_e_fret_map(df: pd.DataFrame, cutoff: float = 0.1) -> alt.Chart:
     DataFrame: Dataframe with the atom IDs (residue number) of each atom pair and the
         E_fret between each pair in each of the two conformations, as well as the
         difference in the E_fret of each pair between the conformations.
+    raster (bool): Render the heatmap server-side into an image. Use for large maps
+        (default = False).
+    block_size (int): Number of residues reduced into each pixel in raster mode,
+        keeping the largest change in each block (default = 1).
+    compact (bool): Send integer-coded residue IDs and rounded values to shrink the
+        chart spec (default = False).
+    data_path (str): Optional, path of a JSON or CSV file to write the chart data to
+        instead of inlining it in the chart spec.
 
     Returns:
     --------
     Chart: Altair chart object.
     """
     range_max = df.delta_E_fret.abs().max()
+    residues = pd.Index(df.id_1.unique())
+    significant = df.loc[lambda x: lower_triangle(x) & (x.delta_E_fret.abs() > cutoff)]
+    tooltip = [
+        alt.Tooltip('id_1:N', title='Residue #1'),
+        alt.Tooltip('id_2:N', title='Residue #2'),
+        alt.Tooltip('E_fret_a:Q', title='Conformation A', format='.2f'),
+        alt.Tooltip('E_fret_b:Q', title='Conformation B', format='.2f'),
+        alt.Tooltip('delta_E_fret:Q', title='\u0394E_fret', format='.2f'),
+    ]
+    if raster:
+        return _raster_map_base(
+            significant,
+            'delta_E_fret',
+            tooltip=tooltip,
+            color_title='\u0394E_fret',
+            range_max=range_max,
+            n_residues=significant.id_1.nunique(),
+            residues=residues,
+            block_size=block_size,
+        )
 
-    return _distance_map_base(
-        df.loc[lambda x: lower_triangle(x) & (x.delta_E_fret.abs() > cutoff)]
-    ).encode(
+    if compact:
+        # E_fret_b is recovered from the other two columns in the browser
+        chart = _distance_map_base(
+            significant[['id_1', 'id_2', 'E_fret_a', 'delta_E_fret']],
+            compact=True,
+            data_path=data_path,
+        ).transform_calculate(E_fret_b='datum.E_fret_a - datum.delta_E_fret')
+    else:
+        chart = _distance_map_base(significant, data_path=data_path)
+
+    return chart.encode(
         color=alt.Color(
-            'delta_E_fret',
+            'delta_E_fret:Q',
             title='\u0394E_fret',
             scale=alt.Scale(domain=[-range_max, range_max], scheme='redblue'),
         ),
-        tooltip=[
-            alt.Tooltip('id_1', title='Residue #1'),
-            alt.Tooltip('id_2', title='Residue #2'),
-            alt.Tooltip('E_fret_a', title='Conformation A', format='.2f'),
-            alt.Tooltip('E_fret_b', title='Conformation B', format='.2f'),
-            alt.Tooltip('delta_E_fret', title='\u0394E_fret', format='.2f'),
-        ],
+        tooltip=tooltip,
     )
 
 
+@instrument
 def e_fret_scatter(df: pd.DataFrame, cutoff: float = 0.2) -> alt.Chart:
     """Scatter plot of pairwise E_fret between each alpha carbon in one conformation
     versus the other.
@@ -1,20 +1,31 @@
-from smoltools.noesy_neighbors.main import (
-    get_labeled_carbons,
-    coordinate_table,
-    coordinates_from_chain,
-    coordinates_from_path,
-    coordinates_from_path_presets,
-    LABELING_SCHEMES,
-    LABELED_CARBONS,
-)
-from smoltools.noesy_neighbors.utils import (
-    splice_conformation_tables,
-    lower_triangle,
-    add_noe_bins,
-)
-from smoltools.calculate.distance import (
-    pairwise_distances_between_conformations,
-    pairwise_distances,
-)
+from smoltools._lazy import attach
 
-import smoltools.noesy_neighbors.plots as plots
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['plots'],
+    attributes={
+        'get_labeled_carbons': 'smoltools.noesy_neighbors.main',
+        'coordinate_table': 'smoltools.noesy_neighbors.main',
+        'coordinates_from_chain': 'smoltools.noesy_neighbors.main',
+        'coordinates_from_path': 'smoltools.noesy_neighbors.main',
+        'coordinates_from_path_presets': 'smoltools.noesy_neighbors.main',
+        'interchain_contacts_from_path_presets': 'smoltools.noesy_neighbors.main',
+        'distances_from_assembly': 'smoltools.noesy_neighbors.main',
+        'assembly_distances_from_path_presets': 'smoltools.noesy_neighbors.main',
+        'LABELING_SCHEMES': 'smoltools.noesy_neighbors.main',
+        'LABELED_CARBONS': 'smoltools.noesy_neighbors.main',
+        'splice_conformation_tables': 'smoltools.noesy_neighbors.utils',
+        'lower_triangle': 'smoltools.noesy_neighbors.utils',
+        'add_noe_bins': 'smoltools.noesy_neighbors.utils',
+        'occupancy_from_frames': 'smoltools.noesy_neighbors.trajectory',
+        'occupancy_from_path': 'smoltools.noesy_neighbors.trajectory',
+        'occupancy_from_path_presets': 'smoltools.noesy_neighbors.trajectory',
+        'assign_methyls': 'smoltools.noesy_neighbors.assign',
+        'predicted_contacts': 'smoltools.noesy_neighbors.assign',
+        'pairwise_distances_between_conformations': 'smoltools.calculate.distance',
+        'pairwise_distances': 'smoltools.calculate.distance',
+        'residue_distances': 'smoltools.calculate.residues',
+        'neighbor_pairs': 'smoltools.calculate.contacts',
+        'interface_contacts': 'smoltools.calculate.contacts',
+    },
+)
@@ -0,0 +1,366 @@
+"""Functions for assigning observed methyl NOE peaks to labelled methyls by matching
+the observed NOE connectivity against the contact graph predicted from a structure."""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from smoltools.profiling import instrument
+
+
+def predicted_contacts(coords: pd.DataFrame, cutoff: float = 8) -> np.ndarray:
+    """Build the predicted methyl contact graph from a coordinate table.
+
+    Parameters:
+    -----------
+    coords (DataFrame): Dataframe with the atom IDs as the index and the x, y, z
+        coordinate of each atom as the columns.
+    cutoff (float): Maximum distance (in angstroms) for two methyls to be considered
+        in contact (default = 8).
+
+    Returns:
+    --------
+    ndarray: Symmetric boolean adjacency matrix of methyls within the cutoff.
+    """
+    n_atoms = len(coords)
+    pairs = cKDTree(coords[['x', 'y', 'z']].to_numpy()).query_pairs(
+        cutoff, output_type='ndarray'
+    )
+    adjacency = np.zeros((n_atoms, n_atoms), dtype=bool)
+    adjacency[pairs[:, 0], pairs[:, 1]] = True
+    adjacency[pairs[:, 1], pairs[:, 0]] = True
+    return adjacency
+
+
+def _observed_graph(noes: pd.DataFrame) -> tuple[list[str], np.ndarray]:
+    """Return the peak labels and the symmetric adjacency matrix of observed NOEs."""
+    noes = noes.loc[lambda x: x.peak_1 != x.peak_2]
+    peaks = pd.Index(pd.unique(noes[['peak_1', 'peak_2']].to_numpy().ravel()))
+    i = peaks.get_indexer(noes.peak_1)
+    j = peaks.get_indexer(noes.peak_2)
+    adjacency = np.zeros((len(peaks), len(peaks)), dtype=bool)
+    adjacency[i, j] = True
+    adjacency[j, i] = True
+    return list(peaks), adjacency
+
+
+def _candidate_matrix(
+    peaks: list[str],
+    methyls: pd.Index,
+    observed: np.ndarray,
+    predicted: np.ndarray,
+    peak_types: dict[str, str | set[str]],
+    degree_slack: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Prune the peak to methyl candidates by residue type and by neighborhood: a
+    methyl can only host a peak if it has (nearly) as many predicted contacts as the
+    peak has observed NOEs, both in total and to each residue type that the peak's
+    neighbors are known to be. Returns both the pruned candidates and the candidates
+    allowed by residue type alone, which are used when the pruned ones run out.
+    """
+    residue_names = methyls.str[:3]
+    residue_types = pd.Index(residue_names.unique())
+    methyl_types = np.eye(len(residue_types), dtype=int)[
+        residue_types.get_indexer(residue_names)
+    ]
+    allowed = np.ones((len(peaks), len(methyls)), dtype=bool)
+    peak_types_known = np.zeros((len(peaks), len(residue_types)), dtype=int)
+
+    if peak_types is not None:
+        for i, peak in enumerate(peaks):
+            if peak in peak_types:
+                types = peak_types[peak]
+                types = {types} if isinstance(types, str) else set(types)
+                allowed[i] = residue_names.isin(types)
+                if len(types) == 1:
+                    peak_types_known[i] = residue_types.isin(types)
+
+    unassignable = [peak for peak, row in zip(peaks, allowed) if not row.any()]
+    if unassignable:
+        raise ValueError(f'No candidate methyls for peaks: {unassignable}')
+
+    observed_degree = observed.sum(axis=1)
+    predicted_degree = predicted.sum(axis=1)
+    degree_deficit = observed_degree[:, None] - predicted_degree[None, :]
+
+    observed_by_type = observed.astype(int) @ peak_types_known
+    predicted_by_type = predicted.astype(int) @ methyl_types
+    type_deficit = np.clip(
+        observed_by_type[:, None, :] - predicted_by_type[None, :, :], 0, None
+    ).sum(axis=2)
+
+    candidates = allowed & (np.maximum(degree_deficit, type_deficit) <= degree_slack)
+    return candidates, allowed
+
+
+def _free_options(
+    i: int, free: np.ndarray, candidates: np.ndarray, allowed: np.ndarray
+) -> np.ndarray:
+    """Free methyls peak i can be placed on, falling back to methyls of an allowed
+    residue type once all of the pruned candidates are taken.
+    """
+    options = candidates[i] & free
+    if not options.any():
+        options = allowed[i] & free
+    if not options.any():
+        raise ValueError('Not enough candidate methyls to assign every peak.')
+    return options
+
+
+def _construct(
+    observed: np.ndarray,
+    predicted: np.ndarray,
+    candidates: np.ndarray,
+    allowed: np.ndarray,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """Greedily grow an assignment outwards from a random seed peak. The next peak
+    placed is always the one with the most NOEs to peaks already placed (ties broken
+    by degree, then at random), and it is placed onto the free candidate methyl that
+    satisfies the most of those NOEs.
+    """
+    n_peaks, n_methyls = candidates.shape
+    assignment = np.full(n_peaks, -1)
+    free = np.ones(n_methyls, dtype=bool)
+    placed_neighbors = np.zeros(n_peaks)
+    priority = observed.sum(axis=1) + rng.random(n_peaks)
+
+    for _ in range(n_peaks):
+        order = np.where(assignment < 0, placed_neighbors * n_peaks + priority, -1)
+        i = np.argmax(order)
+        placed = assignment[observed[i] & (assignment >= 0)]
+        gain = predicted[:, placed].sum(axis=1) + rng.random(n_methyls)
+        gain[~_free_options(i, free, candidates, allowed)] = -np.inf
+        best = np.argmax(gain)
+        assignment[i] = best
+        free[best] = False
+        placed_neighbors += observed[i]
+
+    return assignment
+
+
+def _kick(
+    assignment: np.ndarray,
+    observed: np.ndarray,
+    candidates: np.ndarray,
+    allowed: np.ndarray,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """Perturb an assignment by moving a random peak and its observed neighbors onto
+    random free (or freed) candidate methyls.
+    """
+    n_peaks, n_methyls = candidates.shape
+    assignment = assignment.copy()
+    i = rng.integers(n_peaks)
+    moved = np.flatnonzero(observed[i] | (np.arange(n_peaks) == i))
+    free = np.ones(n_methyls, dtype=bool)
+    free[assignment] = False
+    free[assignment[moved]] = True
+    for j in rng.permutation(moved):
+        options = np.flatnonzero(_free_options(j, free, candidates, allowed))
+        assignment[j] = rng.choice(options)
+        free[assignment[j]] = False
+    return assignment
+
+
+def _local_search(
+    assignment: np.ndarray,
+    observed: np.ndarray,
+    predicted: np.ndarray,
+    allowed: np.ndarray,
+    max_sweeps: int,
+) -> np.ndarray:
+    """Improve an assignment by moving peaks to free methyls or swapping pairs of
+    peaks until no single move increases the number of satisfied NOEs. Only the
+    residue types constrain these moves, so that peaks placed by the degree pruned
+    construction can still reach any methyl of the right type.
+
+    The gain table ``gain[i, m]`` holds the number of NOEs of peak i that would be
+    satisfied if it sat on methyl m, and is updated incrementally after each move.
+    """
+    n_peaks, n_methyls = allowed.shape
+    weights = predicted.astype(np.int32)
+    gain = observed.astype(np.int32) @ weights[assignment]
+    free = np.ones(n_methyls, dtype=bool)
+    free[assignment] = False
+    peak_index = np.arange(n_peaks)
+
+    for _ in range(max_sweeps):
+        improved = False
+        for i in range(n_peaks):
+            current = assignment[i]
+
+            move = np.where(allowed[i] & free, gain[i] - gain[i, current], 0)
+            best_move = np.argmax(move)
+
+            swap = (
+                gain[i, assignment]
+                + gain[peak_index, current]
+                - gain[i, current]
+                - gain[peak_index, assignment]
+                + 2 * (observed[i] & predicted[current, assignment])
+            )
+            swap[~(allowed[i, assignment] & allowed[:, current])] = 0
+            swap[i] = 0
+            best_swap = np.argmax(swap)
+
+            if move[best_move] <= 0 and swap[best_swap] <= 0:
+                continue
+
+            improved = True
+            if move[best_move] >= swap[best_swap]:
+                assignment[i] = best_move
+                free[current] = True
+                free[best_move] = False
+                gain[observed[i]] += weights[best_move] - weights[current]
+            else:
+                other = assignment[best_swap]
+                assignment[i], assignment[best_swap] = other, current
+                delta = weights[other] - weights[current]
+                gain[observed[i]] += delta
+                gain[observed[best_swap]] -= delta
+
+        if not improved:
+            break
+
+    return assignment
+
+
+def _score(assignment: np.ndarray, observed: np.ndarray, predicted: np.ndarray) -> int:
+    """Number of observed NOEs that connect methyls predicted to be in contact."""
+    return int((observed & predicted[np.ix_(assignment, assignment)]).sum() // 2)
+
+
+def _restart(
+    seed: np.random.SeedSequence,
+    observed: np.ndarray,
+    predicted: np.ndarray,
+    candidates: np.ndarray,
+    allowed: np.ndarray,
+    max_sweeps: int,
+    n_kicks: int,
+) -> tuple[int, np.ndarray]:
+    """Construct and refine one assignment, then repeatedly perturb and re-refine it,
+    keeping the perturbed assignment whenever it scores at least as well.
+    """
+    rng = np.random.default_rng(seed)
+    assignment = _construct(observed, predicted, candidates, allowed, rng)
+    assignment = _local_search(assignment, observed, predicted, allowed, max_sweeps)
+    score = _score(assignment, observed, predicted)
+
+    for _ in range(n_kicks):
+        trial = _kick(assignment, observed, candidates, allowed, rng)
+        trial = _local_search(trial, observed, predicted, allowed, max_sweeps)
+        trial_score = _score(trial, observed, predicted)
+        if trial_score >= score:
+            assignment, score = trial, trial_score
+
+    return score, assignment
+
+
+@instrument
+def assign_methyls(
+    noes: pd.DataFrame,
+    coords: pd.DataFrame,
+    cutoff: float = 8,
+    peak_types: dict[str, str | set[str]] = None,
+    degree_slack: int = 2,
+    n_restarts: int = 50,
+    n_kicks: int = 20,
+    n_solutions: int = 5,
+    max_sweeps: int = 100,
+    n_workers: int = 1,
+    seed: int = None,
+) -> pd.DataFrame:
+    """Rank assignments of observed NOE peaks to labelled methyls by how many of the
+    observed NOEs connect methyls that are in contact in the structure.
+
+    Parameters:
+    -----------
+    noes (DataFrame): Dataframe with one observed NOE per row, given as the labels of
+        the two connected peaks in the 'peak_1' and 'peak_2' columns.
+    coords (DataFrame): Dataframe with the atom IDs (residue number, carbon ID) as the
+        index and the x, y, z coordinate of each atom as the columns, e.g. the output
+        of coordinates_from_path_presets.
+    cutoff (float): Maximum distance (in angstroms) for a predicted NOE (default = 8).
+    peak_types (dict): Optional, dictionary mapping peak labels to the three letter
+        residue ID (or set of IDs) the peak can be assigned to (e.g. 'LEU').
+    degree_slack (int): Number of observed NOEs of a peak that may be missing from
+        the predicted contacts of a candidate methyl before the methyl is pruned
+        from the peak's candidates (default = 2).
+    n_restarts (int): Number of randomized restarts of the search (default = 50).
+    n_kicks (int): Number of perturbations of the assignment tried after each
+        restart converges (default = 20).
+    n_solutions (int): Number of best unique assignments to return (default = 5).
+    max_sweeps (int): Maximum number of local search sweeps per restart
+        (default = 100).
+    n_workers (int): Number of worker processes to spread restarts over
+        (default = 1).
+    seed (int): Optional, seed for reproducible searches.
+
+    Returns:
+    --------
+    DataFrame: DataFrame with one row per peak for each of the best assignments,
+        with the rank and total score of the assignment, the assigned methyl, the
+        number of observed and satisfied NOEs of the peak, and the support (fraction
+        of restarts that converged on the same peak to methyl assignment).
+    """
+    peaks, observed = _observed_graph(noes)
+    methyls = coords.index
+    predicted = predicted_contacts(coords, cutoff=cutoff)
+    candidates, allowed = _candidate_matrix(
+        peaks, methyls, observed, predicted, peak_types, degree_slack
+    )
+    if len(peaks) > len(methyls):
+        raise ValueError(
+            f'More peaks ({len(peaks)}) than labelled methyls ({len(methyls)}).'
+        )
+
+    run = partial(
+        _restart,
+        observed=observed,
+        predicted=predicted,
+        candidates=candidates,
+        allowed=allowed,
+        max_sweeps=max_sweeps,
+        n_kicks=n_kicks,
+    )
+    seeds = np.random.SeedSequence(seed).spawn(n_restarts)
+    if n_workers > 1:
+        chunksize = max(1, n_restarts // (4 * n_workers))
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(run, seeds, chunksize=chunksize))
+    else:
+        results = [run(seed) for seed in seeds]
+
+    assignments = np.stack([assignment for _, assignment in results])
+    support = (assignments[None, :, :] == assignments[:, None, :]).mean(axis=1)
+
+    unique = {}
+    for k in sorted(range(n_restarts), key=lambda k: -results[k][0]):
+        unique.setdefault(assignments[k].tobytes(), k)
+    best = list(unique.values())[:n_solutions]
+
+    n_noes = observed.sum(axis=1)
+    return pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    'rank': rank,
+                    'score': results[k][0],
+                    'peak': peaks,
+                    'methyl': methyls[assignments[k]],
+                    'n_noes': n_noes,
+                    'n_satisfied': (
+                        observed & predicted[np.ix_(assignments[k], assignments[k])]
+                    ).sum(axis=1),
+                    'support': support[k],
+                }
+            )
+            for rank, k in enumerate(best, start=1)
+        ],
+        ignore_index=True,
+    )
@@ -1,10 +1,18 @@
 from Bio.PDB.Atom import Atom
 from Bio.PDB.Chain import Chain
 from Bio.PDB.Residue import Residue
+from Bio.PDB.Structure import Structure
 import pandas as pd
 
+from smoltools.calculate.contacts import interface_contacts
+from smoltools.calculate.distance import assembly_distances
 from smoltools.pdbtools import path_to_chain, coordinate_table
+from smoltools.pdbtools.exceptions import NoAtomsFound, NoResiduesFound
+import smoltools.pdbtools.load as load
 import smoltools.pdbtools.select as select
+from smoltools.pdbtools.shared import AtomArrays
+from smoltools.cache import memoize
+from smoltools.profiling import instrument
 
 
 LABELED_CARBONS = {
@@ -32,6 +40,7 @@ LABELED_CARBONS = {
 LABELING_SCHEMES = list(LABELED_CARBONS.keys())
 
 
+@instrument
 def get_labeled_carbons(
     residues: list[Residue], labeled_atoms: dict[str, list[str]]
 ) -> list[Atom]:
@@ -51,6 +60,7 @@ def get_labeled_carbons(
     return select.get_carbons(residues, labeled_atoms)
 
 
+@instrument
 def coordinates_from_chain(
     chain: Chain, labeled_atoms: dict[str, list[str]]
 ) -> pd.DataFrame:
@@ -81,6 +91,8 @@ def coordinates_from_chain(
     )
 
 
+@instrument
+@memoize()
 def coordinates_from_path(
     path: str,
     labeled_atoms: dict[str, list[str]],
@@ -107,6 +119,8 @@ def coordinates_from_path(
     return coordinates_from_chain(chain, labeled_atoms)
 
 
+@instrument
+@memoize()
 def coordinates_from_path_presets(
     path: str,
     mode: str = 'ILV',
@@ -131,3 +145,124 @@ def coordinates_from_path_presets(
     labeled_atoms = LABELED_CARBONS[mode]
     chain = path_to_chain(path, model=model, chain=chain)
     return coordinates_from_chain(chain, labeled_atoms)
+
+
+@instrument
+@memoize()
+def interchain_contacts_from_path_presets(
+    path: str,
+    mode: str = 'ILV',
+    chains: list[str] = None,
+    model: int = 0,
+    cutoff: float = 10,
+) -> pd.DataFrame:
+    """Find labelled atom pairs within NOE range between each pair of chains in a PDB
+    file, without calculating the distances between every interchain atom pair.
+
+    Parameters:
+    -----------
+    path (str): Path to PDB file.
+    mode (str): Predefined labeled atom selections (choices are 'ILV', 'ILVA', and 'ILVMAT')
+    chains (list[str]): Optional, chain IDs of desired chains. Default is every chain
+        in the model with labelled atoms.
+    model (int): Model number of desired chains (default = 0)
+    cutoff (float): Maximum distance (in angstroms) between atom pairs (default = 10).
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the chain IDs and atom IDs (residue number, carbon ID)
+        of each interchain atom pair within the cutoff and the distance (in
+        angstroms) between each pair.
+    """
+    labeled_atoms = LABELED_CARBONS[mode]
+    structure = load.read_pdb_from_path(path)
+    if chains is not None:
+        coords = {
+            chain: coordinates_from_chain(
+                select.get_chain(structure, model=model, chain=chain), labeled_atoms
+            )
+            for chain in chains
+        }
+    else:
+        coords = {}
+        for chain in structure[model]:
+            try:
+                coords[chain.get_id()] = coordinates_from_chain(chain, labeled_atoms)
+            except (NoResiduesFound, NoAtomsFound):
+                continue
+
+    return interface_contacts(coords, cutoff=cutoff)
+
+
+@instrument
+def distances_from_assembly(
+    structure: Structure | AtomArrays,
+    labeled_atoms: dict[str, list[str]],
+    model: int = 0,
+    chains: list[str] = None,
+    symmetry_tolerance: float = 0.25,
+) -> pd.DataFrame:
+    """Calculate pairwise distances of labelled carbons within and between the chains
+    of an assembly (see calculate.distance.assembly_distances). Use if a structure is
+    already loaded.
+
+    Parameters:
+    -----------
+    structure (Structure | AtomArrays): PDB structure object, or atom arrays of one
+        model.
+    labeled_atoms (dict): Dictionary mapping three letter residue ID (e.g. 'ILE')
+        to list of atoms to select (e.g. ['CD', 'CG2'])
+    model (int): Model number of desired chains (default = 0)
+    chains (list[str]): Optional, chain IDs of desired chains. Default is every chain
+        in the model.
+    symmetry_tolerance (float): Maximum RMSD (in angstroms) between identical
+        subunits for their distances to be reused (default = 0.25). Set to None to
+        calculate every distance.
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the chain IDs and atom IDs (residue number, carbon ID)
+        of each atom pair and the distance (in angstroms) between each pair.
+    """
+    atoms = select.get_chains(structure, model=model, chains=chains)
+    residues = select.get_residues(atoms, residue_filter=set(labeled_atoms.keys()))
+    carbons = get_labeled_carbons(residues, labeled_atoms)
+    return assembly_distances(carbons, symmetry_tolerance=symmetry_tolerance)
+
+
+@instrument
+@memoize()
+def assembly_distances_from_path_presets(
+    path: str,
+    mode: str = 'ILV',
+    chains: list[str] = None,
+    model: int = 0,
+    symmetry_tolerance: float = 0.25,
+) -> pd.DataFrame:
+    """Calculate pairwise distances of labelled carbons within and between the chains
+    of an assembly in a PDB file. Use if starting directly from PDB file.
+
+    Parameters:
+    -----------
+    path (str): Path to PDB file.
+    mode (str): Predefined labeled atom selections (choices are 'ILV', 'ILVA', and 'ILVMAT')
+    chains (list[str]): Optional, chain IDs of desired chains. Default is every chain
+        in the model.
+    model (int): Model number of desired chains (default = 0)
+    symmetry_tolerance (float): Maximum RMSD (in angstroms) between identical
+        subunits for their distances to be reused (default = 0.25). Set to None to
+        calculate every distance.
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the chain IDs and atom IDs (residue number, carbon ID)
+        of each atom pair and the distance (in angstroms) between each pair.
+    """
+    structure = load.read_pdb_from_path(path)
+    return distances_from_assembly(
+        structure,
+        LABELED_CARBONS[mode],
+        model=model,
+        chains=chains,
+        symmetry_tolerance=symmetry_tolerance,
+    )
@@ -2,7 +2,10 @@
 import altair as alt
 import pandas as pd
 
-from smoltools.noesy_neighbors.utils import add_noe_bins
+from smoltools.noesy_neighbors.utils import add_noe_bins, NOE_BIN_EDGES
+from smoltools.plotting.raster import raster_heatmap
+from smoltools.plotting.transport import chart_data, encode_pairs, lookup_ids
+from smoltools.profiling import instrument
 
 
 def _get_axis_config(n_atoms: int) -> dict:
@@ -36,28 +39,54 @@ def _distance_map_base(df: pd.DataFrame) -> alt.Chart:
     )
 
 
-def distance_map(df: pd.DataFrame) -> alt.Chart:
+@instrument
+def distance_map(
+    df: pd.DataFrame,
+    raster: bool = False,
+    block_size: int = 1,
+    block_method: str = 'min',
+) -> alt.Chart:
     """Heatmap of pairwise distance between each labelled atom.
 
     Parameters:
     -----------
     DataFrame: Dataframe with the atom IDs (residue number, carbon ID) of each atom pair
         and the distance (in angstroms) between each pair.
+    raster (bool): Render the heatmap server-side into an image, with tooltips only
+        for pairs within NOE range. Use for large maps (default = False).
+    block_size (int): Number of atoms reduced into each pixel in raster mode
+        (default = 1).
+    block_method (str): How blocks are reduced in raster mode, 'min' or 'max'
+        (default = 'min').
 
     Returns:
     --------
     Chart: Altair chart object.
     """
+    tooltip = [
+        alt.Tooltip('id_1', title='Atom #1'),
+        alt.Tooltip('id_2', title='Atom #2'),
+        alt.Tooltip('distance', title='Distance (\u212B)', format='.1f'),
+    ]
+    if raster:
+        return raster_heatmap(
+            df,
+            'distance',
+            significant=df.distance <= NOE_BIN_EDGES[-2],
+            tooltip=tooltip,
+            color_title='Distance (\u212B)',
+            size=_get_size(df.id_1.nunique()),
+            block_size=block_size,
+            block_method=block_method,
+        )
+
     return _distance_map_base(df).encode(
         color=alt.Color('distance', title='Distance (\u212B)'),
-        tooltip=[
-            alt.Tooltip('id_1', title='Atom #1'),
-            alt.Tooltip('id_2', title='Atom #2'),
-            alt.Tooltip('distance', title='Distance (\u212B)', format='.1f'),
-        ],
+        tooltip=tooltip,
     )
 
 
+@instrument
 def binned_distance_map(df: pd.DataFrame, bin_size: int) -> alt.Chart:
     """Heatmap of pairwise distance between each labelled atom. Distances are binned
     to reduce visual clutter.
@@ -85,20 +114,39 @@ def binned_distance_map(df: pd.DataFrame, bin_size: int) -> alt.Chart:
 
 
 def _noe_map_base(
-    df: pd.DataFrame, x_title: str = 'Atom #1', y_title: str = 'Atom #2'
+    df: pd.DataFrame,
+    x_title: str = 'Atom #1',
+    y_title: str = 'Atom #2',
+    compact: bool = False,
+    data_path: str = None,
 ) -> alt.Chart:
     n_atoms = df.id_1.nunique()
     size = _get_size(n_atoms)
     axis_config = _get_axis_config(n_atoms)
+    df = df.pipe(add_noe_bins)
+
+    if compact:
+        # keep the full axes even though atoms without any NOE are not sent
+        x_scale = alt.Scale(domain=list(pd.unique(df.id_1)))
+        y_scale = alt.Scale(domain=list(pd.unique(df.id_2)))
+        columns = [
+            column for column in ['distance', 'noe_strength', 'subunit'] if column in df
+        ]
+        data, lookup = encode_pairs(
+            df.loc[lambda x: x.noe_strength != 'none'], columns, decimals=1
+        )
+        chart = lookup_ids(alt.Chart(chart_data(data, data_path)), lookup)
+    else:
+        x_scale = y_scale = alt.Undefined
+        chart = alt.Chart(chart_data(df, data_path))
 
     return (
-        alt.Chart(df.pipe(add_noe_bins))
-        .mark_rect()
+        chart.mark_rect()
         .encode(
-            x=alt.X('id_1', title=x_title, **axis_config),
-            y=alt.Y('id_2', title=y_title, **axis_config),
+            x=alt.X('id_1:N', title=x_title, scale=x_scale, **axis_config),
+            y=alt.Y('id_2:N', title=y_title, scale=y_scale, **axis_config),
             color=alt.Color(
-                'noe_strength',
+                'noe_strength:O',
                 title='NOE',
                 scale=alt.Scale(
                     domain=['strong', 'medium', 'weak', 'none'],
@@ -111,53 +159,70 @@ def _noe_map_base(
     )
 
 
-def noe_map(df: pd.DataFrame):
+@instrument
+def noe_map(df: pd.DataFrame, compact: bool = False, data_path: str = None):
     """Heatmap of expected NOE between each labelled atom within a single chain.
 
     Parameters:
     -----------
     df (DataFrame): Dataframe with the atom IDs (residue number, carbon ID) of each atom pair
         and the distance (in angstroms) between each pair.
+    compact (bool): Send only pairs within NOE range, with integer-coded atom IDs
+        and rounded distances, to shrink the chart spec (default = False).
+    data_path (str): Optional, path of a JSON or CSV file to write the chart data to
+        instead of inlining it in the chart spec.
 
     Returns:
     --------
     Chart: Altair chart object.
     """
-    return _noe_map_base(df).encode(
+    return _noe_map_base(df, compact=compact, data_path=data_path).encode(
         tooltip=[
-            alt.Tooltip('id_1', title='Atom #1'),
-            alt.Tooltip('id_2', title='Atom #2'),
-            alt.Tooltip('distance', title='Distance (\u212B)', format='.1f'),
-            alt.Tooltip('noe_strength', title='NOE'),
+            alt.Tooltip('id_1:N', title='Atom #1'),
+            alt.Tooltip('id_2:N', title='Atom #2'),
+            alt.Tooltip('distance:Q', title='Distance (\u212B)', format='.1f'),
+            alt.Tooltip('noe_strength:O', title='NOE'),
         ],
     )
 
 
-def spliced_noe_map(df: pd.DataFrame) -> alt.Chart:
+@instrument
+def spliced_noe_map(
+    df: pd.DataFrame, compact: bool = False, data_path: str = None
+) -> alt.Chart:
     """Spliced Heatmap of expected intra-chain NOE between each labelled atom for two chains.
 
     Parameters:
     -----------
     df (DataFrame): Dataframe with the atom IDs (residue number, carbon ID) of each atom pair
         and the distance (in angstroms) between each pair.
+    compact (bool): Send only pairs within NOE range, with integer-coded atom IDs
+        and rounded distances, to shrink the chart spec (default = False).
+    data_path (str): Optional, path of a JSON or CSV file to write the chart data to
+        instead of inlining it in the chart spec.
 
     Returns:
     --------
     Chart: Altair chart object.
     """
-    return _noe_map_base(df).encode(
+    return _noe_map_base(df, compact=compact, data_path=data_path).encode(
         tooltip=[
-            alt.Tooltip('subunit', title='Chain'),
-            alt.Tooltip('id_1', title='Atom #1'),
-            alt.Tooltip('id_2', title='Atom #2'),
-            alt.Tooltip('distance', title='Distance (\u212B)', format='.1f'),
-            alt.Tooltip('noe_strength', title='NOE'),
+            alt.Tooltip('subunit:N', title='Chain'),
+            alt.Tooltip('id_1:N', title='Atom #1'),
+            alt.Tooltip('id_2:N', title='Atom #2'),
+            alt.Tooltip('distance:Q', title='Distance (\u212B)', format='.1f'),
+            alt.Tooltip('noe_strength:O', title='NOE'),
         ],
     )
 
 
+@instrument
 def interchain_noe_map(
-    df: pd.DataFrame, x_title: str = 'Chain 1', y_title: str = 'Chain 2'
+    df: pd.DataFrame,
+    x_title: str = 'Chain 1',
+    y_title: str = 'Chain 2',
+    compact: bool = False,
+    data_path: str = None,
 ) -> alt.Chart:
     """Heatmap of expected NOE between each labelled atom between two different chains.
 
@@ -167,22 +232,34 @@ def interchain_noe_map(
         and the distance (in angstroms) between each pair.
     x_title (str): title for X axis.
     y_title (str): title for Y axis.
+    compact (bool): Send only pairs within NOE range, with integer-coded atom IDs
+        and rounded distances, to shrink the chart spec (default = False).
+    data_path (str): Optional, path of a JSON or CSV file to write the chart data to
+        instead of inlining it in the chart spec.
 
     Returns:
     --------
     Chart: Altair chart object.
     """
-    return _noe_map_base(df, x_title=x_title, y_title=y_title).encode(
+    return _noe_map_base(
+        df, x_title=x_title, y_title=y_title, compact=compact, data_path=data_path
+    ).encode(
         tooltip=[
-            alt.Tooltip('id_1', title=x_title),
-            alt.Tooltip('id_2', title=y_title),
-            alt.Tooltip('distance', title='Distance (\u212B)', format='.1f'),
-            alt.Tooltip('noe_strength', title='NOE'),
+            alt.Tooltip('id_1:N', title=x_title),
+            alt.Tooltip('id_2:N', title=y_title),
+            alt.Tooltip('distance:Q', title='Distance (\u212B)', format='.1f'),
+            alt.Tooltip('noe_strength:O', title='NOE'),
         ],
     )
 
 
-def delta_distance_map(df: pd.DataFrame) -> alt.Chart:
+@instrument
+def delta_distance_map(
+    df: pd.DataFrame,
+    raster: bool = False,
+    block_size: int = 1,
+    block_method: str = 'absmax',
+) -> alt.Chart:
     """Heatmap of pairwise distance between each labelled atom.
 
     Parameters:
@@ -191,12 +268,38 @@ def delta_distance_map(df: pd.DataFrame) -> alt.Chart:
         pair and the distance (in angstroms) between each pair in each of the two
         conformations, as well as the difference in pairwise distance between the
         conformations.
+    raster (bool): Render the heatmap server-side into an image, with tooltips only
+        for the pairs with the largest changes. Use for large maps (default = False).
+    block_size (int): Number of atoms reduced into each pixel in raster mode
+        (default = 1).
+    block_method (str): How blocks are reduced in raster mode, 'absmax', 'min' or
+        'max' (default = 'absmax').
 
     Returns:
     --------
     Chart: Altair chart object.
     """
     range_max = df.delta_distance.abs().max()
+    tooltip = [
+        alt.Tooltip('id_1', title='Atom #1'),
+        alt.Tooltip('id_2', title='Atom #2'),
+        alt.Tooltip('distance_a', title='Conformation A (\u212B)', format='.1f'),
+        alt.Tooltip('distance_b', title='Conformation B (\u212B)', format='.1f'),
+        alt.Tooltip('delta_distance', title='\u0394Distance (\u212B)', format='.1f'),
+    ]
+    if raster:
+        return raster_heatmap(
+            df,
+            'delta_distance',
+            significant=df.delta_distance.notna(),
+            tooltip=tooltip,
+            color_title='\u0394Distance (\u212B)',
+            scheme='redblue',
+            domain=(-range_max, range_max),
+            size=_get_size(df.id_1.nunique()),
+            block_size=block_size,
+            block_method=block_method,
+        )
 
     return _distance_map_base(df).encode(
         color=alt.Color(
@@ -204,18 +307,11 @@ def delta_distance_map(df: pd.DataFrame) -> alt.Chart:
             title='\u0394Distance (\u212B)',
             scale=alt.Scale(scheme='redblue', domain=[-range_max, range_max]),
         ),
-        tooltip=[
-            alt.Tooltip('id_1', title='Atom #1'),
-            alt.Tooltip('id_2', title='Atom #2'),
-            alt.Tooltip('distance_a', title='Conformation A (\u212B)', format='.1f'),
-            alt.Tooltip('distance_b', title='Conformation B (\u212B)', format='.1f'),
-            alt.Tooltip(
-                'delta_distance', title='\u0394Distance (\u212B)', format='.1f'
-            ),
-        ],
+        tooltip=tooltip,
     )
 
 
+@instrument
 def distance_scatter(df: pd.DataFrame, noe_threshold: float) -> alt.Chart:
     """Scatter plot of pairwise distance between each labelled atom in one conformation
     versus the other.
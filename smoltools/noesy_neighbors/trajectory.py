@@ -0,0 +1,246 @@
+"""Functions for calculating NOE contact occupancy over multi-frame trajectories or
+ensembles. Frames are streamed through a cutoff neighbor search and accumulated into
+per-pair counts, so memory use does not depend on the number of frames."""
+
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+import itertools
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from smoltools.cache import memoize
+from smoltools.noesy_neighbors.main import coordinates_from_chain, LABELED_CARBONS
+from smoltools.noesy_neighbors.utils import NOE_BIN_EDGES, NOE_BIN_LABELS
+from smoltools.pdbtools import load, select
+from smoltools.profiling import instrument
+
+# within-cutoff bins are counted per NOE strength; the last slot holds the r^-6 sum
+_N_BINS = len(NOE_BIN_LABELS)
+_R6 = _N_BINS
+
+
+def _accumulate_frame(totals: np.ndarray, coords: np.ndarray, cutoff: float) -> None:
+    """Add the NOE bin counts and r^-6 contributions of all atom pairs within the
+    cutoff in one frame. Atoms missing from the frame (NaN coordinates) are skipped.
+    """
+    present = np.flatnonzero(~np.isnan(coords).any(axis=1))
+    pairs = cKDTree(coords[present]).query_pairs(cutoff, output_type='ndarray')
+    i, j = present[pairs[:, 0]], present[pairs[:, 1]]
+    r = np.linalg.norm(coords[i] - coords[j], axis=1)
+    bins = np.searchsorted(NOE_BIN_EDGES[1:-1], r, side='left')
+    np.add.at(totals, (bins, i, j), 1)
+    np.add.at(totals, (_R6, i, j), r**-6)
+
+
+def _empty_totals(n_atoms: int) -> np.ndarray:
+    return np.zeros((_N_BINS + 1, n_atoms, n_atoms))
+
+
+def _occupancy_of_frames(
+    frames: list[pd.DataFrame], ids: pd.Index, cutoff: float
+) -> tuple[int, np.ndarray]:
+    totals = _empty_totals(len(ids))
+    for frame in frames:
+        coords = frame.reindex(ids).loc[:, ['x', 'y', 'z']].to_numpy(dtype=float)
+        _accumulate_frame(totals, coords, cutoff)
+    return len(frames), totals
+
+
+def _frame_from_block(
+    block: str, chain: str, labeled_atoms: dict[str, list[str]]
+) -> pd.DataFrame:
+    structure = load.read_pdb_from_block('frame', block)
+    return coordinates_from_chain(
+        select.get_chain(structure, model=0, chain=chain), labeled_atoms
+    )
+
+
+def _occupancy_of_blocks(
+    blocks: list[str],
+    ids: pd.Index,
+    chain: str,
+    labeled_atoms: dict[str, list[str]],
+    cutoff: float,
+) -> tuple[int, np.ndarray]:
+    frames = [_frame_from_block(block, chain, labeled_atoms) for block in blocks]
+    return _occupancy_of_frames(frames, ids, cutoff)
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _map_chunks(
+    fn: Callable, chunks: Iterable[list], n_workers: int
+) -> Iterator[tuple[int, np.ndarray]]:
+    """Apply fn to each chunk, optionally on a process pool. Only a bounded number of
+    chunks are in flight at once so the frames are never all held in memory.
+    """
+    if n_workers <= 1:
+        yield from map(fn, chunks)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = set()
+        for chunk in chunks:
+            pending.add(executor.submit(fn, chunk))
+            if len(pending) >= 2 * n_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from (future.result() for future in done)
+        yield from (future.result() for future in pending)
+
+
+def _reduce_occupancy(
+    results: Iterable[tuple[int, np.ndarray]], ids: pd.Index
+) -> pd.DataFrame:
+    n_frames = 0
+    totals = _empty_totals(len(ids))
+    for chunk_frames, chunk_totals in results:
+        n_frames += chunk_frames
+        totals += chunk_totals
+
+    i, j = np.nonzero(totals[_R6])
+    occupancy = pd.DataFrame(
+        {
+            'id_1': ids[i],
+            'id_2': ids[j],
+            **{
+                label: totals[k, i, j] / n_frames
+                for k, label in enumerate(NOE_BIN_LABELS[:-1])
+            },
+            'distance': (totals[_R6, i, j] / n_frames) ** (-1 / 6),
+        }
+    )
+    return pd.concat(
+        [occupancy, occupancy.rename(columns={'id_1': 'id_2', 'id_2': 'id_1'})],
+        ignore_index=True,
+    )
+
+
+@instrument
+def occupancy_from_frames(
+    frames: Iterable[pd.DataFrame],
+    cutoff: float = 10,
+    n_workers: int = 1,
+    chunk_size: int = 100,
+) -> pd.DataFrame:
+    """Calculate the fraction of frames in which each pair of labelled atoms falls in
+    each NOE bin, and the <r^-6>^(-1/6) averaged effective distance of each pair.
+
+    Parameters:
+    -----------
+    frames (Iterable[DataFrame]): Coordinate tables for each frame, with the atom IDs
+        (residue number, carbon ID) as the index and the x, y, z coordinate of each
+        atom as the columns, e.g. the output of coordinates_from_chain. Atom IDs are
+        taken from the first frame.
+    cutoff (float): Neighbor search cutoff (in angstroms) (default = 10). Frames in
+        which a pair is beyond the cutoff add nothing to its r^-6 average.
+    n_workers (int): Number of worker processes to spread chunks of frames over
+        (default = 1).
+    chunk_size (int): Number of frames per chunk (default = 100).
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the atom IDs of each atom pair that is within the
+        cutoff in at least one frame, the fraction of frames with a strong, medium
+        and weak NOE between each pair, and the effective distance (in angstroms).
+    """
+    frames = iter(frames)
+    first = next(frames)
+    ids = first.index
+    results = _map_chunks(
+        partial(_occupancy_of_frames, ids=ids, cutoff=cutoff),
+        _chunked(itertools.chain([first], frames), chunk_size),
+        n_workers,
+    )
+    return _reduce_occupancy(results, ids)
+
+
+@instrument
+@memoize()
+def occupancy_from_path(
+    path: str,
+    labeled_atoms: dict[str, list[str]],
+    chain: str = 'A',
+    cutoff: float = 10,
+    n_workers: int = 1,
+    chunk_size: int = 100,
+) -> pd.DataFrame:
+    """Calculate NOE occupancy and effective distances between labelled atoms over all
+    models of a multi-model PDB file (e.g. an NMR ensemble or MD trajectory). Models
+    are read and parsed one chunk at a time.
+
+    Parameters:
+    -----------
+    path (str): Path to PDB file.
+    labeled_atoms (dict): Dictionary mapping three letter residue ID (e.g. 'ILE')
+        to list of atoms to select (e.g. ['CD', 'CG2'])
+    chain (str): Chain ID of desired chain (default = 'A')
+    cutoff (float): Neighbor search cutoff (in angstroms) (default = 10).
+    n_workers (int): Number of worker processes to spread chunks of models over
+        (default = 1).
+    chunk_size (int): Number of models per chunk (default = 100).
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the atom IDs of each atom pair that is within the
+        cutoff in at least one model, the fraction of models with a strong, medium
+        and weak NOE between each pair, and the effective distance (in angstroms).
+    """
+    blocks = load.iter_model_blocks(load.convert_to_path(path))
+    first = next(blocks)
+    ids = _frame_from_block(first, chain, labeled_atoms).index
+    results = _map_chunks(
+        partial(
+            _occupancy_of_blocks,
+            ids=ids,
+            chain=chain,
+            labeled_atoms=labeled_atoms,
+            cutoff=cutoff,
+        ),
+        _chunked(itertools.chain([first], blocks), chunk_size),
+        n_workers,
+    )
+    return _reduce_occupancy(results, ids)
+
+
+def occupancy_from_path_presets(
+    path: str,
+    mode: str = 'ILV',
+    chain: str = 'A',
+    cutoff: float = 10,
+    n_workers: int = 1,
+    chunk_size: int = 100,
+) -> pd.DataFrame:
+    """Calculate NOE occupancy and effective distances between labelled atoms over all
+    models of a multi-model PDB file, using a predefined labelling scheme.
+
+    Parameters:
+    -----------
+    path (str): Path to PDB file.
+    mode (str): Predefined labeled atom selections (choices are 'ILV', 'ILVA', and 'ILVMAT')
+    chain (str): Chain ID of desired chain (default = 'A')
+    cutoff (float): Neighbor search cutoff (in angstroms) (default = 10).
+    n_workers (int): Number of worker processes to spread chunks of models over
+        (default = 1).
+    chunk_size (int): Number of models per chunk (default = 100).
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the atom IDs of each atom pair that is within the
+        cutoff in at least one model, the fraction of models with a strong, medium
+        and weak NOE between each pair, and the effective distance (in angstroms).
+    """
+    return occupancy_from_path(
+        path,
+        LABELED_CARBONS[mode],
+        chain=chain,
+        cutoff=cutoff,
+        n_workers=n_workers,
+        chunk_size=chunk_size,
+    )
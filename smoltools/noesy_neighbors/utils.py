@@ -1,6 +1,11 @@
 import numpy as np
 import pandas as pd
 
+from smoltools.profiling import instrument
+
+NOE_BIN_EDGES = [0, 5, 8, 10, np.inf]
+NOE_BIN_LABELS = ['strong', 'medium', 'weak', 'none']
+
 
 def extract_residue_number(s: pd.Series) -> pd.Series:
     return s.str.partition('-')[0].str[3:].astype(int)
@@ -10,6 +15,7 @@ def lower_triangle(df: pd.DataFrame) -> pd.Series:
     return extract_residue_number(df.id_1) < extract_residue_number(df.id_2)
 
 
+@instrument
 def splice_conformation_tables(
     df_a: pd.DataFrame,
     df_b: pd.DataFrame,
@@ -51,14 +57,15 @@ def splice_conformation_tables(
     )
 
 
+@instrument
 def add_noe_bins(df: pd.DataFrame) -> pd.DataFrame:
     """Add column converting distance into relative NOE strength."""
     return df.assign(
         noe_strength=lambda x: pd.cut(
             x.distance,
-            bins=[0, 5, 8, 10, np.inf],
+            bins=NOE_BIN_EDGES,
             include_lowest=True,
-            labels=['strong', 'medium', 'weak', 'none'],
+            labels=NOE_BIN_LABELS,
             ordered=True,
         )
     )
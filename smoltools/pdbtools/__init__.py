@@ -1,4 +1,10 @@
-import smoltools.pdbtools.load as load
-import smoltools.pdbtools.select as select
-from smoltools.pdbtools.utils import path_to_chain
-from smoltools.pdbtools.coordinates import coordinate_table
+from smoltools._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['load', 'select'],
+    attributes={
+        'path_to_chain': 'smoltools.pdbtools.utils',
+        'coordinate_table': 'smoltools.pdbtools.coordinates',
+    },
+)
@@ -2,19 +2,34 @@
 from Bio.PDB.Atom import Atom
 import pandas as pd
 
+from smoltools.pdbtools.shared import AtomArrays
+from smoltools.profiling import instrument
 
-def coordinate_table(atoms: list[Atom]) -> pd.DataFrame:
+
+@instrument
+def coordinate_table(atoms: list[Atom] | AtomArrays) -> pd.DataFrame:
     """Extract 3D coordinates from list of atoms into DataFrame.
 
     Parameters:
     -----------
-    atoms (list[Atom]): List of PDB Atom.
+    atoms (list[Atom] | AtomArrays): List of PDB Atom, or atom arrays.
 
     Returns:
     --------
     DataFrame: Dataframe with the atom ID (residue number, carbon ID) as the index
         and the x, y, z coordinate of each atom as the columns.
     """
+    if isinstance(atoms, AtomArrays):
+        return pd.DataFrame(
+            {
+                'residue_name': atoms.labels('residue'),
+                'residue_number': atoms.residue_numbers.astype('int64'),
+                'atom_id': atoms.labels('atom'),
+                'x': atoms.coords[:, 0],
+                'y': atoms.coords[:, 1],
+                'z': atoms.coords[:, 2],
+            }
+        )
 
     def _get_atom_info(atom: Atom) -> tuple:
         parent_residue = atom.get_parent()
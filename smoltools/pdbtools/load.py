@@ -1,11 +1,14 @@
 """Functions for loading PDB files."""
 
 import io
+from collections.abc import Iterator
 from pathlib import Path
 
 from Bio.PDB import PDBParser
 from Bio.PDB.Structure import Structure
 
+from smoltools.profiling import instrument
+
 
 def convert_to_path(path: str) -> Path:
     if not isinstance(path, Path):
@@ -14,6 +17,7 @@ def convert_to_path(path: str) -> Path:
         return path
 
 
+@instrument
 def read_pdb_from_bytes(id: str, pdb_bytes: bytes) -> Structure:
     """
     Reads pdb file into a Structure object.
@@ -31,6 +35,7 @@ def read_pdb_from_bytes(id: str, pdb_bytes: bytes) -> Structure:
     return PDBParser().get_structure(id, pdb_stream)
 
 
+@instrument
 def read_pdb_from_path(pdb_path: Path | str) -> Structure:
     """
     Reads a pdb file into a Structure object.
@@ -46,3 +51,56 @@ def read_pdb_from_path(pdb_path: Path | str) -> Structure:
     pdb_path = convert_to_path(pdb_path)
     id = pdb_path.stem
     return PDBParser().get_structure(id, pdb_path)
+
+
+def iter_model_blocks(pdb_path: Path) -> Iterator[str]:
+    """Yield the coordinate records of each model in a pdb file one model at a time,
+    without reading the whole file into memory. Files without MODEL records are
+    treated as a single model.
+    """
+    block = []
+    with open(pdb_path) as f:
+        for line in f:
+            record = line[:6].rstrip()
+            if record in ('ATOM', 'HETATM', 'TER'):
+                block.append(line)
+            elif record == 'ENDMDL' and block:
+                yield ''.join(block)
+                block = []
+    if block:
+        yield ''.join(block)
+
+
+@instrument
+def read_pdb_from_block(id: str, block: str) -> Structure:
+    """
+    Reads the coordinate records of a single model into a Structure object.
+
+    Parameters:
+    -----------
+    id (str): id of structure object.
+    block (str): ATOM/HETATM records of one model.
+
+    Returns:
+    --------
+    Structure: Structure object containing a single model.
+    """
+    return PDBParser(QUIET=True).get_structure(id, io.StringIO(block))
+
+
+def iter_models_from_path(pdb_path: Path | str) -> Iterator[Structure]:
+    """
+    Reads a multi-model pdb file (e.g. an NMR ensemble or MD trajectory) one model
+    at a time, so that memory use does not depend on the number of models.
+
+    Parameters:
+    -----------
+    pdb_path (Path | str): path to pdb file.
+
+    Returns:
+    --------
+    Iterator[Structure]: Structure objects each containing a single model.
+    """
+    pdb_path = convert_to_path(pdb_path)
+    for block in iter_model_blocks(pdb_path):
+        yield read_pdb_from_block(pdb_path.stem, block)
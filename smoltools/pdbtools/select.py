@@ -7,43 +7,105 @@ from Bio.PDB.Chain import Chain
 from Bio.PDB.Residue import Residue
 from Bio.PDB.Structure import Structure
 
+import numpy as np
+
 from smoltools.pdbtools.exceptions import ChainNotFound, NoResiduesFound, NoAtomsFound
+from smoltools.pdbtools.shared import AtomArrays
+from smoltools.profiling import instrument
 
 
-def get_chain(structure: Structure, model: int, chain: str) -> Chain:
+@instrument
+def get_chain(
+    structure: Structure | AtomArrays, model: int, chain: str
+) -> Chain | AtomArrays:
     """Returns a chain from a PDB structure object.
 
     Parameters:
     -----------
-    structure (Structure): PDB structure object.
+    structure (Structure | AtomArrays): PDB structure object, or atom arrays of one
+        model.
     model (int): Model number.
     chain (str): Chain identifier.
 
     Returns:
     --------
-    Chain: PDB chain object.
+    Chain | AtomArrays: PDB chain object, or atom arrays of the chain.
     """
+    if isinstance(structure, AtomArrays):
+        codes = structure.codes_of('chain', [chain])
+        if model != structure.model or not len(codes):
+            raise ChainNotFound(structure.structure_id, model, chain)
+        return structure.take(structure.chain_codes == codes[0])
     try:
         return structure[model][chain]
     except KeyError as e:
         raise ChainNotFound(structure.get_id(), model, chain) from e
 
 
-def get_residues(chain: Chain, residue_filter: set[str] = None) -> list[Residue]:
+@instrument
+def get_chains(
+    structure: Structure | AtomArrays, model: int, chains: list[str] = None
+) -> AtomArrays:
+    """Returns the atoms of several chains from a PDB structure object, selected in
+    one pass.
+
+    Parameters:
+    -----------
+    structure (Structure | AtomArrays): PDB structure object, or atom arrays of one
+        model.
+    model (int): Model number.
+    chains (list[str]): Optional, chain identifiers. Default is every chain in the
+        model.
+
+    Returns:
+    --------
+    AtomArrays: Atom arrays of the chains, in the order of the structure.
+    """
+    if not isinstance(structure, AtomArrays):
+        try:
+            structure = AtomArrays.from_entity(structure[model])
+        except KeyError as e:
+            raise ChainNotFound(structure.get_id(), model, chains) from e
+    elif model != structure.model:
+        raise ChainNotFound(structure.structure_id, model, chains)
+    if chains is None:
+        return structure
+
+    missing = set(chains) - set(structure.chain_ids)
+    if missing:
+        raise ChainNotFound(structure.structure_id, model, sorted(missing)[0])
+    codes = structure.codes_of('chain', chains)
+    return structure.take(np.isin(structure.chain_codes, codes))
+
+
+@instrument
+def get_residues(
+    chain: Chain | AtomArrays, residue_filter: set[str] = None
+) -> list[Residue] | AtomArrays:
     """Produces a list of all residues in a PDB chain. Can provide a set of specific
     residues to keep.
 
     Parameters:
     -----------
-    chain (Chain): PDB chain object.
+    chain (Chain | AtomArrays): PDB chain object, or atom arrays.
     residue_filter (set[str]): Optional, a set (or other list-like) of three letter
         amino codes for the residues to keep. Default is to return all residues.
 
     Returns:
     --------
-    list[Residue]: List of PDB residue objects in the given entity that meet the
-        residue filter.
+    list[Residue] | AtomArrays: List of PDB residue objects in the given entity that
+        meet the residue filter, or the atoms of those residues.
     """
+    if isinstance(chain, AtomArrays):
+        if residue_filter is None:
+            mask = ~chain.hetero
+        else:
+            codes = chain.codes_of('residue', residue_filter)
+            mask = np.isin(chain.residue_codes, codes)
+        if not mask.any():
+            raise NoResiduesFound
+        return chain.take(mask)
+
     if residue_filter is None:
         residues = [
             residue for residue in chain.get_residues() if residue.get_id()[0] == ' '
@@ -65,17 +127,23 @@ def _validate_residues(residues: list[Residue]) -> list[Residue]:
         return residues
 
 
-def get_alpha_carbons(residues: list[Residue]) -> list[Atom]:
+@instrument
+def get_alpha_carbons(residues: list[Residue] | AtomArrays) -> list[Atom] | AtomArrays:
     """Returns a list of alpha carbons for a given list of residues.
 
     Parameters:
     -----------
-    residues (list[Residue]): list of PDB residue objects.
+    residues (list[Residue] | AtomArrays): list of PDB residue objects, or atom
+        arrays.
 
     Returns:
     --------
-    list[Atom]: list of alpha carbons as PDB atom objects.
+    list[Atom] | AtomArrays: list of alpha carbons as PDB atom objects, or atom
+        arrays of the alpha carbons.
     """
+    if isinstance(residues, AtomArrays):
+        mask = np.isin(residues.atom_codes, residues.codes_of('atom', ['CA']))
+        return _validate_atoms(residues.take(mask))
 
     def _get_atoms(residue) -> list[Atom]:
         return [atom for atom in residue.get_atoms() if atom.get_id() == 'CA']
@@ -88,13 +156,25 @@ def get_alpha_carbons(residues: list[Residue]) -> list[Atom]:
         return atoms
 
 
+@instrument
 def get_carbons(
-    residues: list[Residue], atom_select: dict[str : list[str]]
-) -> list[Atom]:
+    residues: list[Residue] | AtomArrays, atom_select: dict[str : list[str]]
+) -> list[Atom] | AtomArrays:
     """Returns a list of atoms from a list of residues that meet the atom selection
     criteria. Requires a dictionary of the names of the atoms to retrieve for each
     amino acid.
     """
+    if isinstance(residues, AtomArrays):
+        # lookup table of the selected (residue name, atom name) code pairs
+        selected = np.array(
+            [
+                [atom in atom_select.get(residue, ()) for atom in residues.atom_names]
+                for residue in residues.residue_names
+            ],
+            dtype=bool,
+        ).reshape(len(residues.residue_names), len(residues.atom_names))
+        mask = selected[residues.residue_codes, residues.atom_codes]
+        return _validate_atoms(residues.take(mask))
 
     def _get_atoms(residue: Residue):
         atom_filter = atom_select[residue.get_resname()]
@@ -104,14 +184,19 @@ def get_carbons(
     return _validate_atoms(atoms)
 
 
-def filter_by_b_factor(atoms: list[Atom], cutoff) -> list[Atom]:
+@instrument
+def filter_by_b_factor(
+    atoms: list[Atom] | AtomArrays, cutoff
+) -> list[Atom] | AtomArrays:
     """Returns a list of atoms with a b factor that meets the provided cutoff."""
+    if isinstance(atoms, AtomArrays):
+        return _validate_atoms(atoms.take(atoms.b_factors > cutoff))
     atoms = [atom for atom in atoms if atom.get_bfactor() > cutoff]
     return _validate_atoms(atoms)
 
 
 def _validate_atoms(atoms=list[Atom]) -> list[Atom]:
-    if not atoms:
+    if not len(atoms):
         raise NoAtomsFound
     else:
         return atoms
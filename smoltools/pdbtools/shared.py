@@ -0,0 +1,327 @@
+"""Atom tables as plain arrays (coordinates plus integer-coded metadata), and sharing
+them between processes through shared memory. A structure parsed once can be
+published, and worker processes attach to it without copying or re-parsing; the
+selection functions in pdbtools.select, coordinate_table and the distance functions
+in calculate.distance accept AtomArrays in place of Biopython objects.
+
+Usage:
+------
+with SharedAtomArrays.publish(AtomArrays.from_entity(structure)) as shared:
+    executor.map(job, itertools.repeat(shared.handle, n_jobs), ...)
+
+def job(handle, ...):
+    atoms = attach(handle)  # zero-copy view, attached once per process
+"""
+
+import os
+import sys
+import threading
+from dataclasses import dataclass, field, fields, replace
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# fields of AtomArrays stored in shared memory, with their dtypes
+ARRAY_FIELDS = {
+    'coords': np.float32,
+    'b_factors': np.float64,
+    'residue_numbers': np.int32,
+    'hetero': np.bool_,
+    'residue_codes': np.int16,
+    'atom_codes': np.int16,
+    'chain_codes': np.int16,
+}
+
+
+@dataclass(frozen=True, eq=False)
+class AtomArrays:
+    """Atoms of one model as arrays, with residue names, atom names and chain IDs
+    stored as integer codes into lookup tuples.
+
+    Parameters:
+    -----------
+    coords (ndarray): n_atoms x 3 array of coordinates (float32, as in Biopython).
+    b_factors (ndarray): B factor of each atom.
+    residue_numbers (ndarray): Residue number of each atom.
+    hetero (ndarray): Whether each atom belongs to a hetero residue (ligand, water).
+    residue_codes (ndarray): Index of each atom's residue name in residue_names.
+    atom_codes (ndarray): Index of each atom's name in atom_names.
+    chain_codes (ndarray): Index of each atom's chain in chain_ids.
+    residue_names (tuple[str]): Three letter residue names.
+    atom_names (tuple[str]): Atom names.
+    chain_ids (tuple[str]): Chain IDs.
+    structure_id (str): ID of the structure (default = '').
+    model (int): Model number (default = 0).
+    """
+
+    coords: np.ndarray
+    b_factors: np.ndarray
+    residue_numbers: np.ndarray
+    hetero: np.ndarray
+    residue_codes: np.ndarray
+    atom_codes: np.ndarray
+    chain_codes: np.ndarray
+    residue_names: tuple[str, ...]
+    atom_names: tuple[str, ...]
+    chain_ids: tuple[str, ...]
+    structure_id: str = ''
+    model: int = 0
+    # shared memory block backing the arrays, kept open while they are in use
+    _buffer: object = field(default=None, repr=False)
+
+    @classmethod
+    def from_entity(cls, entity, model: int = 0) -> 'AtomArrays':
+        """Extract the atoms of a Biopython Model or Chain (or of one model of a
+        Structure) in a single pass.
+
+        Parameters:
+        -----------
+        entity (Structure | Model | Chain): Biopython entity.
+        model (int): Model number, if entity is a Structure (default = 0).
+
+        Returns:
+        --------
+        AtomArrays: Arrays of the entity's atoms.
+        """
+        if entity.get_level() == 'S':
+            entity = entity[model]
+        structure_id = entity.get_full_id()[0]
+        model = entity.get_full_id()[1]
+
+        records = []
+        for atom in entity.get_atoms():
+            residue = atom.get_parent()
+            hetero, number, _ = residue.get_id()
+            records.append(
+                (
+                    *atom.get_coord(),
+                    atom.get_bfactor(),
+                    number,
+                    hetero != ' ',
+                    residue.get_resname(),
+                    atom.get_id(),
+                    residue.get_parent().get_id(),
+                )
+            )
+        x, y, z, b_factors, numbers, hetero, residues, atoms, chains = (
+            zip(*records) if records else [()] * 9
+        )
+        residue_names, residue_codes = _encode(residues)
+        atom_names, atom_codes = _encode(atoms)
+        chain_ids, chain_codes = _encode(chains)
+        return cls(
+            coords=np.column_stack([x, y, z]).astype(np.float32).reshape(-1, 3),
+            b_factors=np.asarray(b_factors, dtype=np.float64),
+            residue_numbers=np.asarray(numbers, dtype=np.int32),
+            hetero=np.asarray(hetero, dtype=np.bool_),
+            residue_codes=residue_codes,
+            atom_codes=atom_codes,
+            chain_codes=chain_codes,
+            residue_names=residue_names,
+            atom_names=atom_names,
+            chain_ids=chain_ids,
+            structure_id=structure_id,
+            model=model,
+        )
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    def take(self, mask: np.ndarray) -> 'AtomArrays':
+        """Atoms selected by a boolean mask or index array."""
+        return replace(
+            self,
+            _buffer=None,
+            **{name: getattr(self, name)[mask] for name in ARRAY_FIELDS},
+        )
+
+    def codes_of(self, kind: str, names) -> np.ndarray:
+        """Integer codes of the given residue names, atom names or chain IDs (kind is
+        'residue', 'atom' or 'chain'), skipping names not in the table."""
+        lookup = {
+            'residue': self.residue_names,
+            'atom': self.atom_names,
+            'chain': self.chain_ids,
+        }[kind]
+        index = {name: code for code, name in enumerate(lookup)}
+        return np.array([index[name] for name in names if name in index], dtype=int)
+
+    def labels(self, kind: str) -> np.ndarray:
+        """Residue names, atom names or chain IDs (kind is 'residue', 'atom' or
+        'chain') of each atom, decoded."""
+        codes = getattr(self, f'{kind}_codes')
+        lookup = {
+            'residue': self.residue_names,
+            'atom': self.atom_names,
+            'chain': self.chain_ids,
+        }[kind]
+        return np.asarray(lookup, dtype=object)[codes]
+
+    def ids(self, with_atom: bool = True) -> np.ndarray:
+        """Atom IDs (residue name, residue number, atom name, e.g. 'ILE12-CD1'), or
+        residue IDs (e.g. 'ILE12') if with_atom is False."""
+        residues = np.char.add(
+            np.asarray(self.residue_names, dtype=str)[self.residue_codes],
+            self.residue_numbers.astype(str),
+        )
+        if not with_atom:
+            return residues.astype(object)
+        atoms = np.asarray(self.atom_names, dtype=str)[self.atom_codes]
+        return np.char.add(np.char.add(residues, '-'), atoms).astype(object)
+
+
+def _encode(values) -> tuple[tuple[str, ...], np.ndarray]:
+    names, codes = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+    return tuple(str(name) for name in names), codes.astype(np.int16).ravel()
+
+
+@dataclass(frozen=True)
+class AtomArraysHandle:
+    """Picklable reference to AtomArrays published in shared memory."""
+
+    name: str
+    layout: tuple[tuple[str, str, tuple[int, ...], int], ...]
+    metadata: dict
+    # resource tracker of the publishing process (see _tracker_id)
+    tracker: tuple[int, int] = None
+
+
+_attach_lock = threading.Lock()
+_attached: dict[str, AtomArrays] = {}
+
+
+def _tracker_id() -> tuple[int, int] | None:
+    """Identity of this process's resource tracker (the device and inode of the pipe
+    to it), which processes started by multiprocessing share with their parent."""
+    if sys.version_info >= (3, 13):
+        return None
+    stat = os.fstat(resource_tracker.getfd())
+    return stat.st_dev, stat.st_ino
+
+
+def _open_shared_memory(
+    name: str, tracker: tuple[int, int] = None
+) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # before Python 3.13, attaching registers the block with the resource tracker. A
+    # tracker shared with the publisher already has it registered, but a tracker of
+    # this process's own would unlink it when this process exits
+    shm = shared_memory.SharedMemory(name=name)
+    if _tracker_id() != tracker:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def _views(buffer, layout) -> dict[str, np.ndarray]:
+    views = {}
+    for name, dtype, shape, offset in layout:
+        view = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        view.flags.writeable = False
+        views[name] = view
+    return views
+
+
+class SharedAtomArrays:
+    """AtomArrays published in a shared memory block owned by this process. Use as a
+    context manager, or call close and unlink when the workers are done.
+
+    Parameters:
+    -----------
+    shm (SharedMemory): Shared memory block holding the arrays.
+    handle (AtomArraysHandle): Handle to pass to the worker processes.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, handle: AtomArraysHandle):
+        self.shm = shm
+        self.handle = handle
+
+    @classmethod
+    def publish(cls, atoms: AtomArrays) -> 'SharedAtomArrays':
+        """Copy atom arrays into a new shared memory block.
+
+        Parameters:
+        -----------
+        atoms (AtomArrays): Atom arrays to share.
+
+        Returns:
+        --------
+        SharedAtomArrays: Owner of the block, with the handle for workers.
+        """
+        layout = []
+        offset = 0
+        for name, dtype in ARRAY_FIELDS.items():
+            array = np.ascontiguousarray(getattr(atoms, name), dtype=dtype)
+            offset = -(-offset // 8) * 8  # align each array to 8 bytes
+            layout.append((name, array.dtype.str, array.shape, offset))
+            offset += array.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for name, dtype, shape, start in layout:
+            view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+            view[...] = getattr(atoms, name)
+        metadata = {
+            item.name: getattr(atoms, item.name)
+            for item in fields(AtomArrays)
+            if item.name not in ARRAY_FIELDS and item.name != '_buffer'
+        }
+        return cls(
+            shm, AtomArraysHandle(shm.name, tuple(layout), metadata, _tracker_id())
+        )
+
+    @property
+    def atoms(self) -> AtomArrays:
+        """Read-only view of the published arrays in this process."""
+        return AtomArrays(
+            **_views(self.shm.buf, self.handle.layout),
+            **self.handle.metadata,
+            _buffer=self.shm,
+        )
+
+    def close(self) -> None:
+        self.shm.close()
+
+    def unlink(self) -> None:
+        """Free the shared memory block, once no process needs it any more."""
+        self.shm.unlink()
+
+    def __enter__(self) -> 'SharedAtomArrays':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        # views handed out in this process keep the buffer exported, so the block
+        # may not close until they are released; unlinking still frees it after
+        try:
+            self.close()
+        except BufferError:
+            pass
+        self.unlink()
+
+
+def attach(handle: AtomArraysHandle) -> AtomArrays:
+    """Attach to atom arrays published by another process, without copying them.
+    Each process attaches to a block once; later calls return the same arrays.
+
+    Parameters:
+    -----------
+    handle (AtomArraysHandle): Handle from SharedAtomArrays.handle.
+
+    Returns:
+    --------
+    AtomArrays: Read-only arrays backed by the shared memory block.
+    """
+    with _attach_lock:
+        atoms = _attached.get(handle.name)
+        if atoms is None:
+            shm = _open_shared_memory(handle.name, handle.tracker)
+            atoms = AtomArrays(
+                **_views(shm.buf, handle.layout), **handle.metadata, _buffer=shm
+            )
+            _attached[handle.name] = atoms
+        return atoms
+
+
+def detach(handle: AtomArraysHandle) -> None:
+    """Forget this process's attachment to a block, closing it once its arrays are no
+    longer referenced."""
+    with _attach_lock:
+        _attached.pop(handle.name, None)
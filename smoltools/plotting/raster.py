@@ -0,0 +1,294 @@
+"""Functions for rendering large heatmaps server-side into a compact image layer, with
+a sparse overlay of only the significant cells for tooltips."""
+
+import base64
+import struct
+import zlib
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from smoltools.profiling import instrument
+
+BLOCK_METHODS = ['max', 'min', 'absmax']
+
+# color stops sampled from the matching Vega color schemes
+COLOR_SCHEMES = {
+    'viridis': [
+        '#440154',
+        '#472d7b',
+        '#3b528b',
+        '#2c728e',
+        '#21918c',
+        '#28ae80',
+        '#5ec962',
+        '#addc30',
+        '#fde725',
+    ],
+    'blues': ['#cfe1f2', '#93c4de', '#4a98c9', '#1764ab', '#08306b'],
+    'redblue': [
+        '#67001f',
+        '#b2182b',
+        '#d6604d',
+        '#f4a582',
+        '#fddbc7',
+        '#f7f7f7',
+        '#d1e5f0',
+        '#92c5de',
+        '#4393c3',
+        '#2166ac',
+        '#053061',
+    ],
+}
+
+MAX_TOOLTIPS = 5000
+
+
+def tidy_to_matrix(
+    df: pd.DataFrame,
+    value: str,
+    x_order: pd.Index = None,
+    y_order: pd.Index = None,
+) -> tuple[np.ndarray, pd.Index, pd.Index]:
+    """Convert a tidy table of atom pairs into a matrix with one row per id_2 and one
+    column per id_1. Cells without a pair in the table are NaN.
+
+    Parameters:
+    -----------
+    df (DataFrame): Dataframe with the atom IDs of each atom pair ('id_1', 'id_2') and
+        the value to fill the matrix with.
+    value (str): Name of the column to fill the matrix with.
+    x_order (Index): Optional, order of the id_1 values along the columns. Default
+        is order of appearance.
+    y_order (Index): Optional, order of the id_2 values along the rows. Default is
+        order of appearance.
+
+    Returns:
+    --------
+    tuple[ndarray, Index, Index]: The matrix, and the id_1 and id_2 labels of its
+        columns and rows.
+    """
+    x_order = pd.Index(pd.unique(df.id_1) if x_order is None else x_order)
+    y_order = pd.Index(pd.unique(df.id_2) if y_order is None else y_order)
+    matrix = np.full((len(y_order), len(x_order)), np.nan)
+    matrix[y_order.get_indexer(df.id_2), x_order.get_indexer(df.id_1)] = df[value]
+    return matrix, x_order, y_order
+
+
+def downsample(matrix: np.ndarray, block_size: int, method: str = 'max') -> np.ndarray:
+    """Reduce each block_size x block_size block of a matrix to a single value,
+    ignoring NaN cells.
+
+    Parameters:
+    -----------
+    matrix (ndarray): Matrix to downsample.
+    block_size (int): Number of rows and columns reduced into each cell.
+    method (str): 'max', 'min', or 'absmax' (the value of largest magnitude, keeping
+        its sign) (default = 'max').
+
+    Returns:
+    --------
+    ndarray: Downsampled matrix.
+    """
+    if block_size == 1:
+        return matrix
+
+    n_rows, n_cols = matrix.shape
+    pad_rows, pad_cols = -n_rows % block_size, -n_cols % block_size
+    blocks = np.pad(
+        matrix, ((0, pad_rows), (0, pad_cols)), constant_values=np.nan
+    ).reshape(
+        (n_rows + pad_rows) // block_size,
+        block_size,
+        (n_cols + pad_cols) // block_size,
+        block_size,
+    )
+    empty = np.isnan(blocks).all(axis=(1, 3))
+    filled = np.where(np.isnan(blocks), 0, blocks)
+
+    if method == 'max':
+        reduced = np.where(np.isnan(blocks), -np.inf, blocks).max(axis=(1, 3))
+    elif method == 'min':
+        reduced = np.where(np.isnan(blocks), np.inf, blocks).min(axis=(1, 3))
+    elif method == 'absmax':
+        largest = filled.max(axis=(1, 3))
+        smallest = filled.min(axis=(1, 3))
+        reduced = np.where(np.abs(largest) >= np.abs(smallest), largest, smallest)
+    else:
+        raise ValueError(f'Unknown method {method!r}, choices are {BLOCK_METHODS}')
+
+    return np.where(empty, np.nan, reduced)
+
+
+def _hex_to_rgb(colors: list[str]) -> np.ndarray:
+    return np.array(
+        [[int(color[i : i + 2], 16) for i in (1, 3, 5)] for color in colors]
+    )
+
+
+def colorize(
+    matrix: np.ndarray, scheme: str, domain: tuple[float, float], reverse: bool = False
+) -> np.ndarray:
+    """Map matrix values onto a color scheme as RGBA pixels. NaN cells are made
+    transparent.
+    """
+    stops = _hex_to_rgb(COLOR_SCHEMES[scheme])
+    if reverse:
+        stops = stops[::-1]
+
+    low, high = domain
+    scaled = (matrix - low) / ((high - low) or 1)
+    position = np.clip(np.nan_to_num(scaled), 0, 1) * (len(stops) - 1)
+    lower = np.minimum(position.astype(int), len(stops) - 2)
+    fraction = (position - lower)[..., None]
+    rgb = stops[lower] * (1 - fraction) + stops[lower + 1] * fraction
+
+    alpha = np.where(np.isnan(matrix), 0, 255)[..., None]
+    return np.concatenate([rgb, alpha], axis=-1).round().astype(np.uint8)
+
+
+def encode_png(pixels: np.ndarray) -> bytes:
+    """Encode an (height, width, 4) array of RGBA pixels as a PNG image."""
+    height, width, _ = pixels.shape
+
+    def _chunk(tag: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack('>I', len(data))
+            + tag
+            + data
+            + struct.pack('>I', zlib.crc32(tag + data))
+        )
+
+    # each scanline is prefixed with filter type 0 (none)
+    scanlines = np.concatenate(
+        [np.zeros((height, 1), dtype=np.uint8), pixels.reshape(height, -1)], axis=1
+    )
+    return b''.join(
+        [
+            b'\x89PNG\r\n\x1a\n',
+            _chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)),
+            _chunk(b'IDAT', zlib.compress(scanlines.tobytes(), 9)),
+            _chunk(b'IEND', b''),
+        ]
+    )
+
+
+def _data_uri(png: bytes) -> str:
+    return 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
+
+
+@instrument
+def raster_heatmap(
+    df: pd.DataFrame,
+    value: str,
+    significant: pd.Series,
+    tooltip: list[alt.Tooltip],
+    color_title: str,
+    scheme: str = 'viridis',
+    domain: tuple[float, float] = None,
+    reverse: bool = False,
+    x_order: pd.Index = None,
+    y_order: pd.Index = None,
+    x_title: str = 'Atom #1',
+    y_title: str = 'Atom #2',
+    size: int = 600,
+    block_size: int = 1,
+    block_method: str = 'max',
+) -> alt.Chart:
+    """Heatmap of a tidy table of atom pairs rendered server-side into an image layer,
+    with an invisible overlay of only the significant pairs to provide tooltips.
+
+    Parameters:
+    -----------
+    df (DataFrame): Dataframe with the atom IDs of each atom pair ('id_1', 'id_2') and
+        the value to plot.
+    value (str): Name of the column to plot.
+    significant (Series): Boolean mask of the pairs to include in the tooltip
+        overlay. At most MAX_TOOLTIPS pairs are kept, the smallest values if the
+        blocks are reduced by 'min' and the largest magnitudes otherwise.
+    tooltip (list[Tooltip]): Tooltips for the overlay.
+    color_title (str): Title of the color legend.
+    scheme (str): Name of the color scheme (default = 'viridis').
+    domain (tuple[float, float]): Optional, range of values mapped onto the color
+        scheme. Default is the range of the values.
+    reverse (bool): Whether to reverse the color scheme (default = False).
+    x_order (Index): Optional, order of the id_1 values along the x axis.
+    y_order (Index): Optional, order of the id_2 values along the y axis.
+    x_title (str): title for X axis.
+    y_title (str): title for Y axis.
+    size (int): Width and height of the chart in pixels (default = 600).
+    block_size (int): Number of atoms reduced into each pixel (default = 1).
+    block_method (str): How blocks are reduced, 'max', 'min', or 'absmax'
+        (default = 'max').
+
+    Returns:
+    --------
+    Chart: Altair chart object.
+    """
+    matrix, x_order, y_order = tidy_to_matrix(df, value, x_order, y_order)
+    if domain is None:
+        domain = (np.nanmin(matrix), np.nanmax(matrix))
+
+    pixels = colorize(
+        downsample(matrix, block_size, block_method), scheme, domain, reverse=reverse
+    )
+    n_x, n_y = len(x_order), len(y_order)
+    x_scale = alt.Scale(domain=[0, n_x], nice=False, zero=False)
+    y_scale = alt.Scale(domain=[0, n_y], nice=False, zero=False, reverse=True)
+    axis = alt.Axis(labels=False, ticks=False, grid=False)
+
+    image = (
+        alt.Chart(
+            pd.DataFrame(
+                {
+                    'x': [0],
+                    'x2': [n_x],
+                    'y': [0],
+                    'y2': [n_y],
+                    'url': [_data_uri(encode_png(pixels))],
+                }
+            )
+        )
+        .mark_image(aspect=False)
+        .encode(
+            x=alt.X('x:Q', title=x_title, scale=x_scale, axis=axis),
+            x2='x2',
+            y=alt.Y('y:Q', title=y_title, scale=y_scale, axis=axis),
+            y2='y2',
+            url='url:N',
+        )
+    )
+
+    overlay_data = df.loc[significant]
+    if len(overlay_data) > MAX_TOOLTIPS:
+        if block_method == 'min':
+            keep = overlay_data[value].nsmallest(MAX_TOOLTIPS).index
+        else:
+            keep = overlay_data[value].abs().nlargest(MAX_TOOLTIPS).index
+        overlay_data = overlay_data.loc[keep]
+    overlay_data = overlay_data.assign(
+        x=lambda x: x_order.get_indexer(x.id_1),
+        x2=lambda x: x.x + 1,
+        y=lambda x: y_order.get_indexer(x.id_2),
+        y2=lambda x: x.y + 1,
+    )
+
+    overlay = (
+        alt.Chart(overlay_data)
+        .mark_rect(opacity=0)
+        .encode(
+            x=alt.X('x:Q', scale=x_scale, axis=axis),
+            x2='x2',
+            y=alt.Y('y:Q', scale=y_scale, axis=axis),
+            y2='y2',
+            color=alt.Color(
+                value,
+                title=color_title,
+                scale=alt.Scale(domain=list(domain), scheme=scheme, reverse=reverse),
+            ),
+            tooltip=tooltip,
+        )
+    )
+
+    return alt.layer(image, overlay).properties(width=size, height=size)
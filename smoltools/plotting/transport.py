@@ -0,0 +1,95 @@
+"""Functions for shrinking the data embedded in Altair chart specs: integer-coded atom
+IDs with a shared lookup table, rounded values, and optional sidecar data files that
+are referenced by URL instead of being inlined."""
+
+from pathlib import Path
+
+import altair as alt
+import pandas as pd
+
+from smoltools.profiling import instrument
+
+SIDECAR_FORMATS = ['.json', '.csv']
+
+
+@instrument
+def encode_pairs(
+    df: pd.DataFrame, columns: list[str], decimals: int = 2
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Replace the atom IDs of each atom pair with integer codes into one lookup table
+    shared by both columns, and keep only the given value columns.
+
+    Parameters:
+    -----------
+    df (DataFrame): Dataframe with the atom IDs of each atom pair ('id_1', 'id_2').
+    columns (list[str]): Value columns to keep.
+    decimals (int): Number of decimals float columns are rounded to (default = 2).
+
+    Returns:
+    --------
+    tuple[DataFrame, DataFrame]: The coded pairs, with the atom ID codes in 'code_1'
+        and 'code_2', and the lookup table mapping each 'code' to its 'id'.
+    """
+    codes, ids = pd.factorize(pd.concat([df.id_1, df.id_2], ignore_index=True))
+    data = (
+        df.loc[:, columns]
+        .round(decimals)
+        .assign(code_1=codes[: len(df)], code_2=codes[len(df) :])
+        .reset_index(drop=True)
+    )
+    return data, pd.DataFrame({'code': range(len(ids)), 'id': ids})
+
+
+def lookup_ids(chart: alt.Chart, lookup: pd.DataFrame) -> alt.Chart:
+    """Add transforms that decode 'code_1' and 'code_2' back into 'id_1' and 'id_2'
+    in the browser.
+    """
+    return chart.transform_lookup(
+        lookup='code_1',
+        from_=alt.LookupData(data=lookup, key='code', fields=['id']),
+        as_=['id_1'],
+    ).transform_lookup(
+        lookup='code_2',
+        from_=alt.LookupData(data=lookup, key='code', fields=['id']),
+        as_=['id_2'],
+    )
+
+
+@instrument
+def chart_data(data: pd.DataFrame, data_path: str | Path = None) -> alt.Data:
+    """Data for an Altair chart, either inlined or written to a sidecar file.
+
+    Parameters:
+    -----------
+    data (DataFrame): Chart data.
+    data_path (str | Path): Optional, path of a JSON or CSV file to write the data to.
+        The chart references the file by this path as its URL, so a relative path
+        should be relative to where the chart will be served. Default is to inline
+        the data in the chart spec.
+
+    Returns:
+    --------
+    Data: Inline or URL data object for alt.Chart.
+    """
+    if data_path is None:
+        return data
+
+    path = Path(data_path)
+    if path.suffix == '.json':
+        data.to_json(path, orient='records')
+        data_format = alt.DataFormat(type='json')
+    elif path.suffix == '.csv':
+        data.to_csv(path, index=False)
+        parse = {
+            column: 'number'
+            for column in data.columns
+            if pd.api.types.is_numeric_dtype(data[column])
+        }
+        data_format = alt.CsvDataFormat(type='csv', parse=parse)
+    else:
+        raise ValueError(
+            f'Unsupported data file type {path.suffix!r}, choices are '
+            f'{SIDECAR_FORMATS}'
+        )
+
+    return alt.UrlData(url=str(data_path), format=data_format)
@@ -0,0 +1,315 @@
+"""Stage-level profiling of the pipelines. Instrumented functions and blocks report the
+wall time, the number of rows produced and, optionally, the memory allocated by each
+named stage to the registered callbacks. With no callbacks registered, the checks
+cost a single global lookup per call.
+
+Usage:
+------
+with profiling.profile(memory=True) as prof:
+    fret0.path_to_distances('structure.pdb')
+prof.to_chrome_trace('trace.json')  # open in chrome://tracing or ui.perfetto.dev
+
+Stages run in worker processes (n_workers > 1) are not recorded.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+@dataclass
+class StageRecord:
+    """Measurements of one run of a stage.
+
+    Parameters:
+    -----------
+    name (str): Name of the stage (e.g. 'calculate.cdist').
+    start (float): Start time (in seconds, from time.perf_counter).
+    duration (float): Wall time (in seconds).
+    rows (int): Number of rows produced, if known.
+    allocated_bytes (int): Net memory allocated by the stage, if traced.
+    peak_bytes (int): Peak memory allocated during the stage, if traced.
+    depth (int): Nesting depth of the stage within other stages.
+    process_id (int): ID of the process that ran the stage.
+    thread_id (int): ID of the thread that ran the stage.
+    """
+
+    name: str
+    start: float
+    duration: float = 0.0
+    rows: int = None
+    allocated_bytes: int = None
+    peak_bytes: int = None
+    depth: int = 0
+    process_id: int = field(default_factory=os.getpid)
+    thread_id: int = field(default_factory=threading.get_ident)
+
+
+_callbacks: list[Callable[[StageRecord], None]] = []
+_memory_requests = 0
+_started_tracemalloc = False
+_local = threading.local()
+
+
+def _stack() -> list:
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+def is_enabled() -> bool:
+    """Whether any callback is registered, i.e. whether stages are measured."""
+    return bool(_callbacks)
+
+
+def add_callback(callback: Callable[[StageRecord], None], memory: bool = False) -> None:
+    """Register a function called with the StageRecord of every completed stage.
+
+    Parameters:
+    -----------
+    callback (Callable): Function taking a StageRecord.
+    memory (bool): Trace memory allocations with tracemalloc while the callback is
+        registered. Tracing slows Python allocations down severalfold (default =
+        False).
+    """
+    global _memory_requests, _started_tracemalloc
+    _callbacks.append(callback)
+    if memory:
+        _memory_requests += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracemalloc = True
+
+
+def remove_callback(callback: Callable[[StageRecord], None], memory: bool = False):
+    """Unregister a callback registered with add_callback (with the same memory)."""
+    global _memory_requests, _started_tracemalloc
+    _callbacks.remove(callback)
+    if memory:
+        _memory_requests -= 1
+        if not _memory_requests and _started_tracemalloc:
+            tracemalloc.stop()
+            _started_tracemalloc = False
+
+
+def _count_rows(result) -> int:
+    shape = getattr(result, 'shape', None)
+    if shape:
+        return shape[0]
+    if isinstance(result, list):
+        return len(result)
+    return None
+
+
+class _Stage:
+    """Measurement of one run of a stage, as a context manager."""
+
+    __slots__ = ('record', 'rows', '_start_bytes', '_peak_bytes')
+
+    def __init__(self, name: str):
+        self.record = StageRecord(name, start=0.0)
+        self.rows = None
+
+    def __enter__(self) -> '_Stage':
+        stack = _stack()
+        self.record.depth = len(stack)
+        if _memory_requests and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # the peak counter is shared, so hand the enclosing stage its peak
+                # before resetting it for this one
+                stack[-1]._peak_bytes = max(stack[-1]._peak_bytes or 0, peak)
+            tracemalloc.reset_peak()
+            self._start_bytes = current
+            self._peak_bytes = current
+        else:
+            self._start_bytes = None
+        stack.append(self)
+        self.record.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        record = self.record
+        record.duration = time.perf_counter() - record.start
+        stack = _stack()
+        stack.pop()
+        if self._start_bytes is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(self._peak_bytes, peak)
+            record.allocated_bytes = current - self._start_bytes
+            record.peak_bytes = peak - self._start_bytes
+            if stack:
+                stack[-1]._peak_bytes = max(stack[-1]._peak_bytes or 0, peak)
+        record.rows = self.rows
+        for callback in list(_callbacks):
+            callback(record)
+
+
+class _NullStage:
+    """Stand-in for _Stage while profiling is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullStage':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+    def __setattr__(self, name, value) -> None:
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str) -> _Stage | _NullStage:
+    """Context manager measuring a block of code as a named stage. Set the rows
+    attribute of the returned object to record the number of rows produced.
+
+    Parameters:
+    -----------
+    name (str): Name of the stage.
+
+    Returns:
+    --------
+    Context manager for the stage.
+    """
+    if not _callbacks:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def instrument(name: str | Callable = None) -> Callable:
+    """Decorator measuring every call of a function as a named stage, counting the
+    rows of its result. Can be used with or without a name (default = the module and
+    name of the function, without the leading 'smoltools.').
+    """
+
+    def decorator(func: Callable) -> Callable:
+        stage_name = name or (
+            f'{func.__module__}.{func.__qualname__}'.removeprefix('smoltools.')
+        )
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _callbacks:
+                return func(*args, **kwargs)
+            with _Stage(stage_name) as measured:
+                result = func(*args, **kwargs)
+                measured.rows = _count_rows(result)
+            return result
+
+        return wrapper
+
+    if callable(name):
+        func, name = name, None
+        return decorator(func)
+    return decorator
+
+
+class Profile:
+    """Records of the stages run while profiling, with export to JSON and to the
+    Chrome trace event format."""
+
+    def __init__(self):
+        self.records: list[StageRecord] = []
+
+    def __call__(self, record: StageRecord) -> None:
+        self.records.append(record)
+
+    def to_frame(self) -> 'pd.DataFrame':
+        """Dataframe with one row per stage run, in order of completion."""
+        import pandas as pd
+
+        return pd.DataFrame(
+            [asdict(record) for record in self.records],
+            columns=list(StageRecord.__dataclass_fields__),
+        )
+
+    def summary(self) -> 'pd.DataFrame':
+        """Dataframe with the number of calls and the total and mean wall time (in
+        seconds), rows and peak memory of each stage, slowest first."""
+        return (
+            self.to_frame()
+            .groupby('name')
+            .agg(
+                calls=('duration', 'size'),
+                total_time=('duration', 'sum'),
+                mean_time=('duration', 'mean'),
+                rows=('rows', lambda rows: rows.sum(min_count=1)),
+                peak_bytes=('peak_bytes', 'max'),
+            )
+            .sort_values('total_time', ascending=False)
+        )
+
+    def to_json(self, path: str | Path = None) -> str:
+        """Records as a JSON list, optionally written to a file."""
+        text = json.dumps([asdict(record) for record in self.records], indent=2)
+        if path is not None:
+            Path(path).write_text(text)
+        return text
+
+    def to_chrome_trace(self, path: str | Path = None) -> str:
+        """Records as Chrome trace events (viewable in chrome://tracing or Perfetto),
+        optionally written to a file."""
+        origin = min((record.start for record in self.records), default=0)
+        events = [
+            {
+                'name': record.name,
+                'cat': record.name.split('.')[0],
+                'ph': 'X',
+                'ts': (record.start - origin) * 1e6,
+                'dur': record.duration * 1e6,
+                'pid': record.process_id,
+                'tid': record.thread_id,
+                'args': {
+                    key: value
+                    for key, value in [
+                        ('rows', record.rows),
+                        ('allocated_bytes', record.allocated_bytes),
+                        ('peak_bytes', record.peak_bytes),
+                    ]
+                    if value is not None
+                },
+            }
+            for record in self.records
+        ]
+        text = json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+        if path is not None:
+            Path(path).write_text(text)
+        return text
+
+
+@contextmanager
+def profile(memory: bool = False) -> Iterator[Profile]:
+    """Record every stage run inside the block.
+
+    Parameters:
+    -----------
+    memory (bool): Also record allocated and peak memory of each stage with
+        tracemalloc, which slows Python allocations down (default = False).
+
+    Returns:
+    --------
+    Profile: Records of the stages, complete once the block exits.
+    """
+    recorded = Profile()
+    add_callback(recorded, memory=memory)
+    try:
+        yield recorded
+    finally:
+        remove_callback(recorded, memory=memory)
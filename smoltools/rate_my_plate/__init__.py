@@ -1,11 +1,23 @@
-from smoltools.rate_my_plate.main import (
-    rate_plate,
-    read_data,
-    read_data_from_bytes,
-    convert_to_wide,
-)
+from smoltools._lazy import attach
 
-from smoltools.rate_my_plate.plots import (
-    consumption_curve,
-    kinetics_curves,
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    attributes={
+        'rate_plate': 'smoltools.rate_my_plate.main',
+        'threshold_windows': 'smoltools.rate_my_plate.main',
+        'read_data': 'smoltools.rate_my_plate.main',
+        'read_data_from_bytes': 'smoltools.rate_my_plate.main',
+        'convert_to_wide': 'smoltools.rate_my_plate.main',
+        'consumption_curve': 'smoltools.rate_my_plate.plots',
+        'plate_heatmap': 'smoltools.rate_my_plate.plots',
+        'sparkline_plate': 'smoltools.rate_my_plate.plots',
+        'kinetics_curves': 'smoltools.rate_my_plate.plots',
+        'rate_plates': 'smoltools.rate_my_plate.batch',
+        'load_rates': 'smoltools.rate_my_plate.batch',
+        'LivePlate': 'smoltools.rate_my_plate.live',
+        'fit_progress_curves': 'smoltools.rate_my_plate.progress',
+        'bootstrap_rates': 'smoltools.rate_my_plate.bootstrap',
+        'PlateLayout': 'smoltools.rate_my_plate.layout',
+        'parse_wells': 'smoltools.rate_my_plate.layout',
+    },
 )
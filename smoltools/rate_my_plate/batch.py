@@ -0,0 +1,242 @@
+"""Functions for rating many plate-reader exports at once on a process pool and keeping
+the results in a partitioned Parquet store, which is partitioned by rating parameters
+and plate ID. Plates whose file and parameters are unchanged since they were last
+stored are skipped."""
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from smoltools.cache import file_hash
+from smoltools.rate_my_plate.ingest import EXCEL_EXTENSIONS, TEXT_EXTENSIONS
+from smoltools.rate_my_plate.main import rate_plate, read_data
+from smoltools.tables import load_dataset, partition_ids, stored_key, write_partition
+
+PLATE_EXTENSIONS = EXCEL_EXTENSIONS + TEXT_EXTENSIONS
+
+
+def params_key(lower_percent: float, upper_percent: float, concentration: float) -> str:
+    """Short, stable key identifying a set of rating parameters."""
+    params = json.dumps(
+        {
+            'lower_percent': float(lower_percent),
+            'upper_percent': float(upper_percent),
+            'concentration': float(concentration),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(params.encode()).hexdigest()[:12]
+
+
+def read_manifest(path: str | Path) -> pd.DataFrame:
+    """Reads the plates to rate from a directory of plate-reader exports, or from a
+    CSV manifest with a 'path' column (relative to the manifest) and optional 'plate',
+    'lower_percent', 'upper_percent' and 'concentration' columns overriding the
+    defaults for each plate.
+
+    Parameters:
+    -----------
+    path (str | Path): Directory of plate-reader exports or path to a CSV manifest.
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the 'path' and 'plate' ID of each plate, and any
+        per-plate parameters from the manifest.
+    """
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(
+            file
+            for file in path.iterdir()
+            if file.suffix.lower() in PLATE_EXTENSIONS
+            and not file.name.startswith('~$')
+        )
+        manifest = pd.DataFrame({'path': files})
+    else:
+        manifest = pd.read_csv(path).assign(
+            path=lambda x: [path.parent / file for file in x.path]
+        )
+
+    if 'plate' not in manifest:
+        manifest['plate'] = [Path(file).stem for file in manifest.path]
+    manifest['plate'] = partition_ids(manifest.plate, 'plate')
+    return manifest
+
+
+def _rate_file(job: dict) -> dict:
+    """Rate one plate and write it to its partition of the store."""
+    try:
+        rates = rate_plate(
+            read_data(job['path']),
+            lower_percent=job['lower_percent'],
+            upper_percent=job['upper_percent'],
+            concentration=job['concentration'],
+        )
+        write_partition(
+            rates.assign(
+                lower_percent=job['lower_percent'],
+                upper_percent=job['upper_percent'],
+                concentration=job['concentration'],
+            ),
+            job['store'],
+            job['partition'],
+            job['file_hash'],
+        )
+    except Exception as error:
+        return {'status': 'failed', 'error': f'{type(error).__name__}: {error}'}
+    return {'status': 'rated', 'error': None}
+
+
+def rate_plates(
+    plates: str | Path | pd.DataFrame,
+    store: str | Path,
+    lower_percent: float,
+    upper_percent: float,
+    concentration: float = 1,
+    n_workers: int = 1,
+    force: bool = False,
+) -> pd.DataFrame:
+    """Rates a batch of plates and writes the rates into a Parquet store partitioned
+    by rating parameters and plate ID (store/params=<key>/plate=<id>/part.parquet).
+    Plates already in the store with the same file contents and parameters are skipped.
+
+    Parameters:
+    -----------
+    plates (str | Path | DataFrame): Directory of plate-reader exports, CSV manifest,
+        or manifest dataframe (see read_manifest).
+    store (str | Path): Root directory of the Parquet store.
+    lower_percent (float): Default lower threshold, as a fraction of each well's
+        maximum NADH consumed.
+    upper_percent (float): Default upper threshold, as a fraction of each well's
+        maximum NADH consumed.
+    concentration (float): Default protein concentration (in uM) (default = 1).
+    n_workers (int): Number of worker processes (default = 1).
+    force (bool): Whether to re-rate plates that are already in the store
+        (default = False).
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the plate ID, path, parameter key and status ('rated',
+        'skipped' or 'failed', with the error) of each plate.
+    """
+    manifest = plates if isinstance(plates, pd.DataFrame) else read_manifest(plates)
+    manifest = manifest.assign(
+        lower_percent=manifest.get('lower_percent', lower_percent),
+        upper_percent=manifest.get('upper_percent', upper_percent),
+        concentration=manifest.get('concentration', concentration),
+    ).fillna(
+        {
+            'lower_percent': lower_percent,
+            'upper_percent': upper_percent,
+            'concentration': concentration,
+        }
+    )
+
+    store = Path(store)
+    jobs = []
+    for plate in manifest.itertuples(index=False):
+        params = params_key(
+            plate.lower_percent, plate.upper_percent, plate.concentration
+        )
+        jobs.append(
+            {
+                'plate': plate.plate,
+                'path': str(plate.path),
+                'params': params,
+                'lower_percent': float(plate.lower_percent),
+                'upper_percent': float(plate.upper_percent),
+                'concentration': float(plate.concentration),
+                'file_hash': file_hash(plate.path),
+                'store': str(store),
+                'partition': {'params': params, 'plate': plate.plate},
+            }
+        )
+
+    pending = [
+        job
+        for job in jobs
+        if force or stored_key(store, job['partition']) != job['file_hash']
+    ]
+    if n_workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(_rate_file, pending))
+    else:
+        results = [_rate_file(job) for job in pending]
+
+    outcomes = {job['plate']: result for job, result in zip(pending, results)}
+    return pd.DataFrame(
+        [
+            {
+                'plate': job['plate'],
+                'path': job['path'],
+                'params': job['params'],
+                **outcomes.get(job['plate'], {'status': 'skipped', 'error': None}),
+            }
+            for job in jobs
+        ]
+    )
+
+
+def load_rates(
+    store: str | Path,
+    plates: list[str] = None,
+    params: str = None,
+    columns: list[str] = None,
+) -> pd.DataFrame:
+    """Reads rates from a Parquet store written by rate_plates.
+
+    Parameters:
+    -----------
+    store (str | Path): Root directory of the Parquet store.
+    plates (list[str]): Optional, plate IDs to read. Default is all plates.
+    params (str): Optional, parameter key (see params_key) to read. Default is all
+        parameter sets.
+    columns (list[str]): Optional, columns to read. Default is all columns.
+
+    Returns:
+    --------
+    DataFrame: Dataframe of well rates, with the 'params' and 'plate' partition keys
+        as string columns.
+    """
+    filters = []
+    if plates is not None:
+        filters.append(('plate', 'in', [str(plate) for plate in plates]))
+    if params is not None:
+        filters.append(('params', '==', params))
+    return load_dataset(
+        store, ['params', 'plate'], columns=columns, filters=filters or None
+    )
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Rate a directory or CSV manifest of plate-reader exports into a '
+        'partitioned Parquet store.'
+    )
+    parser.add_argument('plates', help='directory of plate exports or CSV manifest')
+    parser.add_argument('store', help='root directory of the Parquet store')
+    parser.add_argument('--lower', type=float, required=True, dest='lower_percent')
+    parser.add_argument('--upper', type=float, required=True, dest='upper_percent')
+    parser.add_argument('--concentration', type=float, default=1)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), dest='n_workers')
+    parser.add_argument(
+        '--force', action='store_true', help='re-rate plates already in the store'
+    )
+    args = parser.parse_args(argv)
+
+    summary = rate_plates(**vars(args))
+    for plate in summary.itertuples(index=False):
+        print(
+            f'{plate.plate}\t{plate.status}'
+            + (f'\t{plate.error}' if plate.error else '')
+        )
+    return int((summary.status == 'failed').any())
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
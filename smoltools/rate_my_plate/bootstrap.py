@@ -0,0 +1,179 @@
+"""Functions for bootstrap confidence intervals of well rates. Every resample of every
+well is fit at once: resampled readings are drawn as index arrays into the time x
+wells matrix and fit by the closed-form regression sums, in chunks of resamples that
+can be spread over a process pool."""
+
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from smoltools.rate_my_plate import regression
+from smoltools.rate_my_plate.main import (
+    _slopes_table,
+    _window_bounds,
+    threshold_windows,
+)
+from smoltools.profiling import instrument
+
+BOOTSTRAP_METHODS = ['pairs', 'residual']
+
+# number of resamples fit together, bounding the memory of each batch
+CHUNK_SIZE = 100
+
+
+def _window_readings(
+    times: np.ndarray, values: np.ndarray, mask: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pack the readings inside each well's window to the top of the columns.
+
+    Returns:
+    --------
+    tuple[ndarray, ndarray, ndarray]: Readings x wells matrices of times and values
+        (padded with NaN below each well's readings), and the number of readings of
+        each well.
+    """
+    mask = mask & ~np.isnan(values)
+    order = np.argsort(~mask, axis=0, kind='stable')
+    n = mask.sum(axis=0)
+    n_max = max(n.max(), 1)
+    packed = np.arange(n_max)[:, None] < n[None, :]
+    x = np.where(packed, times[order[:n_max]], np.nan)
+    y = np.where(packed, np.take_along_axis(values, order[:n_max], axis=0), np.nan)
+    return x, y, n
+
+
+def _resample_rates(
+    seed: np.random.SeedSequence,
+    n_resamples: int,
+    x: np.ndarray,
+    y: np.ndarray,
+    n: np.ndarray,
+    method: str,
+) -> np.ndarray:
+    """Rates of each well for one chunk of resamples (resamples x wells)."""
+    rng = np.random.default_rng(seed)
+    n_max, n_wells = x.shape
+    draws = np.floor(rng.random((n_resamples, n_max, n_wells)) * n).astype(int)
+    drawn = np.arange(n_max)[None, :, None] < n[None, None, :]
+    draws = np.where(drawn, draws, 0)
+    columns = np.arange(n_wells)
+
+    if method == 'pairs':
+        x_star = x[draws, columns]
+        y_star = y[draws, columns]
+    else:
+        fit = _fit(x, y, ~np.isnan(x), axis=0)
+        fitted = fit['intercept'] + fit['rate'] * x
+        residuals = y - fitted
+        x_star = x[None]
+        y_star = fitted[None] + residuals[draws, columns]
+
+    return _fit(x_star, y_star, drawn, axis=1)['rate']
+
+
+def _fit(
+    x: np.ndarray, y: np.ndarray, valid: np.ndarray, axis: int
+) -> dict[str, np.ndarray]:
+    """Closed-form least squares fit along one axis of stacked readings."""
+    x = np.where(valid, x, 0)
+    y = np.where(valid, y, 0)
+    return regression.fit_from_sums(
+        np.broadcast_to(valid, np.broadcast_shapes(x.shape, y.shape)).sum(axis=axis),
+        x.sum(axis=axis),
+        y.sum(axis=axis),
+        (x * x).sum(axis=axis),
+        (x * y).sum(axis=axis),
+        (y * y).sum(axis=axis),
+    )
+
+
+@instrument
+def bootstrap_rates(
+    df: pd.DataFrame,
+    lower_percent: float,
+    upper_percent: float,
+    concentration: float = 1,
+    n_resamples: int = 1000,
+    confidence: float = 0.95,
+    method: str = 'pairs',
+    seed: int = None,
+    n_workers: int = 1,
+    windows: pd.DataFrame = None,
+) -> pd.DataFrame:
+    """Calculates bootstrap confidence intervals of the rate of every well, resampling
+    the readings inside each well's threshold window.
+
+    Parameters:
+    -----------
+    df (DataFrame): Tidy plate data with 'time', 'well' and 'nadh_consumed' columns.
+    lower_percent (float): Lower threshold, as a fraction of each well's maximum NADH
+        consumed.
+    upper_percent (float): Upper threshold, as a fraction of each well's maximum NADH
+        consumed.
+    concentration (float): Protein concentration (in uM) (default = 1).
+    n_resamples (int): Number of bootstrap resamples (default = 1000).
+    confidence (float): Confidence level of the intervals (default = 0.95).
+    method (str): 'pairs' to resample (time, reading) pairs, or 'residual' to
+        resample the residuals of the fit onto the fitted line (default = 'pairs').
+    seed (int): Optional, seed of the random number generator. Results for a seed
+        do not depend on n_workers.
+    n_workers (int): Number of worker processes (default = 1).
+    windows (DataFrame): Optional, precomputed threshold windows (see
+        threshold_windows).
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the rate of each well, the bootstrap standard error
+        ('rate_stderr') and the lower and upper confidence limits ('rate_low',
+        'rate_high'), normalized to the protein concentration.
+    """
+    if method not in BOOTSTRAP_METHODS:
+        raise ValueError(f'Unknown method {method!r}, choices are {BOOTSTRAP_METHODS}')
+    if windows is None:
+        windows = threshold_windows(df, lower_percent, upper_percent)
+
+    times, wells, values = regression.to_matrix(df)
+    mask = regression.window_mask(times, *_window_bounds(windows, wells))
+    point = regression.masked_linregress(times, values, mask)
+
+    # center time so the sums do not lose precision on long runs
+    x, y, n = _window_readings(times - times.mean(), values, mask)
+    chunk_sizes = [
+        min(CHUNK_SIZE, n_resamples - start)
+        for start in range(0, n_resamples, CHUNK_SIZE)
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    resample = partial(_resample_rates, x=x, y=y, n=n, method=method)
+
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            chunks = list(executor.map(resample, seeds, chunk_sizes))
+    else:
+        chunks = [resample(s, size) for s, size in zip(seeds, chunk_sizes)]
+    rates = np.concatenate(chunks)
+
+    alpha = (1 - confidence) / 2
+    with warnings.catch_warnings():
+        # wells with too few readings to fit have no resampled rates
+        warnings.simplefilter('ignore', RuntimeWarning)
+        low, high = np.nanquantile(rates, [alpha, 1 - alpha], axis=0)
+        standard_error = np.nanstd(rates, axis=0, ddof=1)
+
+    table = _slopes_table(
+        wells,
+        {
+            'rate': point['rate'],
+            'rate_stderr': standard_error,
+            'rate_low': low,
+            'rate_high': high,
+        },
+    )
+    return table.assign(
+        **{
+            column: table[column] / concentration
+            for column in ['rate', 'rate_stderr', 'rate_low', 'rate_high']
+        }
+    )
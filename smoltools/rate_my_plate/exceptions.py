@@ -0,0 +1,7 @@
+class NonMonotonicTime(ValueError):
+    def __init__(self, time: float) -> None:
+        message = (
+            f'Reading times must be strictly increasing, time {time:g} min is not '
+            'after the reading before it.'
+        )
+        super().__init__(message)
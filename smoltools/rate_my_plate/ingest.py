@@ -0,0 +1,223 @@
+"""Functions for reading kinetic reads from plate-reader exports (xlsx, xls, and CSV/TSV
+text). The header row is found automatically, and the parsed time x wells matrix can
+be cached as a binary file keyed by the contents of the export, so re-opening a plate
+does not parse the spreadsheet again."""
+
+import csv
+import datetime
+import hashlib
+import io
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from smoltools.cache import cache_root
+from smoltools.profiling import instrument
+from smoltools.rate_my_plate.layout import WELL_PATTERN
+
+TEXT_EXTENSIONS = ['.csv', '.tsv', '.txt']
+EXCEL_EXTENSIONS = ['.xlsx', '.xls']
+
+# labels of the time column in exports from common plate readers
+TIME_LABELS = ['kinetic read', 'time']
+
+TEXT_DELIMITERS = ['\t', ',', ';']
+
+# day zero of excel dates, which readers return for times of a day or more
+EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+
+# bump when the parsed format changes so that old cache files are not reused
+CACHE_VERSION = 3
+
+
+def default_cache_dir() -> Path:
+    """Directory for cached plates, $SMOLTOOLS_CACHE_DIR or ~/.cache/smoltools."""
+    return cache_root() / 'plates'
+
+
+def _xlsx_rows(data: bytes) -> Iterator[tuple]:
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _xls_rows(data: bytes) -> Iterator[tuple]:
+    sheet = pd.read_excel(io.BytesIO(data), header=None, dtype=object)
+    yield from sheet.itertuples(index=False, name=None)
+
+
+def _text_rows(data: bytes) -> Iterator[list]:
+    """Rows of a delimited text export from its header row on. The delimiter (tab,
+    comma or semicolon) is the one that splits the header row into a time column and
+    well columns, since preambles often use a different delimiter than the table.
+    """
+    lines = data.decode('utf-8-sig', errors='replace').splitlines()
+    for i, line in enumerate(lines):
+        for delimiter in TEXT_DELIMITERS:
+            if delimiter in line and _find_header(
+                next(csv.reader([line], delimiter=delimiter))
+            ):
+                yield from csv.reader(lines[i:], delimiter=delimiter)
+                return
+
+
+def _rows(data: bytes, suffix: str) -> Iterator:
+    suffix = suffix.lower()
+    if suffix == '.xlsx':
+        return _xlsx_rows(data)
+    elif suffix == '.xls':
+        return _xls_rows(data)
+    elif suffix in TEXT_EXTENSIONS:
+        return _text_rows(data)
+    raise ValueError(
+        f'Unsupported plate file type {suffix!r}, choices are '
+        f'{EXCEL_EXTENSIONS + TEXT_EXTENSIONS}'
+    )
+
+
+def _is_empty(cell) -> bool:
+    return cell is None or (isinstance(cell, str) and not cell.strip())
+
+
+def _find_header(row: tuple) -> tuple[int, list[int], list[str]] | None:
+    """Index of the time column and indices and names of the well columns, if the
+    row is a header row.
+    """
+    labels = ['' if cell is None else str(cell).strip() for cell in row]
+    time_columns = [i for i, label in enumerate(labels) if label.lower() in TIME_LABELS]
+    wells = [i for i, label in enumerate(labels) if re.match(WELL_PATTERN, label)]
+    if not time_columns or not wells:
+        return None
+    return time_columns[0], wells, [labels[i] for i in wells]
+
+
+def _time_text(cell) -> str:
+    """Time cell as an 'h:mm:ss' string, rounded to the nearest second."""
+    if isinstance(cell, datetime.datetime):
+        cell = cell - EXCEL_EPOCH
+        if cell < datetime.timedelta(days=61):
+            # excel counts a 29 February 1900, so earlier dates are read a day late
+            cell -= datetime.timedelta(days=1)
+    elif isinstance(cell, datetime.time):
+        cell = datetime.timedelta(
+            hours=cell.hour,
+            minutes=cell.minute,
+            seconds=cell.second,
+            microseconds=cell.microsecond,
+        )
+    if isinstance(cell, datetime.timedelta):
+        seconds = round(cell.total_seconds())
+        return f'{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+    if isinstance(cell, (int, float)):
+        # excel stores times as fractions of a day
+        return _time_text(datetime.timedelta(days=cell))
+    return str(cell).strip()
+
+
+def _value(cell) -> float:
+    try:
+        return float(cell)
+    except (TypeError, ValueError):
+        # blank, overflow or other non-numeric readings
+        return np.nan
+
+
+@instrument
+def parse_rows(rows: Iterable) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Parses the kinetic read out of the rows of a plate-reader export. The header row
+    is the first row with a time column ('Kinetic read' or 'Time') and at least one
+    well column (e.g. 'A1'), and the read continues until the first row without a time.
+
+    Parameters:
+    -----------
+    rows (Iterable): Rows of cells of the export.
+
+    Returns:
+    --------
+    tuple[ndarray, ndarray, ndarray]: The time of each reading (as timedeltas), the
+        well names, and the time x wells matrix of readings.
+    """
+    rows = iter(rows)
+    for row in rows:
+        header = _find_header(row)
+        if header is not None:
+            break
+    else:
+        raise ValueError(
+            'No header row with a time column and well columns found, expected a '
+            f'time column labelled one of {TIME_LABELS}'
+        )
+
+    time_column, well_columns, wells = header
+    times, values = [], []
+    for row in rows:
+        if len(row) <= time_column or _is_empty(row[time_column]):
+            break
+        times.append(_time_text(row[time_column]))
+        values.append(
+            [_value(row[i]) if i < len(row) else np.nan for i in well_columns]
+        )
+
+    return (
+        # cells are normalized to text first so that the column converts in one call
+        pd.to_timedelta(np.array(times, dtype=str)).to_numpy(),
+        np.array(wells, dtype=str),
+        np.array(values, dtype=float).reshape(len(times), len(wells)),
+    )
+
+
+def _to_frame(times: np.ndarray, wells: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame(values, columns=wells.tolist()).assign(time=times)[
+        ['time', *wells.tolist()]
+    ]
+
+
+@instrument
+def read_plate_bytes(
+    data: bytes, suffix: str = '.xlsx', cache_dir: str | Path = None
+) -> pd.DataFrame:
+    """Reads the kinetic read of a plate-reader export.
+
+    Parameters:
+    -----------
+    data (bytes): Contents of the export.
+    suffix (str): File extension giving the format of the export, one of '.xlsx',
+        '.xls', '.csv', '.tsv' or '.txt' (default = '.xlsx').
+    cache_dir (str | Path): Optional, directory of cached plates. Default is to not
+        cache.
+
+    Returns:
+    --------
+    DataFrame: Wide dataframe with the 'time' of each reading (as timedeltas) and one
+        column of readings per well.
+    """
+    if cache_dir is None:
+        return _to_frame(*parse_rows(_rows(data, suffix)))
+
+    key = hashlib.sha256(data).hexdigest()
+    cache_path = Path(cache_dir) / f'{key}-v{CACHE_VERSION}.npz'
+    if cache_path.exists():
+        with np.load(cache_path, allow_pickle=False) as cached:
+            return _to_frame(cached['times'], cached['wells'], cached['values'])
+
+    times, wells, values = parse_rows(_rows(data, suffix))
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+    with open(temporary, 'wb') as file:
+        np.savez(file, times=times, wells=wells, values=values)
+    os.replace(temporary, cache_path)
+    return _to_frame(times, wells, values)
+
+
+def read_plate(path: str | Path, cache_dir: str | Path = None) -> pd.DataFrame:
+    """Reads the kinetic read of a plate-reader export file (see read_plate_bytes)."""
+    path = Path(path)
+    return read_plate_bytes(path.read_bytes(), suffix=path.suffix, cache_dir=cache_dir)
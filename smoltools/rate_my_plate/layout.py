@@ -0,0 +1,114 @@
+"""Plate geometry for 96, 384 and 1536 well plates, and vectorized parsing of well
+names such as 'B7' or 'AF48' into rows and columns."""
+
+from dataclasses import dataclass
+from string import ascii_uppercase
+
+import numpy as np
+import pandas as pd
+
+PLATE_FORMATS = {96: (8, 12), 384: (16, 24), 1536: (32, 48)}
+
+WELL_PATTERN = r'^(?P<row>[A-Z]+)(?P<column>\d+)$'
+
+
+def row_label(index: int) -> str:
+    """Label of the row at a (zero-based) index: 'A' to 'Z', then 'AA', 'AB', ..."""
+    label = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        label = ascii_uppercase[remainder] + label
+    return label
+
+
+def row_index(label: str) -> int:
+    """Zero-based index of a row label (inverse of row_label)."""
+    index = 0
+    for letter in label:
+        index = 26 * index + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def parse_wells(wells: pd.Series) -> pd.DataFrame:
+    """Splits well names into their row label, column number and zero-based row and
+    column indices.
+
+    Parameters:
+    -----------
+    wells (Series): Well names (e.g. 'B7', 'AF48').
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the 'row', 'column', 'row_index' and 'column_index' of
+        each well, with the same index as wells.
+    """
+    wells = pd.Series(wells)
+    parts = wells.astype(str).str.extract(WELL_PATTERN)
+    if parts.row.isna().any():
+        invalid = wells[parts.row.isna()].unique()[:5]
+        raise ValueError(f'Invalid well names: {list(invalid)}')
+
+    # rows repeat across a plate, so convert each distinct label once
+    codes, labels = pd.factorize(parts.row)
+    column = parts.column.astype(int).to_numpy()
+    return pd.DataFrame(
+        {
+            'row': parts.row,
+            'column': column,
+            'row_index': np.array([row_index(label) for label in labels])[codes],
+            'column_index': column - 1,
+        },
+        index=wells.index,
+    )
+
+
+@dataclass(frozen=True)
+class PlateLayout:
+    """Geometry of a plate.
+
+    Parameters:
+    -----------
+    n_rows (int): Number of rows.
+    n_columns (int): Number of columns.
+    """
+
+    n_rows: int
+    n_columns: int
+
+    @classmethod
+    def from_size(cls, n_wells: int) -> 'PlateLayout':
+        """Standard layout of a 96, 384 or 1536 well plate."""
+        if n_wells not in PLATE_FORMATS:
+            raise ValueError(
+                f'Unknown plate size {n_wells}, choices are {list(PLATE_FORMATS)}'
+            )
+        return cls(*PLATE_FORMATS[n_wells])
+
+    @classmethod
+    def from_wells(cls, wells: pd.Series) -> 'PlateLayout':
+        """Smallest standard layout containing every well."""
+        parsed = parse_wells(pd.Series(pd.unique(pd.Series(wells))))
+        n_rows = parsed.row_index.max() + 1
+        n_columns = parsed.column.max()
+        for n_wells, (rows, columns) in PLATE_FORMATS.items():
+            if n_rows <= rows and n_columns <= columns:
+                return cls.from_size(n_wells)
+        return cls(int(n_rows), int(n_columns))
+
+    @property
+    def n_wells(self) -> int:
+        return self.n_rows * self.n_columns
+
+    @property
+    def rows(self) -> list[str]:
+        return [row_label(i) for i in range(self.n_rows)]
+
+    @property
+    def columns(self) -> list[int]:
+        return list(range(1, self.n_columns + 1))
+
+    @property
+    def wells(self) -> list[str]:
+        """Well names in row-major order (A1, A2, ..., B1, ...)."""
+        return [f'{row}{column}' for row in self.rows for column in self.columns]
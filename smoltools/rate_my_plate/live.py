@@ -0,0 +1,241 @@
+"""Stateful rating of a kinetic plate while the run is in progress. Reads are pushed as
+they arrive (or picked up from a watched export file) and each update costs O(wells):
+per-well prefix sums give the regression sums of any window, and a well's threshold
+window is only searched for again when its maximum changes."""
+
+import time
+import zipfile
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from smoltools.rate_my_plate import ingest, regression
+from smoltools.rate_my_plate.main import (
+    NADH_EXTINCTION_COEFFICIENT,
+    _slopes_table,
+    convert_time,
+    normalize_to_protein_concentration,
+)
+
+# errors from reading an export that is still being written
+PARTIAL_EXPORT_ERRORS = (OSError, ValueError, EOFError, zipfile.BadZipFile)
+
+# n, sum(x), sum(y), sum(x^2), sum(xy), sum(y^2)
+N_SUMS = 6
+
+
+class LivePlate:
+    """Incrementally updated rates of every well of a plate.
+
+    Parameters:
+    -----------
+    lower_percent (float): Lower threshold, as a fraction of each well's maximum NADH
+        consumed.
+    upper_percent (float): Upper threshold, as a fraction of each well's maximum NADH
+        consumed.
+    concentration (float): Protein concentration (in uM) (default = 1).
+    """
+
+    def __init__(
+        self, lower_percent: float, upper_percent: float, concentration: float = 1
+    ) -> None:
+        self.lower_percent = lower_percent
+        self.upper_percent = upper_percent
+        self.concentration = concentration
+        self.wells = None
+        self.n_reads = 0
+
+    def _allocate(self, wells: list[str], capacity: int = 64) -> None:
+        n_wells = len(wells)
+        self.wells = pd.Index(wells)
+        self._baseline = None
+        self._times = np.empty(capacity)
+        self._values = np.empty((capacity, n_wells))
+        # running max of each well, which is non-decreasing in time, so the first
+        # crossing of a threshold can be found by binary search
+        self._running_max = np.empty((capacity, n_wells))
+        # prefix sums of the regression sums, with a leading row of zeros
+        self._prefix = np.zeros((capacity + 1, N_SUMS, n_wells))
+        self._max = np.full(n_wells, -np.inf)
+        self._min = np.full(n_wells, np.inf)
+        self._start = np.zeros(n_wells, dtype=int)
+        self._end = np.zeros(n_wells, dtype=int)
+
+    def _grow(self) -> None:
+        capacity = 2 * len(self._times)
+        n = self.n_reads
+        for name in ['_times', '_values', '_running_max']:
+            old = getattr(self, name)
+            new = np.empty((capacity, *old.shape[1:]))
+            new[:n] = old[:n]
+            setattr(self, name, new)
+        prefix = np.zeros((capacity + 1, N_SUMS, len(self.wells)))
+        prefix[: n + 1] = self._prefix[: n + 1]
+        self._prefix = prefix
+
+    def _first_crossing(self, wells: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+        """Index of the first read at which each well reached its threshold, found by
+        a vectorized binary search over the running max.
+        """
+        low = np.zeros(len(wells), dtype=int)
+        high = np.full(len(wells), self.n_reads - 1)
+        while (low < high).any():
+            middle = (low + high) // 2
+            reached = self._running_max[middle, wells] >= thresholds
+            high = np.where(reached, middle, high)
+            low = np.where(reached, low, middle + 1)
+        return low
+
+    def _window_index(self, wells: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+        index = self._first_crossing(wells, thresholds)
+        index = np.where(thresholds > self._max[wells], self.n_reads - 1, index)
+        return np.where(thresholds < self._min[wells], 0, index)
+
+    def push(self, time: float, absorbance) -> None:
+        """Adds one read of the plate.
+
+        Parameters:
+        -----------
+        time (float): Time of the read (in minutes), after the previous read.
+        absorbance (Series | ndarray): Absorbance of each well, as a series indexed by
+            well or an array in the order of the plate's wells. The wells are set by
+            the first read.
+        """
+        if self.wells is None:
+            if not isinstance(absorbance, pd.Series):
+                raise ValueError('The first read must be a series indexed by well.')
+            self._allocate(list(absorbance.index))
+        if isinstance(absorbance, pd.Series):
+            absorbance = absorbance.reindex(self.wells)
+        absorbance = np.asarray(absorbance, dtype=float)
+
+        if self.n_reads and time <= self._times[self.n_reads - 1]:
+            raise ValueError(
+                f'Read at {time:g} min is not after the previous read at '
+                f'{self._times[self.n_reads - 1]:g} min.'
+            )
+        if self.n_reads == len(self._times):
+            self._grow()
+
+        if self._baseline is None:
+            self._baseline = absorbance
+        y = (self._baseline - absorbance) / NADH_EXTINCTION_COEFFICIENT
+
+        i = self.n_reads
+        self._times[i] = time
+        self._values[i] = y
+        self._running_max[i] = y if i == 0 else np.fmax(self._running_max[i - 1], y)
+        valid = ~np.isnan(y)
+        # times are taken relative to the first read to keep the sums precise
+        x = np.where(valid, time - self._times[0], 0)
+        y0 = np.where(valid, y, 0)
+        self._prefix[i + 1] = self._prefix[i] + [valid, x, y0, x * x, x * y0, y0 * y0]
+        self.n_reads += 1
+
+        new_max = np.fmax(self._max, y)
+        self._min = np.fmin(self._min, y)
+        changed = np.flatnonzero(new_max != self._max)
+        self._max = new_max
+        if len(changed):
+            self._start[changed] = self._window_index(
+                changed, self.lower_percent * self._max[changed]
+            )
+            self._end[changed] = self._window_index(
+                changed, self.upper_percent * self._max[changed]
+            )
+        # windows ending at the last read because the threshold is above the max
+        beyond = self.upper_percent * self._max > self._max
+        self._end[beyond] = self.n_reads - 1
+        self._start[self.lower_percent * self._max > self._max] = self.n_reads - 1
+
+    def push_many(self, df: pd.DataFrame) -> None:
+        """Adds reads from a wide dataframe with the time of each read (in minutes) as
+        the index and the absorbance of each well as the columns.
+        """
+        for read_time, absorbance in df.iterrows():
+            self.push(read_time, absorbance)
+
+    def update_from_file(self, path: str | Path) -> int:
+        """Adds the reads of an export file that are newer than the last read.
+
+        Returns:
+        --------
+        int: Number of reads added.
+        """
+        df = self._new_reads(path)
+        self.push_many(df)
+        return len(df)
+
+    def _new_reads(self, path: str | Path) -> pd.DataFrame:
+        df = ingest.read_plate(path).pipe(convert_time)
+        if self.n_reads:
+            df = df.loc[df.index > self._times[self.n_reads - 1]]
+        return df
+
+    def watch(
+        self, path: str | Path, interval: float = 5, timeout: float = None
+    ) -> Iterator[pd.DataFrame]:
+        """Polls an export file that the plate reader is writing to, yielding the
+        updated rates each time new reads appear. Exports that cannot be read or
+        parsed yet (e.g. while being written) are retried at the next poll, while
+        errors adding the reads to the plate (see push) are raised.
+
+        Parameters:
+        -----------
+        path (str | Path): Path of the export file.
+        interval (float): Seconds between polls (default = 5).
+        timeout (float): Optional, seconds without new reads after which to stop.
+            Default is to watch until the generator is closed.
+
+        Yields:
+        -------
+        DataFrame: Rates of the plate, as returned by rates().
+        """
+        path = Path(path)
+        last_seen, last_update = None, time.monotonic()
+        while timeout is None or time.monotonic() - last_update < timeout:
+            try:
+                stat = path.stat()
+                signature = (stat.st_mtime_ns, stat.st_size)
+                df = self._new_reads(path) if signature != last_seen else None
+            except PARTIAL_EXPORT_ERRORS:
+                # a partially written export, retried at the next poll
+                df = None
+            if df is not None:
+                self.push_many(df)
+                last_seen = signature
+                if len(df):
+                    last_update = time.monotonic()
+                    yield self.rates()
+            time.sleep(interval)
+
+    def _window_sums(self) -> tuple[np.ndarray, ...]:
+        columns = np.arange(len(self.wells))
+        sums = (
+            self._prefix[self._end + 1, :, columns]
+            - self._prefix[self._start, :, columns]
+        )
+        return tuple(sums.T)
+
+    def windows(self) -> pd.DataFrame:
+        """Current threshold window of each well, as returned by threshold_windows."""
+        return pd.DataFrame(
+            {
+                'well': self.wells,
+                'max_value': self._max,
+                'lower_threshold': self.lower_percent * self._max,
+                'upper_threshold': self.upper_percent * self._max,
+                'start_time': self._times[self._start],
+                'end_time': self._times[self._end],
+            }
+        )
+
+    def rates(self) -> pd.DataFrame:
+        """Current rate of each well, as returned by rate_plate."""
+        fit = regression.fit_from_sums(*self._window_sums())
+        fit['intercept'] = fit['intercept'] - fit['rate'] * self._times[0]
+        return _slopes_table(self.wells, fit).pipe(
+            normalize_to_protein_concentration, concentration=self.concentration
+        )
@@ -1,39 +1,93 @@
-from io import BytesIO
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
-from scipy.stats import linregress
 
+from smoltools.rate_my_plate import ingest, regression
+from smoltools.rate_my_plate.exceptions import NonMonotonicTime
+from smoltools.rate_my_plate.layout import parse_wells, row_index
+from smoltools.profiling import instrument
 
-def _time_to_minutes(time: str) -> float:
-    hours, minutes, seconds = time.split(":")
-    return (60 * int(hours)) + int(minutes) + (int(seconds) / 60)
+NADH_EXTINCTION_COEFFICIENT = 0.00622
 
 
-def read_data(path: str) -> pd.DataFrame:
+def _cache_dir(cache: bool | str | Path) -> Path | None:
+    if cache is True:
+        return ingest.default_cache_dir()
+    return Path(cache) if cache else None
+
+
+@instrument
+def read_data(
+    path: str, cache: bool | str | Path = False, compact: bool = False
+) -> pd.DataFrame:
+    """Reads a plate-reader export (xlsx, xls, csv, tsv or txt). The header row is
+    found automatically. Parsed plates can be cached so that re-reading the same file
+    skips parsing: cache is a directory, or True for ingest.default_cache_dir(). The
+    cache is not bounded, so it is off by default. With compact, the tidy table is
+    built with compact dtypes (see tidy_data).
+    """
     if not isinstance(path, Path):
         path = Path(path)
 
-    return pd.read_excel(path, skiprows=2).pipe(clean_import)
+    cache_dir = _cache_dir(cache)
+    return ingest.read_plate(path, cache_dir=cache_dir).pipe(
+        clean_import, compact=compact
+    )
 
 
-def read_data_from_bytes(bytes_data: bytes) -> pd.DataFrame:
-    return pd.read_excel(BytesIO(bytes_data), skiprows=1).pipe(clean_import)
+@instrument
+def read_data_from_bytes(
+    bytes_data: bytes,
+    suffix: str = ".xlsx",
+    cache: bool | str | Path = False,
+    compact: bool = False,
+) -> pd.DataFrame:
+    """Reads the contents of a plate-reader export, with the format given by the file
+    extension suffix (see read_data).
+    """
+    cache_dir = _cache_dir(cache)
+    return ingest.read_plate_bytes(bytes_data, suffix=suffix, cache_dir=cache_dir).pipe(
+        clean_import, compact=compact
+    )
 
 
-def clean_import(df: pd.DataFrame) -> pd.DataFrame:
+@instrument
+def clean_import(df: pd.DataFrame, compact: bool = False) -> pd.DataFrame:
     return (
         df.rename(columns={"Kinetic read": "time"})
-        .astype({"time": str})
         .pipe(convert_time)
         .pipe(absorbance_to_consumption)
-        .pipe(tidy_data)
+        .pipe(tidy_data, compact=compact)
     )
 
 
+def _to_minutes(time: pd.Series) -> pd.Series:
+    """Vectorized conversion of timedeltas (as read by ingest), or of the 'h:mm:ss'
+    strings, datetime.time objects or Excel times (fractions of a day) of a dataframe
+    read otherwise, to minutes."""
+    if pd.api.types.is_numeric_dtype(time):
+        return time.astype(float) * 24 * 60
+    elif pd.api.types.is_timedelta64_dtype(time):
+        delta = time
+    else:
+        delta = pd.to_timedelta(time.astype(str))
+    return delta.dt.total_seconds() / 60
+
+
+def check_monotonic(time: pd.Series) -> None:
+    """Raises NonMonotonicTime if the reading times are not strictly increasing."""
+    steps = np.diff(time.to_numpy(dtype=float))
+    if len(steps) and not (steps > 0).all():
+        raise NonMonotonicTime(time.iloc[np.argmin(steps > 0) + 1])
+
+
+@instrument
 def convert_time(df: pd.DataFrame) -> pd.DataFrame:
     """convert time columns to fractions of a minute and set as index."""
-    return df.assign(time=lambda x: x.time.map(_time_to_minutes)).set_index("time")
+    time = _to_minutes(df.time)
+    check_monotonic(time)
+    return df.assign(time=time).set_index("time")
 
 
 def absorbance_to_consumption(df: pd.DataFrame) -> pd.DataFrame:
@@ -41,90 +95,150 @@ def absorbance_to_consumption(df: pd.DataFrame) -> pd.DataFrame:
     convert absorbance values into NADH consumption by normalizing to time zero and
     dividing by extinction coefficient of NADH (0.00622).
     """
-    NADH_EXTINCTION_COEFFICIENT = 0.00622
-
     return (df.iloc[0] - df) / NADH_EXTINCTION_COEFFICIENT
 
 
-def tidy_data(df: pd.DataFrame) -> pd.DataFrame:
+@instrument
+def tidy_data(df: pd.DataFrame, compact: bool = False) -> pd.DataFrame:
+    """Converts the time x wells table to tidy form. With compact, the wells are a
+    categorical (in plate order) and NADH consumed is float32, and the table is built
+    directly from the matrix instead of melted.
+    """
+    if compact:
+        n_times, n_wells = df.shape
+        return pd.DataFrame(
+            {
+                "time": np.tile(df.index.to_numpy(), n_wells),
+                "well": pd.Categorical.from_codes(
+                    np.repeat(np.arange(n_wells, dtype=np.int32), n_times),
+                    categories=pd.Index(df.columns),
+                ),
+                "nadh_consumed": df.to_numpy(dtype=np.float32).ravel(order="F"),
+            }
+        )
     return df.melt(
         var_name="well", value_name="nadh_consumed", ignore_index=False
     ).reset_index()
 
 
-def _get_thresholds(
-    df: pd.DataFrame, lower_percent, upper_percent
-) -> tuple[float, float]:
-    max_value = df.nadh_consumed.max()
+@instrument
+def threshold_windows(
+    df: pd.DataFrame, lower_percent: float, upper_percent: float
+) -> pd.DataFrame:
+    """Finds the fitting window of every well at once from the time x wells matrix.
+    Each well's thresholds are fractions of its maximum NADH consumed, and the window
+    runs from the first time the lower threshold is reached to the first time the upper
+    threshold is reached. A threshold above the maximum ends the window at the last
+    time point, and one below the minimum starts it at time zero.
+
+    The returned table can be passed to rate_plate and consumption_curve to avoid
+    recalculating it.
+    """
+    times, wells, values = regression.to_matrix(df)
+    with np.errstate(invalid="ignore"):
+        max_value = np.nanmax(values, axis=0)
+        min_value = np.nanmin(values, axis=0)
+
+    def _time_at_threshold(threshold: np.ndarray) -> np.ndarray:
+        first_crossing = times[np.argmax(values >= threshold, axis=0)]
+        return np.select(
+            [threshold > max_value, threshold < min_value],
+            [times.max(), 0],
+            first_crossing,
+        )
+
     lower_threshold = lower_percent * max_value
     upper_threshold = upper_percent * max_value
-    return lower_threshold, upper_threshold
+    return pd.DataFrame(
+        {
+            "well": wells,
+            "max_value": max_value,
+            "lower_threshold": lower_threshold,
+            "upper_threshold": upper_threshold,
+            "start_time": _time_at_threshold(lower_threshold),
+            "end_time": _time_at_threshold(upper_threshold),
+        }
+    )
 
 
-def _get_time_at_threshold(df: pd.DataFrame, threshold: float) -> float:
-    if threshold > df.nadh_consumed.max():
-        return df.time.max()
-    elif threshold < df.nadh_consumed.min():
-        return 0
-    else:
-        return df.loc[lambda x: x.nadh_consumed >= threshold].time.min()
+def _window_bounds(windows: pd.DataFrame, wells) -> tuple[np.ndarray, np.ndarray]:
+    bounds = windows.set_index("well").reindex(wells)
+    start_time = bounds.start_time.to_numpy(dtype=float)
+    end_time = bounds.end_time.to_numpy(dtype=float)
+    return start_time, end_time
 
 
 def filter_data(
-    df: pd.DataFrame, lower_percent: float, upper_percent: float
+    df: pd.DataFrame,
+    lower_percent: float,
+    upper_percent: float,
+    windows: pd.DataFrame = None,
 ) -> pd.DataFrame:
-    def _filter_well(group: pd.DataFrame) -> pd.DataFrame:
-        lower_threshold, upper_threshold = _get_thresholds(
-            group, lower_percent, upper_percent
-        )
-        start_time = _get_time_at_threshold(group, lower_threshold)
-        end_time = _get_time_at_threshold(group, upper_threshold)
-        return group.loc[lambda x: (x.time >= start_time) & (x.time <= end_time)]
+    """Keeps the readings of each well inside its fitting window."""
+    if windows is None:
+        windows = threshold_windows(df, lower_percent, upper_percent)
 
-    return df.groupby("well", as_index=False).apply(_filter_well).reset_index(drop=True)
+    start_time, end_time = _window_bounds(windows, df.well)
+    return (
+        df.loc[(df.time >= start_time) & (df.time <= end_time)]
+        .sort_values("well", kind="stable")
+        .reset_index(drop=True)
+    )
 
 
-def _estimate_slope(df: pd.DataFrame) -> float:
-    slope = linregress(df.time, df.nadh_consumed)[0]
-    return slope
+@instrument
+def calculate_slopes(df: pd.DataFrame, windows: pd.DataFrame = None) -> pd.DataFrame:
+    """Calculates rate of NADH consumption / ATP production through linear regression.
+    All wells are fit at once by closed-form least squares on the time x wells matrix,
+    also reporting the intercept, r^2 and standard error of each rate. If a window
+    table is given, only the readings inside each well's window are fit.
+    """
+    times, wells, values = regression.to_matrix(df)
+    if windows is None:
+        mask = ~np.isnan(values)
+    else:
+        mask = regression.window_mask(times, *_window_bounds(windows, wells))
+    return _slopes_table(wells, regression.masked_linregress(times, values, mask))
 
 
-def calculate_slopes(df: pd.DataFrame) -> pd.DataFrame:
-    """Calculates rate of NADH consumption / ATP production through linear regression."""
-    return (
-        df.groupby("well", as_index=False)
-        .apply(_estimate_slope)
-        .rename(columns={None: "rate"})
-        .assign(
-            row=lambda x: x.well.str[:1], column=lambda x: x.well.str[1:].astype(int)
-        )
-        .sort_values(["row", "column"])
-    )
+def _slopes_table(wells, fit: dict[str, np.ndarray]) -> pd.DataFrame:
+    table = pd.DataFrame({"well": wells, **fit})
+    parsed = parse_wells(table.well)
+    return table.assign(row=parsed.row, column=parsed.column).iloc[
+        np.lexsort((parsed.column, parsed.row_index))
+    ]
 
 
 def normalize_to_protein_concentration(
     df: pd.DataFrame, concentration: float
 ) -> pd.DataFrame:
     """Normalizes NADH consumption / ATP production rate to provided protein concentration (in uM)."""
-    return df.assign(rate=lambda x: x.rate / concentration)
+    return df.assign(
+        rate=lambda x: x.rate / concentration,
+        rate_stderr=lambda x: x.rate_stderr / concentration,
+    )
 
 
 def convert_to_wide(df: pd.DataFrame) -> pd.DataFrame:
+    wide = df.pivot(index="column", columns="row", values="rate")
     return (
-        df.pivot(index="column", columns="row", values="rate")
+        wide.reindex(columns=sorted(wide.columns, key=row_index))
         .reset_index()
         .rename_axis(columns=None)
     )
 
 
+@instrument
 def rate_plate(
     df: pd.DataFrame,
     lower_percent: float,
     upper_percent: float,
     concentration: float = 1,
+    windows: pd.DataFrame = None,
 ) -> pd.DataFrame:
-    return (
-        df.pipe(filter_data, lower_percent=lower_percent, upper_percent=upper_percent)
-        .pipe(calculate_slopes)
-        .pipe(normalize_to_protein_concentration, concentration=concentration)
+    if windows is None:
+        windows = threshold_windows(df, lower_percent, upper_percent)
+
+    return df.pipe(calculate_slopes, windows=windows).pipe(
+        normalize_to_protein_concentration, concentration=concentration
     )
@@ -1,32 +1,65 @@
 import altair as alt
+import numpy as np
 import pandas as pd
 
-from smoltools.rate_my_plate.main import _get_thresholds, _get_time_at_threshold
+from smoltools.rate_my_plate import regression
+from smoltools.rate_my_plate.layout import PlateLayout, parse_wells
+from smoltools.rate_my_plate.main import _window_bounds, threshold_windows
+from smoltools.profiling import instrument
 
-PLATE_ORDER = [f'{row}{column}' for row in 'ABCDEFGH' for column in range(1, 13)]
+PLATE_ORDER = PlateLayout.from_size(96).wells
 
+CURVE_MODES = ['auto', 'facet', 'sparkline']
 
-def _add_thresholds(
-    group: pd.DataFrame, lower_percent: float, upper_percent: float
-) -> pd.DataFrame:
-    lower_threshold, upper_threshold = _get_thresholds(
-        group, lower_percent=lower_percent, upper_percent=upper_percent
-    )
-    start_time = _get_time_at_threshold(group, lower_threshold)
-    end_time = _get_time_at_threshold(group, upper_threshold)
-    return group.assign(
-        lower_threshold=lower_threshold,
-        upper_threshold=upper_threshold,
-        start_time=start_time,
-        end_time=end_time,
-    )
+# largest plate drawn as one facet per well in 'auto' mode
+MAX_FACETS = 384
 
 
+@instrument
 def consumption_curve(
-    df: pd.DataFrame, lower_percent: float, upper_percent: float
+    df: pd.DataFrame,
+    lower_percent: float,
+    upper_percent: float,
+    windows: pd.DataFrame = None,
+    mode: str = 'auto',
+    layout: PlateLayout = None,
 ) -> alt.Chart:
-    df_with_thresholds = df.groupby('well', as_index=False).apply(
-        _add_thresholds, lower_percent, upper_percent
+    """Plots the NADH consumption of each well over time, highlighting the readings
+    inside the fitting window.
+
+    Parameters:
+    -----------
+    df (DataFrame): Tidy plate data with 'time', 'well' and 'nadh_consumed' columns.
+    lower_percent (float): Lower threshold, as a fraction of each well's maximum NADH
+        consumed.
+    upper_percent (float): Upper threshold, as a fraction of each well's maximum NADH
+        consumed.
+    windows (DataFrame): Optional, precomputed threshold windows (see
+        threshold_windows).
+    mode (str): 'facet' for one chart per well, 'sparkline' for a single chart with a
+        small curve in each well's position on the plate, or 'auto' for 'facet' up to
+        MAX_FACETS wells and 'sparkline' beyond (default = 'auto').
+    layout (PlateLayout): Optional, plate layout. Default is the smallest standard
+        plate containing every well.
+
+    Returns:
+    --------
+    Chart: Altair chart object.
+    """
+    if mode not in CURVE_MODES:
+        raise ValueError(f'Unknown mode {mode!r}, choices are {CURVE_MODES}')
+    if windows is None:
+        windows = threshold_windows(df, lower_percent, upper_percent)
+    if layout is None:
+        layout = PlateLayout.from_wells(df.well)
+    if mode == 'sparkline' or (mode == 'auto' and df.well.nunique() > MAX_FACETS):
+        return sparkline_plate(df, windows, layout=layout)
+
+    df_with_thresholds = df.merge(
+        windows.loc[
+            :, ['well', 'lower_threshold', 'upper_threshold', 'start_time', 'end_time']
+        ],
+        on='well',
     )
 
     scatter = (
@@ -64,11 +97,140 @@ def consumption_curve(
         )
     )
     return alt.layer(scatter, upper_rule, lower_rule, data=df_with_thresholds).facet(
-        facet=alt.Facet('well:N', title='well', sort=PLATE_ORDER),
+        facet=alt.Facet('well:N', title='well', sort=layout.wells),
         columns=6,
     )
 
 
+def _grid_axis(labels: list, title: str) -> alt.Axis:
+    """Axis labelling the cells of a plate grid, with cell i spanning [i, i + 1]."""
+    return alt.Axis(
+        title=title,
+        values=[i + 0.5 for i in range(len(labels))],
+        labelExpr=f'{[str(label) for label in labels]}[floor(datum.value)]',
+        grid=False,
+        ticks=False,
+    )
+
+
+@instrument
+def sparkline_plate(
+    df: pd.DataFrame,
+    windows: pd.DataFrame,
+    layout: PlateLayout = None,
+    n_points: int = 20,
+    cell_size: int = 16,
+) -> alt.Chart:
+    """Plots the NADH consumption of every well as a small curve at the well's position
+    on the plate, in a single chart that renders at 1536 wells. Each curve is scaled
+    to its own maximum and the part inside the fitting window is highlighted.
+
+    Parameters:
+    -----------
+    df (DataFrame): Tidy plate data with 'time', 'well' and 'nadh_consumed' columns.
+    windows (DataFrame): Threshold windows (see threshold_windows).
+    layout (PlateLayout): Optional, plate layout. Default is the smallest standard
+        plate containing every well.
+    n_points (int): Maximum number of readings drawn per well (default = 20).
+    cell_size (int): Width and height of each well in pixels (default = 16).
+
+    Returns:
+    --------
+    Chart: Altair chart object.
+    """
+    if layout is None:
+        layout = PlateLayout.from_wells(df.well)
+
+    times, wells, values = regression.to_matrix(df)
+    in_window = regression.window_mask(times, *_window_bounds(windows, wells))
+    keep = np.unique(np.linspace(0, len(times) - 1, min(n_points, len(times))).round())
+    keep = keep.astype(int)
+    times, values, in_window = times[keep], values[keep], in_window[keep]
+
+    parsed = parse_wells(pd.Series(wells))
+    span = (times.max() - times.min()) or 1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scaled = values / np.nanmax(np.abs(values), axis=0)
+    x = (
+        parsed.column_index.to_numpy()
+        + 0.1
+        + 0.8 * ((times - times.min()) / span)[:, None]
+    )
+    y = parsed.row_index.to_numpy() + 0.9 - 0.8 * np.clip(scaled, 0, 1)
+
+    data = pd.DataFrame(
+        {
+            'well': np.tile(wells, len(times)),
+            'x': x.ravel().round(3),
+            'y': y.ravel().round(3),
+            'in_window': in_window.ravel(),
+        }
+    ).dropna()
+
+    x_scale = alt.Scale(domain=[0, layout.n_columns], nice=False, zero=False)
+    y_scale = alt.Scale(domain=[0, layout.n_rows], nice=False, zero=False, reverse=True)
+    base = alt.Chart(data).encode(
+        x=alt.X('x:Q', scale=x_scale, axis=_grid_axis(layout.columns, 'Column')),
+        y=alt.Y('y:Q', scale=y_scale, axis=_grid_axis(layout.rows, 'Row')),
+        detail='well:N',
+        tooltip=[alt.Tooltip('well:N', title='Well')],
+    )
+    curves = base.mark_line(color='lightgray', strokeWidth=1)
+    fitted = base.transform_filter(alt.datum.in_window).mark_line(strokeWidth=1.5)
+    return alt.layer(curves, fitted).properties(
+        width=cell_size * layout.n_columns, height=cell_size * layout.n_rows
+    )
+
+
+@instrument
+def plate_heatmap(
+    df: pd.DataFrame,
+    value: str = 'rate',
+    layout: PlateLayout = None,
+    title: str = 'Rate of NADH consumption / uM protein',
+    cell_size: int = 16,
+) -> alt.Chart:
+    """Plots a per-well value, such as the rate, as a heatmap in the layout of the
+    plate.
+
+    Parameters:
+    -----------
+    df (DataFrame): Dataframe with the 'well' and the value to plot of each well.
+    value (str): Name of the column to plot (default = 'rate').
+    layout (PlateLayout): Optional, plate layout. Default is the smallest standard
+        plate containing every well.
+    title (str): Title of the color legend.
+    cell_size (int): Width and height of each well in pixels (default = 16).
+
+    Returns:
+    --------
+    Chart: Altair chart object.
+    """
+    if layout is None:
+        layout = PlateLayout.from_wells(df.well)
+    parsed = parse_wells(df.well)
+    data = pd.DataFrame(
+        {'well': df.well, 'row': parsed.row, 'column': parsed.column, value: df[value]}
+    )
+    return (
+        alt.Chart(data)
+        .mark_rect()
+        .encode(
+            x=alt.X('column:O', title='Column', sort=layout.columns),
+            y=alt.Y('row:O', title='Row', sort=layout.rows),
+            color=alt.Color(f'{value}:Q', title=title),
+            tooltip=[
+                alt.Tooltip('well:N', title='Well'),
+                alt.Tooltip(f'{value}:Q', title=value, format='.2f'),
+            ],
+        )
+        .properties(
+            width=cell_size * layout.n_columns, height=cell_size * layout.n_rows
+        )
+    )
+
+
+@instrument
 def kinetics_curves(df: pd.DataFrame) -> alt.Chart:
     return (
         alt.Chart(df)
@@ -80,7 +242,9 @@ def kinetics_curves(df: pd.DataFrame) -> alt.Chart:
                 alt.Tooltip('well', title='Well'),
                 alt.Tooltip('rate', title='Rate', format='.2f'),
             ],
-            facet=alt.Facet('row', title='Row', columns=4),
+            facet=alt.Facet(
+                'row', title='Row', columns=4, sort=PlateLayout.from_wells(df.well).rows
+            ),
         )
         .properties(
             height=200,
@@ -0,0 +1,320 @@
+"""Functions for fitting nonlinear progress curves to every well of a plate at once,
+as an alternative to the linear fit over a threshold window. All wells are fit
+together by a batched Levenberg-Marquardt, with the Jacobians of every well evaluated
+in one array operation and the parameters warm-started from the linear rates."""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from scipy.special import wrightomega
+
+from smoltools.rate_my_plate import regression
+from smoltools.rate_my_plate.main import (
+    _slopes_table,
+    calculate_slopes,
+    normalize_to_protein_concentration,
+    threshold_windows,
+)
+from smoltools.profiling import instrument
+
+PROGRESS_MODELS = ['exponential', 'exponential_lag', 'michaelis_menten']
+
+MODEL_PARAMETERS = {
+    'exponential': ['amplitude', 'k'],
+    'exponential_lag': ['amplitude', 'k', 'lag'],
+    'michaelis_menten': ['vmax', 'km'],
+}
+
+
+def _exponential(
+    t: np.ndarray, params: np.ndarray, s0: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """y = A (1 - exp(-k t)), with its Jacobian."""
+    amplitude, k = params[:, None, 0], params[:, None, 1]
+    decay = np.exp(-k * t)
+    y = amplitude * (1 - decay)
+    jacobian = np.stack([1 - decay, amplitude * t * decay], axis=-1)
+    return y, jacobian
+
+
+def _exponential_lag(
+    t: np.ndarray, params: np.ndarray, s0: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """y = A (1 - exp(-k (t - lag))) after the lag and 0 before it, with its
+    Jacobian.
+    """
+    amplitude, k, lag = params[:, None, 0], params[:, None, 1], params[:, None, 2]
+    elapsed = np.maximum(t - lag, 0)
+    decay = np.exp(-k * elapsed)
+    y = amplitude * (1 - decay)
+    jacobian = np.stack(
+        [
+            1 - decay,
+            amplitude * elapsed * decay,
+            np.where(t > lag, -amplitude * k * decay, 0),
+        ],
+        axis=-1,
+    )
+    return y, jacobian
+
+
+def _michaelis_menten(
+    t: np.ndarray, params: np.ndarray, s0: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """Integrated Michaelis-Menten equation, P = S0 - Km W((S0 / Km) exp((S0 - Vmax t)
+    / Km)), with its Jacobian. W(exp(z)) is evaluated as the Wright omega function of
+    z to avoid overflow.
+    """
+    vmax, km = params[:, None, 0], params[:, None, 1]
+    z = np.log(s0 / km) + (s0 - vmax * t) / km
+    omega = wrightomega(z)
+    d_omega = omega / (1 + omega)
+    y = s0 - km * omega
+    jacobian = np.stack(
+        [t * d_omega, -omega + d_omega * (1 + (s0 - vmax * t) / km)], axis=-1
+    )
+    return y, jacobian
+
+
+MODELS = {
+    'exponential': _exponential,
+    'exponential_lag': _exponential_lag,
+    'michaelis_menten': _michaelis_menten,
+}
+
+
+def _initial_rate(
+    model: str, params: np.ndarray, s0: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """Initial rate of product formation of each well, with its gradient with respect
+    to the parameters.
+    """
+    if model == 'michaelis_menten':
+        vmax, km = params[:, 0], params[:, 1]
+        rate = vmax * s0 / (km + s0)
+        gradient = np.stack([s0 / (km + s0), -vmax * s0 / (km + s0) ** 2], axis=-1)
+    else:
+        amplitude, k = params[:, 0], params[:, 1]
+        rate = amplitude * k
+        gradient = np.zeros_like(params)
+        gradient[:, 0], gradient[:, 1] = k, amplitude
+    return rate, gradient
+
+
+def _lower_bounds(model: str) -> np.ndarray:
+    return np.full(len(MODEL_PARAMETERS[model]), 1e-12)
+
+
+@instrument
+def levenberg_marquardt(
+    model: str,
+    times: np.ndarray,
+    values: np.ndarray,
+    initial: np.ndarray,
+    s0: float = None,
+    max_iter: int = 200,
+    tol: float = 1e-10,
+) -> dict[str, np.ndarray]:
+    """Fits a progress curve model to every well at once by Levenberg-Marquardt, with
+    a separate damping factor for each well and the Jacobian of every well evaluated
+    in a single call.
+
+    Parameters:
+    -----------
+    model (str): Name of the progress curve model, see PROGRESS_MODELS.
+    times (ndarray): Reading times (in minutes).
+    values (ndarray): Time x wells matrix of readings (NaN readings are ignored).
+    initial (ndarray): Wells x parameters matrix of starting parameters.
+    s0 (float): Initial substrate concentration, for 'michaelis_menten'.
+    max_iter (int): Maximum number of iterations (default = 200).
+    tol (float): Relative decrease of the residual sum of squares below which a well
+        is converged (default = 1e-10).
+
+    Returns:
+    --------
+    dict[str, ndarray]: Fitted parameters ('params'), residual sum of squares
+        ('rss'), number of readings ('n'), covariance matrix of the parameters
+        ('covariance'), and whether each well converged ('converged').
+    """
+    function = MODELS[model]
+    t = times[None, :]
+    y = values.T
+    valid = ~np.isnan(y)
+    y = np.where(valid, y, 0)
+    lower = _lower_bounds(model)
+
+    def _residuals(params: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        with np.errstate(over='ignore', invalid='ignore'):
+            predicted, jacobian = function(t, params, s0)
+        residuals = np.where(valid, y - predicted, 0)
+        jacobian = np.where(valid[..., None], jacobian, 0)
+        return residuals, jacobian, (residuals**2).sum(axis=1)
+
+    params = np.maximum(np.asarray(initial, dtype=float), lower)
+    n_wells, n_params = params.shape
+    damping = np.full(n_wells, 1e-3)
+    converged = np.zeros(n_wells, dtype=bool)
+    residuals, jacobian, rss = _residuals(params)
+    identity = np.eye(n_params)
+
+    for _ in range(max_iter):
+        active = ~converged
+        if not active.any():
+            break
+        # parameters held at their lower bound that would step further down are
+        # left out of the step
+        jtr = np.einsum('wtp,wt->wp', jacobian, residuals)
+        free = ~((params <= lower) & (jtr < 0))
+        free_jacobian = jacobian * free[:, None, :]
+        jtj = np.einsum('wtp,wtq->wpq', free_jacobian, free_jacobian)
+        jtr = jtr * free
+        diagonal = np.where(free, np.einsum('wpp->wp', jtj), 1)
+        scaled = jtj + (
+            identity * (damping[:, None] * np.maximum(diagonal, 1e-12) + ~free)[:, None]
+        )
+        try:
+            step = np.linalg.solve(scaled, jtr[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            step = (np.linalg.pinv(scaled) @ jtr[..., None])[..., 0]
+        step = np.where(active[:, None] & np.isfinite(step), step, 0)
+
+        trial = np.maximum(params + step, lower)
+        trial_residuals, trial_jacobian, trial_rss = _residuals(trial)
+        improved = active & np.isfinite(trial_rss) & (trial_rss < rss)
+
+        relative = np.where(improved, (rss - trial_rss) / np.maximum(rss, 1e-300), 0)
+        params = np.where(improved[:, None], trial, params)
+        residuals = np.where(improved[:, None], trial_residuals, residuals)
+        jacobian = np.where(improved[:, None, None], trial_jacobian, jacobian)
+        rss = np.where(improved, trial_rss, rss)
+        damping = np.clip(np.where(improved, damping / 3, damping * 4), 1e-12, 1e12)
+        small_step = (np.abs(step) <= tol * (np.abs(params) + tol)).all(axis=1)
+        converged |= (improved & ((relative < tol) | small_step)) | (
+            active & (damping >= 1e12)
+        )
+
+    n = valid.sum(axis=1)
+    jtj = np.einsum('wtp,wtq->wpq', jacobian, jacobian)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = rss / (n - n_params)
+    covariance = np.linalg.pinv(jtj) * variance[:, None, None]
+    return {
+        'params': params,
+        'rss': rss,
+        'n': n,
+        'covariance': covariance,
+        'converged': converged,
+    }
+
+
+def _warm_start(
+    model: str,
+    times: np.ndarray,
+    values: np.ndarray,
+    slopes: pd.DataFrame,
+    s0: float,
+) -> np.ndarray:
+    """Starting parameters from the linear rates and intercepts of each well."""
+    rate = np.maximum(slopes.rate.to_numpy(dtype=float), 1e-6)
+    intercept = slopes.intercept.to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        plateau = np.maximum(np.nanmax(values, axis=0), 1e-6)
+    if model == 'michaelis_menten':
+        km = np.full(len(rate), s0 / 2)
+        return np.stack([rate * (km + s0) / s0, km], axis=-1)
+
+    amplitude = 1.1 * plateau
+    initial = [amplitude, rate / amplitude]
+    if model == 'exponential_lag':
+        lag = np.clip(np.nan_to_num(-intercept / rate), 0, times.max())
+        initial.append(lag)
+    return np.stack(initial, axis=-1)
+
+
+def _fit_chunk(
+    chunk: tuple[np.ndarray, np.ndarray], model: str, times: np.ndarray, **kwargs
+) -> dict[str, np.ndarray]:
+    values, initial = chunk
+    return levenberg_marquardt(model, times, values, initial, **kwargs)
+
+
+@instrument
+def fit_progress_curves(
+    df: pd.DataFrame,
+    model: str = 'exponential',
+    s0: float = None,
+    concentration: float = 1,
+    lower_percent: float = 0.1,
+    upper_percent: float = 0.5,
+    max_iter: int = 200,
+    n_workers: int = 1,
+) -> pd.DataFrame:
+    """Fits a progress curve model to the full kinetic read of every well of a plate,
+    reporting the initial rate of each well in the same form as rate_plate.
+
+    Parameters:
+    -----------
+    df (DataFrame): Tidy plate data with 'time', 'well' and 'nadh_consumed' columns.
+    model (str): 'exponential' (A (1 - exp(-k t))), 'exponential_lag' (the same after
+        a lag time) or 'michaelis_menten' (integrated Michaelis-Menten equation)
+        (default = 'exponential').
+    s0 (float): Initial substrate concentration (in uM of NADH), required for
+        'michaelis_menten'.
+    concentration (float): Protein concentration (in uM) (default = 1).
+    lower_percent (float): Lower threshold of the linear fit used as the starting
+        point (default = 0.1).
+    upper_percent (float): Upper threshold of the linear fit used as the starting
+        point (default = 0.5).
+    max_iter (int): Maximum number of Levenberg-Marquardt iterations (default = 200).
+    n_workers (int): Number of worker processes to split the wells over
+        (default = 1).
+
+    Returns:
+    --------
+    DataFrame: Dataframe with the initial rate ('rate') and its standard error
+        ('rate_stderr') of each well normalized to the protein concentration, the
+        fitted model parameters, the residual sum of squares ('rss') and whether the
+        fit converged, with one row per well.
+    """
+    if model not in MODELS:
+        raise ValueError(f'Unknown model {model!r}, choices are {PROGRESS_MODELS}')
+    if model == 'michaelis_menten' and s0 is None:
+        raise ValueError('The michaelis_menten model requires s0.')
+
+    times, wells, values = regression.to_matrix(df)
+    slopes = (
+        calculate_slopes(
+            df, windows=threshold_windows(df, lower_percent, upper_percent)
+        )
+        .set_index('well')
+        .reindex(wells)
+    )
+    initial = _warm_start(model, times, values, slopes, s0)
+
+    fit_chunk = partial(_fit_chunk, model=model, times=times, s0=s0, max_iter=max_iter)
+    if n_workers > 1:
+        splits = np.array_split(np.arange(len(wells)), n_workers)
+        chunks = [(values[:, split], initial[split]) for split in splits]
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(fit_chunk, chunks))
+        fit = {
+            key: np.concatenate([result[key] for result in results])
+            for key in results[0]
+        }
+    else:
+        fit = fit_chunk((values, initial))
+
+    rate, gradient = _initial_rate(model, fit['params'], s0)
+    rate_variance = np.einsum('wp,wpq,wq->w', gradient, fit['covariance'], gradient)
+    table = {
+        'rate': rate,
+        'rate_stderr': np.sqrt(np.maximum(rate_variance, 0)),
+        **dict(zip(MODEL_PARAMETERS[model], fit['params'].T)),
+        'rss': fit['rss'],
+        'converged': fit['converged'],
+    }
+    return _slopes_table(wells, table).pipe(
+        normalize_to_protein_concentration, concentration=concentration
+    )
@@ -0,0 +1,104 @@
+"""Closed-form least squares regression of every well of a plate at once. The plate is
+kept as a time x wells matrix and each well's fitting window is applied as a mask."""
+
+import numpy as np
+import pandas as pd
+
+
+def to_matrix(df: pd.DataFrame) -> tuple[np.ndarray, pd.Index, np.ndarray]:
+    """Convert tidy plate data into a time x wells matrix.
+
+    Parameters:
+    -----------
+    df (DataFrame): Tidy plate data with 'time', 'well' and 'nadh_consumed' columns.
+
+    Returns:
+    --------
+    tuple[ndarray, Index, ndarray]: The times, the wells, and the time x wells matrix
+        of NADH consumed (NaN where a well has no reading at a time).
+    """
+    wide = df.pivot(index='time', columns='well', values='nadh_consumed')
+    return wide.index.to_numpy(dtype=float), wide.columns, wide.to_numpy(dtype=float)
+
+
+def window_mask(
+    times: np.ndarray, start_times: np.ndarray, end_times: np.ndarray
+) -> np.ndarray:
+    """Time x wells mask of the readings inside each well's [start, end] window."""
+    times = times[:, None]
+    return (times >= start_times[None, :]) & (times <= end_times[None, :])
+
+
+def regression_sums(
+    times: np.ndarray, values: np.ndarray, mask: np.ndarray
+) -> tuple[np.ndarray, ...]:
+    """Per-well sums needed for least squares: n, sum(x), sum(y), sum(x^2), sum(xy)
+    and sum(y^2), over the masked readings.
+    """
+    mask = mask & ~np.isnan(values)
+    x = np.where(mask, times[:, None], 0)
+    y = np.where(mask, values, 0)
+    return (
+        mask.sum(axis=0),
+        x.sum(axis=0),
+        y.sum(axis=0),
+        (x * x).sum(axis=0),
+        (x * y).sum(axis=0),
+        (y * y).sum(axis=0),
+    )
+
+
+def fit_from_sums(
+    n: np.ndarray,
+    sum_x: np.ndarray,
+    sum_y: np.ndarray,
+    sum_xx: np.ndarray,
+    sum_xy: np.ndarray,
+    sum_yy: np.ndarray,
+) -> dict[str, np.ndarray]:
+    """Slope, intercept, r^2 and the standard error of the slope from regression sums,
+    matching scipy.stats.linregress. Wells with fewer than two readings (or no spread
+    in time) get NaN.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_x = sum_x / n
+        mean_y = sum_y / n
+        ss_xx = sum_xx / n - mean_x**2
+        ss_yy = sum_yy / n - mean_y**2
+        ss_xy = sum_xy / n - mean_x * mean_y
+
+        slope = ss_xy / ss_xx
+        intercept = mean_y - slope * mean_x
+        r_squared = np.clip(ss_xy**2 / (ss_xx * ss_yy), 0, 1)
+        stderr = np.sqrt((1 - r_squared) * ss_yy / ss_xx / (n - 2))
+
+    undefined = (n < 2) | (ss_xx <= 0)
+    return {
+        'rate': np.where(undefined, np.nan, slope),
+        'intercept': np.where(undefined, np.nan, intercept),
+        'r_squared': np.where(undefined, np.nan, r_squared),
+        'rate_stderr': np.where(undefined | (n < 3), np.nan, stderr),
+    }
+
+
+def masked_linregress(
+    times: np.ndarray, values: np.ndarray, mask: np.ndarray
+) -> dict[str, np.ndarray]:
+    """Fit a line to the masked readings of every well of a plate in one pass.
+
+    Parameters:
+    -----------
+    times (ndarray): Reading times (in minutes).
+    values (ndarray): Time x wells matrix of readings.
+    mask (ndarray): Time x wells boolean mask of the readings to fit.
+
+    Returns:
+    --------
+    dict[str, ndarray]: Per-well slope ('rate'), intercept, r^2 and standard error of
+        the slope ('rate_stderr').
+    """
+    # center time so the sums do not lose precision on long runs
+    offset = times.mean()
+    fit = fit_from_sums(*regression_sums(times - offset, values, mask))
+    fit['intercept'] = fit['intercept'] - fit['rate'] * offset
+    return fit
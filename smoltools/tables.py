@@ -0,0 +1,266 @@
+"""Saving and loading of tidy result tables (pairwise distances, FRET efficiencies,
+spliced NOE tables, plate rates) as Parquet files. String columns are dictionary
+encoded, with the atom ID columns sharing one dictionary, and float columns are
+stored as float32. Loading can memory-map the file and read only some columns, or
+only the row groups that can match a filter such as [('distance', '<', 10)].
+Partitioned stores (e.g. store/job=<id>/part.parquet) are written one partition at a
+time with write_partition, which records the key the partition was computed from so
+that unchanged partitions can be skipped, and are loaded with load_dataset.
+Requires pyarrow (pip install smoltools[parquet])."""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from smoltools.noesy_neighbors.utils import add_noe_bins
+from smoltools.profiling import instrument
+
+# rows per row group, small enough that filters on sorted or clustered columns skip
+# most of a large table
+ROW_GROUP_SIZE = 1 << 17
+
+# Parquet metadata entry of a partition recording the key it was computed from
+PARTITION_KEY = b'smoltools.key'
+
+
+def compact_dtypes(df: pd.DataFrame, float32: bool = True) -> pd.DataFrame:
+    """Convert string columns to categoricals (with categories in order of first
+    appearance), with the atom ID columns ('id_1', 'id_2', ...) sharing the same
+    categories, and float64 columns to float32.
+
+    Parameters:
+    -----------
+    df (DataFrame): Tidy table.
+    float32 (bool): Whether to convert float64 columns to float32 (default = True).
+
+    Returns:
+    --------
+    DataFrame: Table with compact dtypes.
+    """
+    strings = [
+        column
+        for column in df.columns
+        if pd.api.types.is_string_dtype(df[column])
+        and not isinstance(df[column].dtype, pd.CategoricalDtype)
+    ]
+    ids = [column for column in strings if str(column).startswith('id_')]
+    conversions = {}
+    if ids:
+        categories = pd.unique(
+            np.concatenate([df[column].to_numpy() for column in ids])
+        )
+        id_dtype = pd.CategoricalDtype(pd.Index(categories).dropna())
+        conversions.update({column: id_dtype for column in ids})
+    conversions.update(
+        {
+            column: pd.CategoricalDtype(df[column].dropna().unique())
+            for column in strings
+            if column not in conversions
+        }
+    )
+    if float32:
+        conversions.update(
+            {
+                column: 'float32'
+                for column in df.columns
+                if df[column].dtype == np.float64
+            }
+        )
+    return df.astype(conversions)
+
+
+@instrument
+def save_table(
+    df: pd.DataFrame,
+    path: str | Path,
+    float32: bool = True,
+    noe_bins: bool = False,
+    sort_by: str | list[str] = None,
+    compression: str = 'zstd',
+    row_group_size: int = ROW_GROUP_SIZE,
+) -> Path:
+    """Save a tidy table as a Parquet file with compact dtypes (see compact_dtypes).
+
+    Parameters:
+    -----------
+    df (DataFrame): Tidy table, e.g. from pairwise_distances,
+        e_fret_between_conformations, splice_conformation_tables or rate_plate.
+    path (str | Path): Path of the Parquet file.
+    float32 (bool): Whether to store float64 columns as float32 (default = True).
+    noe_bins (bool): Whether to add a categorical 'noe_strength' column binning the
+        'distance' column (see add_noe_bins) (default = False).
+    sort_by (str | list[str]): Optional, columns to sort the rows by, so that filters
+        on them skip whole row groups when loading.
+    compression (str): Parquet compression codec (default = 'zstd').
+    row_group_size (int): Number of rows per row group (default = 131072).
+
+    Returns:
+    --------
+    Path: Path of the Parquet file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if noe_bins:
+        df = add_noe_bins(df)
+    if sort_by is not None:
+        df = df.sort_values(sort_by, ignore_index=True)
+    table = pa.Table.from_pandas(
+        compact_dtypes(df, float32=float32), preserve_index=False
+    )
+    path = Path(path)
+    pq.write_table(table, path, compression=compression, row_group_size=row_group_size)
+    return path
+
+
+@instrument
+def load_table(
+    path: str | Path,
+    columns: list[str] = None,
+    filters: list[tuple] = None,
+    memory_map: bool = True,
+) -> pd.DataFrame:
+    """Load a tidy table saved with save_table (or any Parquet file or directory).
+
+    Parameters:
+    -----------
+    path (str | Path): Path of the Parquet file or directory.
+    columns (list[str]): Optional, columns to read. Default is all columns.
+    filters (list[tuple]): Optional, row filters in pyarrow's format, e.g.
+        [('distance', '<', 10)] or [('id_1', 'in', ['ILE12-CD1'])]. Row groups whose
+        statistics cannot match are not read.
+    memory_map (bool): Whether to memory-map the file instead of reading it into
+        memory (default = True).
+
+    Returns:
+    --------
+    DataFrame: Table with string columns as categoricals.
+    """
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, columns=columns, filters=filters, memory_map=memory_map)
+    return table.to_pandas()
+
+
+@instrument
+def load_dataset(
+    path: str | Path,
+    partitions: list[str],
+    columns: list[str] = None,
+    filters: list[tuple] = None,
+) -> pd.DataFrame:
+    """Load a Parquet store partitioned into key=value directories, e.g.
+    store/job=<id>/part.parquet. Partition keys are read as strings (so that a key
+    such as '001' is not read as the number 1), and files with different columns are
+    read with the union of their columns, missing values being null. Files and
+    directories whose names start with '_' or '.' are skipped.
+
+    Parameters:
+    -----------
+    path (str | Path): Root directory of the store.
+    partitions (list[str]): Names of the partition keys, outermost first.
+    columns (list[str]): Optional, columns to read. Default is all columns.
+    filters (list[tuple]): Optional, row filters in pyarrow's format, e.g.
+        [('job', 'in', ['1abc', '2def'])].
+
+    Returns:
+    --------
+    DataFrame: Table with the partition keys as columns.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    partitioning = ds.partitioning(
+        pa.schema([(key, pa.string()) for key in partitions]), flavor='hive'
+    )
+    dataset = ds.dataset(path, format='parquet', partitioning=partitioning)
+    schema = pa.unify_schemas(
+        [fragment.physical_schema for fragment in dataset.get_fragments()]
+        + [partitioning.schema]
+    )
+    dataset = ds.dataset(
+        path, format='parquet', partitioning=partitioning, schema=schema
+    )
+    table = dataset.to_table(
+        columns=columns,
+        filter=pq.filters_to_expression(filters) if filters else None,
+    )
+    return table.to_pandas()
+
+
+def partition_path(store: str | Path, partition: dict[str, str]) -> Path:
+    """Path of a partition of a store, e.g. store/job=<id>/part.parquet for the
+    partition {'job': <id>}."""
+    return Path(store).joinpath(
+        *(f'{key}={value}' for key, value in partition.items()), 'part.parquet'
+    )
+
+
+def partition_ids(ids: pd.Series, name: str) -> pd.Series:
+    """Check that the IDs of the partitions of a store are unique.
+
+    Parameters:
+    -----------
+    ids (Series): Partition IDs, e.g. a manifest's 'job' column.
+    name (str): Name of the partition key, used in the error message.
+
+    Returns:
+    --------
+    Series: IDs as strings.
+    """
+    ids = ids.astype(str)
+    if ids.duplicated().any():
+        duplicates = ids[ids.duplicated()].unique()
+        raise ValueError(f'Duplicate {name} IDs in manifest: {list(duplicates)}')
+    return ids
+
+
+def write_partition(
+    df: pd.DataFrame, store: str | Path, partition: dict[str, str], key: str
+) -> Path:
+    """Write a table to its partition of a store (see partition_path). The file is
+    written under store/_tmp/ first and then moved into place, so an interrupted
+    write never leaves a partial file in the store.
+
+    Parameters:
+    -----------
+    df (DataFrame): Table.
+    store (str | Path): Root directory of the store.
+    partition (dict[str, str]): Partition keys and values, outermost first.
+    key (str): Key identifying the inputs the table was computed from, returned by
+        stored_key.
+
+    Returns:
+    --------
+    Path: Path of the partition.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    destination = partition_path(store, partition)
+    # outside the partitions, as readers of the store skip names starting with '_'
+    temporary = partition_path(Path(store) / '_tmp', partition)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    temporary.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), PARTITION_KEY: key.encode()}
+    )
+    pq.write_table(table, temporary)
+    os.replace(temporary, destination)
+    return destination
+
+
+def stored_key(store: str | Path, partition: dict[str, str]) -> str | None:
+    """Key a partition of a store was written with (see write_partition), or None if
+    the partition is not in the store."""
+    import pyarrow.parquet as pq
+
+    path = partition_path(store, partition)
+    if not path.exists():
+        return None
+    key = (pq.read_schema(path).metadata or {}).get(PARTITION_KEY)
+    return None if key is None else key.decode()
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+HEAVY_MODULES = ['numpy', 'pandas', 'scipy', 'Bio', 'altair']
+
+REPO_ROOT = Path(__file__).parents[2]
+
+
+def _imported_heavy_modules(statement: str) -> list[str]:
+    """Heavy dependencies in sys.modules after running statement in a fresh
+    interpreter."""
+    code = (
+        f'import sys; {statement}; '
+        f'print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=REPO_ROOT,
+    )
+    return [module for module in result.stdout.strip().split(',') if module]
+
+
+@pytest.mark.parametrize(
+    'statement',
+    [
+        'import smoltools',
+        'import smoltools.fret0',
+        'import smoltools.noesy_neighbors',
+        'import smoltools.rate_my_plate',
+        'import smoltools.pdbtools',
+        'import smoltools.calculate',
+    ],
+)
+def test_import_is_lazy(statement):
+    assert _imported_heavy_modules(statement) == []
+
+
+def test_attribute_access_imports_module():
+    assert 'pandas' in _imported_heavy_modules(
+        'import smoltools; smoltools.fret0.path_to_distances'
+    )